@@ -0,0 +1,92 @@
+"""Run the headless service benchmarks and write the results as JSON.
+
+    python -m benchmarks --sizes 1k,100k --out results.json
+    python -m benchmarks --sizes 1k --baseline results.json --threshold 0.2
+    python -m benchmarks --list
+
+With --baseline, each result is compared on "seconds" with the same case and
+size in the baseline file; the exit status is 1 if any got slower by more
+than --threshold (a fraction).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+ROOT = Path(__file__).resolve().parents[1]
+
+def _meta() -> Dict:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                             text=True, timeout=10).stdout.strip() or None
+    except OSError:
+        rev = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "git": rev,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+def compare(results: List[Dict], baseline: List[Dict], threshold: float) -> List[str]:
+    """Lines describing each result next to its baseline; regressions are marked."""
+    base = {(r["case"], r["size"]): r["seconds"] for r in baseline}
+    lines = []
+    for r in results:
+        old = base.get((r["case"], r["size"]))
+        if not old:
+            continue
+        change = r["seconds"] / old - 1
+        line = f"{r['case']:<14} {r['size']:>9,}  {old:9.3f}s -> {r['seconds']:9.3f}s  {change:+7.1%}"
+        lines.append(line + ("  REGRESSION" if change > threshold else ""))
+    return lines
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.split("\n")[0])
+    p.add_argument("--sizes", default="1k", help="comma-separated: 1k, 100k, 1m or a number (default 1k)")
+    p.add_argument("--cases", help="comma-separated case names (default all)")
+    p.add_argument("--repeat", type=int, default=1, help="runs per case; the fastest is kept")
+    p.add_argument("--out", help="write results to this JSON file")
+    p.add_argument("--baseline", help="JSON file from an earlier run to compare against")
+    p.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown against the baseline")
+    p.add_argument("--workdir", help="keep databases and generated files here instead of a temp dir")
+    p.add_argument("--list", action="store_true", help="list the cases and exit")
+    args = p.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(args.workdir or tmp)
+        # The app's default paths must never point at the real study database
+        os.environ.update(DB_PATH=str(workdir / "study.db"), JOURNAL_PATH=str(workdir / "reviews.journal"),
+                          MEDIA_DIR=str(workdir / "media"), BACKUP_DIR=str(workdir / "backups"))
+        from .datasets import parse_size
+        from .suite import CASES, run_all
+        if args.list:
+            for name, fn in CASES.items():
+                doc = (fn.__doc__ or "").strip().split("\n")[0]
+                print(f"{name:<14} {doc}")
+            return 0
+        names = args.cases.split(",") if args.cases else list(CASES)
+        unknown = [n for n in names if n not in CASES]
+        if unknown:
+            p.error(f"unknown case(s): {', '.join(unknown)}; see --list")
+        sizes = [parse_size(s) for s in args.sizes.split(",")]
+        def show(r: Dict):
+            extra = "  ".join(f"{k}={v}" for k, v in r.items() if k not in ("case", "size", "seconds"))
+            print(f"{r['case']:<14} {r['size']:>9,}  {r['seconds']:9.3f}s  {extra}", flush=True)
+        results = run_all(names, sizes, workdir, args.repeat, progress=show)
+
+    report = {"meta": _meta(), "results": results}
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if not args.baseline:
+        return 0
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))["results"]
+    lines = compare(results, baseline, args.threshold)
+    print(f"\nagainst {args.baseline}:")
+    print("\n".join(lines) or "no matching cases")
+    return 1 if any(l.endswith("REGRESSION") for l in lines) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""Insert and query throughput per SQLite profile (see src/db.py PROFILES).
+
+    python -m benchmarks.bench_db_profiles
+"""
+import random
+import tempfile
+import time
+from pathlib import Path
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+from src.db import PROFILES, make_engine
+from src.migrations import migrate
+from src.models import ReviewEvent, Word
+
+def run(profile: str, workdir: Path, commits: int = 300, rows: int = 20000, queries: int = 2000) -> dict:
+    eng = make_engine(str(workdir / f"{profile}.db"), profile)
+    migrate(eng)
+    Session = sessionmaker(bind=eng)
+    rnd = random.Random(0)
+    out = {}
+
+    # One row per transaction, like the old commit-per-answer path
+    t0 = time.perf_counter()
+    for i in range(commits):
+        with Session() as db:
+            db.add(ReviewEvent(uid=f"c{i}", item_type="kanji", item_id=i, mode="Meaning", correct=True, created_at=time.time()))
+            db.commit()
+    out["commit/row us"] = (time.perf_counter() - t0) * 1e6 / commits
+
+    # Bulk insert in one transaction
+    t0 = time.perf_counter()
+    with Session() as db:
+        db.execute(Word.__table__.insert(), [{"word": f"w{i}", "translation": f"t{i}"} for i in range(rows)])
+        db.commit()
+    out["bulk row us"] = (time.perf_counter() - t0) * 1e6 / rows
+
+    # Indexed point lookups
+    t0 = time.perf_counter()
+    with Session() as db:
+        for _ in range(queries):
+            db.execute(select(Word.id).where(Word.word == f"w{rnd.randrange(rows)}")).first()
+    out["lookup us"] = (time.perf_counter() - t0) * 1e6 / queries
+
+    # Full scan aggregate
+    t0 = time.perf_counter()
+    with Session() as db:
+        for _ in range(20):
+            db.scalar(select(func.count()).select_from(Word).where(Word.translation.like("%9%")))
+    out["scan ms"] = (time.perf_counter() - t0) * 1000 / 20
+    eng.dispose()
+    return out
+
+def main():
+    with tempfile.TemporaryDirectory() as d:
+        for profile in PROFILES:
+            r = run(profile, Path(d))
+            print(f"{profile:<9} " + "  ".join(f"{k}={v:8.1f}" for k, v in r.items()))
+
+if __name__ == "__main__":
+    main()
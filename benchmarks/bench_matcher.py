@@ -0,0 +1,69 @@
+"""Answer matching over the full kanji set.
+
+    python -m benchmarks.bench_matcher
+
+Uses the local subject store when it has been synced, otherwise a synthetic
+set the size of WaniKani's kanji list. Compares the precompiled matcher with
+the old per-submit normalize-and-compare loop.
+"""
+import random
+import time
+from src.services.matcher import AnswerMatcher, kata_to_hira
+from src.services.romaji import normalize_english
+from src.services import wanikani
+from .fake_wanikani import make_subject
+
+N_KANJI = 2100
+
+def load_items():
+    try:
+        items = wanikani.load_cached_kanji("Meaning")
+    except Exception:
+        items = []
+    if items:
+        return items, "store"
+    return [wanikani._subject_to_item(make_subject(i, 1 + i * 60 // N_KANJI)) for i in range(1, N_KANJI + 1)], "synthetic"
+
+def naive(item, guess):
+    answers = [normalize_english(m.lower()) for m in item["meanings"]]
+    return any(normalize_english(guess) == a for a in answers)
+
+def bench(label, fn, guesses):
+    t0 = time.perf_counter()
+    hits = sum(1 for item, g in guesses if fn(item, g))
+    dt = time.perf_counter() - t0
+    print(f"{label:<28} {len(guesses):>6} submits  {dt * 1e6 / len(guesses):8.2f} us/submit  ok={hits}")
+
+def main():
+    items, source = load_items()
+    print(f"{len(items)} kanji ({source})")
+    matcher = AnswerMatcher()
+
+    t0 = time.perf_counter()
+    compiled = matcher.compile_deck(items, "Meaning")
+    matcher.compile_deck(items, "On'yomi")
+    print(f"compile meaning+on'yomi decks: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    rnd = random.Random(0)
+    exact = [(it, it["meanings"][0]) for it in items if it["meanings"]]
+    typos = []
+    for it, m in exact:
+        if len(m) >= 5:
+            i = rnd.randrange(len(m))
+            typos.append((it, m[:i] + m[i + 1:]))
+    wrong = [(it, "zzzzzz") for it, _ in exact]
+
+    bench("naive exact", naive, exact)
+    bench("matcher exact", lambda it, g: matcher.match(compiled[it["id"]], g, "Meaning").ok, exact)
+    bench("naive typo (rejected)", naive, typos)
+    bench("matcher typo (accepted)", lambda it, g: matcher.match(compiled[it["id"]], g, "Meaning").ok, typos)
+    bench("matcher wrong", lambda it, g: matcher.match(compiled[it["id"]], g, "Meaning").ok, wrong)
+
+    on = matcher.compile_deck(items, "On'yomi")
+    readings = [(it, r["reading"]) for it in items for r in it["readings"] if r["type"] == "onyomi"]
+    kata = [(it, "".join(chr(ord(c) + 0x60) for c in r)) for it, r in readings]
+    bench("matcher on'yomi katakana", lambda it, g: matcher.match(on[it["id"]], g, "On'yomi").ok, kata)
+    assert all(kata_to_hira(g) == r for (_, g), (_, r) in zip(kata, readings))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Romaji -> hiragana: accuracy on the corpus and throughput.
+
+    python -m benchmarks.bench_romaji
+
+Compares the native converter in src/romaji.py with the old fallbacks
+(romkan, wanakana) when they are installed.
+"""
+import time
+from src import romaji
+from .romaji_corpus import CORPUS
+
+def _candidates():
+    yield "native (uncached)", romaji.to_hiragana.__wrapped__
+    yield "native (LRU)", romaji.to_hiragana
+    try:
+        import romkan
+        yield "romkan", romkan.to_hiragana
+    except Exception:
+        pass
+    try:
+        import wanakana
+        yield "wanakana", wanakana.to_hiragana
+    except Exception:
+        pass
+
+def main(rounds: int = 200):
+    words = [w for w, _ in CORPUS]
+    for name, fn in _candidates():
+        wrong = [(w, fn(w), want) for w, want in CORPUS if fn(w) != want]
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            for w in words:
+                fn(w)
+        dt = time.perf_counter() - t0
+        per = dt * 1e6 / (rounds * len(words))
+        print(f"{name:<18} {len(CORPUS) - len(wrong):>3}/{len(CORPUS)} correct  {per:7.2f} us/word")
+        for w, got, want in wrong[:5]:
+            print(f"    {w!r}: got {got!r}, want {want!r}")
+
+    # As-you-type: every prefix of every corpus word
+    prefixes = [w[:i] for w in words for i in range(1, len(w) + 1)]
+    t0 = time.perf_counter()
+    for _ in range(rounds // 10):
+        for p in prefixes:
+            romaji.convert_incremental(p)
+    dt = time.perf_counter() - t0
+    print(f"incremental        {dt * 1e6 / (rounds // 10 * len(prefixes)):7.2f} us/keystroke")
+
+if __name__ == "__main__":
+    main()
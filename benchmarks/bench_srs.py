@@ -0,0 +1,54 @@
+"""Scheduler throughput on a large deck.
+
+    python -m benchmarks.bench_srs
+"""
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from src.models import Base
+from src.services.journal import ReviewJournal
+from src.services.srs import Scheduler
+
+def main(n_cards: int = 50000, answers: int = 20000):
+    tmp = Path(tempfile.mkdtemp(prefix="bench-srs-"))
+    engine = create_engine(f"sqlite:///{tmp / 'srs.db'}")
+    Base.metadata.create_all(engine)
+    journal = ReviewJournal(str(tmp / "reviews.journal"), session_factory=sessionmaker(bind=engine), interval=0)
+    rnd = random.Random(0)
+    sched = Scheduler("kanji", "Meaning", new_per_day=n_cards)
+    now = time.time()
+    with Session(engine) as db:
+        t0 = time.perf_counter()
+        sched.load(db, range(1, n_cards + 1), now=now)
+        print(f"load {n_cards} cards: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+        # First pass introduces cards so the heap fills up
+        t0 = time.perf_counter()
+        last = None
+        for i in range(answers):
+            key = sched.next(now=now, avoid=last)
+            ok = rnd.random() < 0.8
+            sched.answer(key, ok, now=now)
+            journal.record("kanji", key, "Meaning", ok, sched.cards[key])
+            last = key
+            now += 5
+        dt = time.perf_counter() - t0
+        print(f"{answers} next+answer+record: {dt * 1e6 / answers:.1f} us each")
+
+        t0 = time.perf_counter()
+        written = journal.flush()
+        print(f"flush {written} answers: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+        t0 = time.perf_counter()
+        sched.load(db, range(1, n_cards + 1), now=now)
+        print(f"reload with state: {(time.perf_counter() - t0) * 1000:.1f} ms, due now: {sched.due_count(now)}")
+    journal.close()
+    engine.dispose()
+    shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Startup cost: cold import of the main window and time to first paint.
+
+Each measurement runs in a fresh interpreter. The import time comes from
+`python -X importtime`. Time to first paint is measured from process launch
+until the main window gets its first paint event. The app runs against a
+throwaway database unless --db is given; that file is copied first. It also
+fails when a module that should load lazily is already imported at first
+paint (see HEAVY).
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 10 --max-paint-ms 800
+"""
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+# Only needed once a feature is used, never to show the window
+HEAVY = ("pandas", "pyarrow", "numpy", "requests", "gtts", "PySide6.QtMultimedia")
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+_CHILD = """
+import sys, time
+from PySide6.QtCore import QEvent, QObject
+from PySide6.QtWidgets import QApplication
+from src.ui.main_window import MainWindow
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            heavy = [m for m in {heavy!r} if m in sys.modules]
+            print("painted", ",".join(heavy), flush=True)
+            import os
+            os._exit(0)
+        return False
+
+app = QApplication(sys.argv)
+win = MainWindow()
+watch = FirstPaint()
+win.installEventFilter(watch)
+win.show()
+app.exec()
+"""
+
+def _env(workdir: Path) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    env.update(DB_PATH=str(workdir / "study.db"), JOURNAL_PATH=str(workdir / "reviews.journal"),
+               BACKUP_DIR=str(workdir / "backups"), MEDIA_DIR=str(workdir / "media"),
+               PYTHONPATH=str(ROOT))
+    return env
+
+def import_times(env: Dict[str, str], module: str = "src.ui.main_window") -> Tuple[float, List[Tuple[float, str]]]:
+    """ms to import `module` cold, and what its direct imports cost."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         env=env, cwd=ROOT, capture_output=True, text=True, check=True).stderr
+    children: List[Tuple[float, str]] = []
+    for line in out.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        ms, depth, name = int(m.group(2)) / 1000, (len(m.group(3)) - 1) // 2, m.group(4)
+        # Children are listed before their parent
+        if depth == 1:
+            children.append((ms, name))
+        elif depth == 0:
+            if name == module:
+                return ms, sorted(children, reverse=True)
+            children = []
+    raise RuntimeError(f"{module} not in -X importtime output")
+
+def first_paint(env: Dict[str, str]) -> Tuple[float, List[str]]:
+    """ms from launch to the window's first paint, and HEAVY modules loaded by then."""
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", _CHILD.format(heavy=HEAVY)], env=env, cwd=ROOT,
+                         capture_output=True, text=True, timeout=120)
+    ms = (time.perf_counter() - t0) * 1000
+    line = next((l for l in out.stdout.splitlines() if l.startswith("painted")), None)
+    if line is None:
+        raise RuntimeError(f"window never painted:\n{out.stderr[-2000:]}")
+    loaded = line.split(" ", 1)[1].strip() if " " in line else ""
+    return ms, [m for m in loaded.split(",") if m]
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m benchmarks.bench_startup", description=__doc__.split("\n")[0])
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--db", help="database to start against (copied first)")
+    p.add_argument("--max-import-ms", type=float, help="fail if the median cold import is slower")
+    p.add_argument("--max-paint-ms", type=float, help="fail if the median time to first paint is slower")
+    args = p.parse_args(argv)
+    with tempfile.TemporaryDirectory() as d:
+        workdir = Path(d)
+        if args.db:
+            shutil.copy2(args.db, workdir / "study.db")
+        env = _env(workdir)
+        # The first launch also creates the database; keep it out of the numbers
+        first_paint(env)
+        imports, paints, heavy = [], [], set()
+        for _ in range(args.runs):
+            total, top = import_times(env)
+            imports.append(total)
+            ms, loaded = first_paint(env)
+            paints.append(ms)
+            heavy.update(loaded)
+    imp, paint = statistics.median(imports), statistics.median(paints)
+    print(f"cold import  median {imp:7.1f} ms  (min {min(imports):.1f})")
+    for ms, name in top[:8]:
+        print(f"    {ms:7.1f} ms  {name}")
+    print(f"first paint  median {paint:7.1f} ms  (min {min(paints):.1f})")
+    failed = []
+    if heavy:
+        failed.append(f"loaded before first paint: {', '.join(sorted(heavy))}")
+    if args.max_import_ms is not None and imp > args.max_import_ms:
+        failed.append(f"cold import {imp:.1f} ms > {args.max_import_ms} ms")
+    if args.max_paint_ms is not None and paint > args.max_paint_ms:
+        failed.append(f"first paint {paint:.1f} ms > {args.max_paint_ms} ms")
+    for msg in failed:
+        print("FAIL:", msg)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
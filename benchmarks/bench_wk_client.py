@@ -0,0 +1,38 @@
+"""Offline benchmark for the WaniKani client against the local fake server.
+
+    python -m benchmarks.bench_wk_client
+"""
+import time
+from src.services import wanikani
+from src.services.wk_client import WaniKaniClient
+from .fake_wanikani import FakeWaniKani
+
+def _run(fake: FakeWaniKani, **client_kw) -> dict:
+    client = WaniKaniClient("test", base_url=fake.url, **client_kw)
+    wanikani.set_client(client)
+    fake.hits = fake.throttled = 0
+    t0 = time.perf_counter()
+    items = wanikani._fetch_all_kanji()
+    dt = time.perf_counter() - t0
+    wanikani.set_client(None)
+    return {"items": len(items), "seconds": round(dt, 3), "requests": fake.hits, "throttled": fake.throttled}
+
+def main():
+    # Throughput: 20ms simulated latency, client limiter effectively off
+    with FakeWaniKani(n_kanji=6000, latency=0.02) as fake:
+        for workers in (1, 4, 8):
+            r = _run(fake, max_workers=workers, limit_per_minute=100000, burst=1000)
+            print(f"throughput workers={workers}: {r}")
+
+    # 429 handling: server allows 5 requests per second, client does not know
+    with FakeWaniKani(n_kanji=6000, rate_limit=5, window=1.0) as fake:
+        r = _run(fake, max_workers=4, limit_per_minute=100000, burst=1000)
+        print(f"server 429s honoured: {r}")
+
+    # Client-side limiter sized to the server limit keeps 429s rare
+    with FakeWaniKani(n_kanji=6000, rate_limit=10, window=1.0) as fake:
+        r = _run(fake, max_workers=4, limit_per_minute=600, burst=10)
+        print(f"token bucket 600/min: {r}")
+
+if __name__ == "__main__":
+    main()
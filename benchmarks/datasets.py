@@ -0,0 +1,54 @@
+"""Synthetic, seeded inputs for the benchmark suite.
+
+Sizes are given as 1k / 100k / 1m (or a plain number). The same size and
+seed always give the same data, so runs can be compared.
+"""
+import csv
+import random
+from pathlib import Path
+from typing import Dict, Iterator, List
+from src.services.wanikani import _subject_to_item
+from .fake_wanikani import FakeWaniKani, make_subject
+
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+TAGS = ("n5", "n4", "n3", "n2", "n1", "verb", "noun", "adjective", "counter", "archaic")
+_SYLLABLES = ("ka", "ki", "ku", "ke", "ko", "sa", "shi", "su", "ta", "chi", "tsu", "te", "to", "na", "ni",
+              "no", "ha", "hi", "fu", "ma", "mi", "mu", "ya", "yo", "ra", "ri", "ru", "wa", "n", "kya", "sho",
+              "ryo", "ga", "gi", "zu", "de", "bu", "pa", "kk", "tt")
+_KANA = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん"
+
+def parse_size(s: str) -> int:
+    s = s.strip().lower()
+    return SIZES[s] if s in SIZES else int(s.replace("_", ""))
+
+def size_label(n: int) -> str:
+    return next((k for k, v in SIZES.items() if v == n), str(n))
+
+def vocabulary(n: int, seed: int = 0) -> Iterator[Dict[str, str]]:
+    """Rows in the importer's columns; words are unique."""
+    rnd = random.Random(seed)
+    for i in range(n):
+        # A few random kana, then the index so words stay unique
+        word = "".join(rnd.choice(_KANA) for _ in range(rnd.randint(1, 4))) + str(i)
+        tags = ", ".join(rnd.sample(TAGS, rnd.randint(0, 3)))
+        yield {"word": word, "translation": f"meaning {i}; gloss {rnd.randrange(10_000)}", "tags": tags,
+               "audio_path": ""}
+
+def write_vocabulary_csv(path: Path, n: int, seed: int = 0) -> Path:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=["word", "translation", "tags", "audio_path"])
+        w.writeheader()
+        w.writerows(vocabulary(n, seed))
+    return path
+
+def romaji_words(n: int, seed: int = 0) -> List[str]:
+    rnd = random.Random(seed)
+    return ["".join(rnd.choice(_SYLLABLES) for _ in range(rnd.randint(1, 5))) for _ in range(n)]
+
+def kanji_items(n: int) -> List[Dict]:
+    """Study items as wk_store.load_kanji returns them."""
+    return [_subject_to_item(make_subject(i, 1 + (i - 1) * 60 // n)) for i in range(1, n + 1)]
+
+def fake_wanikani(n: int, **kw) -> FakeWaniKani:
+    """Fake API serving n kanji (not started)."""
+    return FakeWaniKani(n_kanji=n, **kw)
@@ -0,0 +1,178 @@
+"""Local stand-in for the WaniKani v2 API, for offline benchmarks.
+
+Serves /assignments and /subjects with pagination, updated_after filtering,
+ETag/304 handling and a fixed-window rate limit that answers 429 with a
+RateLimit-Reset header, like the real service.
+"""
+import bisect
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlencode, urlparse
+
+PAGE_SIZE = 500
+EPOCH = "2024-01-01T00:00:00.000000Z"
+
+def make_subject(sid: int, level: int, updated_at: str = EPOCH) -> Dict:
+    ch = chr(0x4E00 + sid % 20000)
+    return {
+        "id": sid,
+        "object": "kanji",
+        "data_updated_at": updated_at,
+        "data": {
+            "level": level,
+            "characters": ch,
+            "meanings": [
+                {"meaning": f"meaning {sid}", "primary": True, "accepted_answer": True},
+                {"meaning": f"alt {sid}", "primary": False, "accepted_answer": True},
+            ],
+            "auxiliary_meanings": [{"meaning": f"aux {sid}", "type": "whitelist"}],
+            "readings": [
+                {"reading": "かん", "type": "onyomi", "primary": True, "accepted_answer": True},
+                {"reading": "から", "type": "kunyomi", "primary": False, "accepted_answer": True},
+            ],
+            "component_subject_ids": [100000 + sid % 300, 100000 + (sid * 7) % 300],
+        },
+    }
+
+class FakeWaniKani:
+    def __init__(self, n_kanji: int = 2000, rate_limit: int = 0, window: float = 60.0, latency: float = 0.0):
+        self.subjects: Dict[int, Dict] = {i: make_subject(i, 1 + (i - 1) * 60 // max(n_kanji, 1)) for i in range(1, n_kanji + 1)}
+        self.assignments: Dict[int, Dict] = {
+            i: {"id": i, "object": "assignment", "data_updated_at": EPOCH, "data": {"subject_id": i, "subject_type": "kanji"}}
+            for i in self.subjects
+        }
+        self.rate_limit = rate_limit
+        self.window = window
+        self.latency = latency
+        self.hits = 0
+        self.throttled = 0
+        self.not_modified = 0
+        self._window_start = time.time()
+        self._window_count = 0
+        self._lock = threading.Lock()
+        self._sorted_cache: Dict[str, List[Dict]] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v2"
+
+    def touch_subject(self, sid: int, updated_at: str):
+        self.subjects[sid]["data_updated_at"] = updated_at
+        self.subjects[sid]["data"]["meanings"][0]["meaning"] += "!"
+        self._sorted_cache.clear()
+
+    def assign(self, sid: int, updated_at: str):
+        self.subjects.setdefault(sid, make_subject(sid, 60, updated_at))
+        self.assignments[sid] = {"id": sid, "object": "assignment", "data_updated_at": updated_at,
+                                 "data": {"subject_id": sid, "subject_type": "kanji"}}
+        self._sorted_cache.clear()
+
+    def _admit(self) -> Optional[float]:
+        with self._lock:
+            self.hits += 1
+            if not self.rate_limit:
+                return None
+            now = time.time()
+            if now - self._window_start >= self.window:
+                self._window_start, self._window_count = now, 0
+            self._window_count += 1
+            if self._window_count > self.rate_limit:
+                self.throttled += 1
+                return self._window_start + self.window
+            return None
+
+    def _sorted(self, kind: str) -> List[Dict]:
+        # Paging through a big collection re-reads it for every page; sort once
+        if kind not in self._sorted_cache:
+            table = self.assignments if kind == "assignments" else self.subjects
+            self._sorted_cache[kind] = sorted(table.values(), key=lambda r: r["id"])
+        return self._sorted_cache[kind]
+
+    def _collection(self, kind: str, q: Dict[str, List[str]]) -> List[Dict]:
+        table = self.assignments if kind == "assignments" else self.subjects
+        if "ids" in q:
+            # Look the ids up rather than scanning: large fakes get thousands of these
+            rows = [table[i] for i in sorted({int(x) for x in q["ids"][0].split(",") if x}) if i in table]
+        else:
+            rows = self._sorted(kind)
+        if "updated_after" in q:
+            rows = [r for r in rows if r["data_updated_at"] > q["updated_after"][0]]
+        return rows
+
+    def start(self) -> "FakeWaniKani":
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, code: int, body: bytes = b"", headers: Optional[Dict[str, str]] = None):
+                self.send_response(code)
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if fake.latency:
+                    time.sleep(fake.latency)
+                reset = fake._admit()
+                if reset is not None:
+                    self._send(429, b"{}", {"RateLimit-Remaining": "0", "RateLimit-Reset": str(int(reset) + 1)})
+                    return
+                u = urlparse(self.path)
+                kind = u.path.rstrip("/").rsplit("/", 1)[-1]
+                if kind not in ("assignments", "subjects"):
+                    self._send(404)
+                    return
+                q = parse_qs(u.query)
+                rows = fake._collection(kind, q)
+                after = int(q.get("page_after_id", ["0"])[0])
+                start = bisect.bisect_right(rows, after, key=lambda r: r["id"]) if after else 0
+                page = rows[start:start + PAGE_SIZE]
+                next_url = None
+                if page and page[-1]["id"] != rows[-1]["id"]:
+                    nq = {k: v[0] for k, v in q.items()}
+                    nq["page_after_id"] = str(page[-1]["id"])
+                    next_url = f"{fake.url}/{kind}?{urlencode(nq)}"
+                body = json.dumps({
+                    "object": "collection",
+                    "data_updated_at": max((r["data_updated_at"] for r in rows), default=None),
+                    "pages": {"next_url": next_url, "per_page": PAGE_SIZE},
+                    "total_count": len(rows),
+                    "data": page,
+                }).encode()
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    fake.not_modified += 1
+                    self._send(304, b"", {"ETag": etag})
+                    return
+                self._send(200, body, {"Content-Type": "application/json", "ETag": etag})
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeWaniKani":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
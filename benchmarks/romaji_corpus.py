@@ -0,0 +1,27 @@
+# (romaji as typed, expected hiragana)
+CORPUS = [
+    ("a", "あ"), ("kanji", "かんじ"), ("nihongo", "にほんご"), ("konnichiha", "こんにちは"),
+    ("onna", "おんな"), ("shinbun", "しんぶん"), ("kon'ya", "こんや"),
+    ("konnya", "こんにゃ"), ("sen'en", "せんえん"), ("hon", "ほん"), ("honn", "ほん"),
+    ("gakkou", "がっこう"), ("kitte", "きって"), ("zasshi", "ざっし"), ("matcha", "まっちゃ"),
+    ("chotto", "ちょっと"), ("kyoutto", "きょうっと"), ("ippai", "いっぱい"), ("kekkon", "けっこん"),
+    ("ryokou", "りょこう"), ("byouin", "びょういん"), ("jyuu", "じゅう"), ("juu", "じゅう"),
+    ("nyuugaku", "にゅうがく"), ("hyaku", "ひゃく"), ("myaku", "みゃく"), ("gyuunyuu", "ぎゅうにゅう"),
+    ("shashin", "しゃしん"), ("sha", "しゃ"), ("sya", "しゃ"), ("cha", "ちゃ"), ("tya", "ちゃ"),
+    ("tsukue", "つくえ"), ("tu", "つ"), ("fuji", "ふじ"), ("hu", "ふ"), ("si", "し"), ("ti", "ち"),
+    ("zi", "じ"), ("di", "ぢ"), ("du", "づ"), ("wo", "を"), ("wa", "わ"),
+    ("fairu", "ふぁいる"), ("fi", "ふぃ"), ("fe", "ふぇ"), ("fo", "ふぉ"), ("vi", "ゔぃ"),
+    ("thi", "てぃ"), ("dhi", "でぃ"), ("je", "じぇ"), ("che", "ちぇ"), ("she", "しぇ"),
+    ("xa", "ぁ"), ("la", "ぁ"), ("xtsu", "っ"), ("ltu", "っ"), ("xya", "ゃ"), ("xwa", "ゎ"),
+    ("ko-hi-", "こーひー"), ("ra-men", "らーめん"), ("KANJI", "かんじ"), ("Tokyo", "ときょ"),
+    ("toukyou", "とうきょう"), ("oosaka", "おおさか"), ("kinnyoubi", "きんにょうび"),
+    ("kin'youbi", "きんようび"), ("tanin", "たにん"), ("tan'i", "たんい"), ("genin", "げにん"),
+    ("gen'in", "げんいん"), ("hannou", "はんのう"), ("annai", "あんない"), ("minna", "みんな"),
+    ("sanpo", "さんぽ"), ("ten", "てん"), ("nn", "ん"), ("n'", "ん"), ("ni", "に"), ("nya", "にゃ"),
+    ("atsui", "あつい"), ("tetsudau", "てつだう"), ("dzu", "づ"), ("ja", "じゃ"), ("jo", "じょ"),
+    ("bya", "びゃ"), ("pyon", "ぴょん"), ("rya", "りゃ"), ("kya", "きゃ"), ("gya", "ぎゃ"),
+    ("mizu", "みず"), ("sakura", "さくら"), ("taberu", "たべる"), ("nomu", "のむ"), ("iku", "いく"),
+    ("kuru", "くる"), ("suru", "する"), ("benkyou", "べんきょう"), ("renshuu", "れんしゅう"),
+    ("shukudai", "しゅくだい"), ("chuui", "ちゅうい"), ("ocha", "おちゃ"), ("kotchi", "こっち"),
+    ("itte", "いって"), ("yatta", "やった"), ("sappari", "さっぱり"), ("zutto", "ずっと"),
+]
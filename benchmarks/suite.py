@@ -0,0 +1,273 @@
+"""Headless benchmarks for the service layer.
+
+Each case drives the services the widgets call (WaniKani sync and cache
+load, romaji conversion, answer matching, word import/export, bundle
+generation, review recording) against synthetic data of a given size, in
+its own SQLite files under a work directory. A case returns its metrics;
+"seconds" is the one compared against a baseline.
+
+Run through `python -m benchmarks` or pytest (benchmarks/test_services.py).
+"""
+import random
+import time
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from sqlalchemy.orm import sessionmaker
+from src.db import make_engine
+from src.migrations import migrate
+from . import datasets
+from .fake_wanikani import make_subject
+
+CASES: Dict[str, Callable[["Context"], Dict]] = {}
+# Per-answer commits cost milliseconds each; more than this only takes longer
+MAX_DIRECT_COMMITS = 2_000
+CONFUSABLES_MAX = 5_000 # the index is n x n per mode
+
+def case(name: str):
+    def register(fn):
+        CASES[name] = fn
+        return fn
+    return register
+
+class Context:
+    """Work directory and databases for one dataset size."""
+    def __init__(self, n: int, workdir: Path, seed: int = 0):
+        self.n = n
+        self.seed = seed
+        self.workdir = Path(workdir)
+        self.workdir.mkdir(parents=True, exist_ok=True)
+        self._engines = []
+        self._words: Optional[sessionmaker] = None
+        self._csv: Optional[Path] = None
+        self._fresh = 0
+
+    def database(self, name: str) -> sessionmaker:
+        """Session factory over a new, migrated database file."""
+        path = self.workdir / f"{name}.db"
+        for p in (path, path.with_name(path.name + "-wal"), path.with_name(path.name + "-shm")):
+            p.unlink(missing_ok=True)
+        eng = make_engine(str(path))
+        migrate(eng)
+        self._engines.append(eng)
+        return sessionmaker(bind=eng, autoflush=False, autocommit=False, future=True)
+
+    def fresh(self, name: str) -> sessionmaker:
+        self._fresh += 1
+        return self.database(f"{name}-{self._fresh}")
+
+    def vocabulary_csv(self) -> Path:
+        if self._csv is None:
+            self._csv = datasets.write_vocabulary_csv(self.workdir / "vocabulary.csv", self.n, self.seed)
+        return self._csv
+
+    def words(self) -> sessionmaker:
+        """Database holding the synthetic vocabulary (imported once, untimed)."""
+        if self._words is None:
+            from src.services.word_import import import_words
+            self._words = self.database("words")
+            import_words(str(self.vocabulary_csv()), session_factory=self._words)
+        return self._words
+
+    def close(self):
+        for eng in self._engines:
+            eng.dispose()
+        self._engines = []
+
+def _timed(fn: Callable):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+# --- WaniKani ------------------------------------------------------------
+@case("wk_sync")
+def wk_sync(ctx: Context) -> Dict:
+    """First full sync from the fake server into an empty store."""
+    from src.services import wanikani
+    from src.services.wk_client import WaniKaniClient
+    Session = ctx.fresh("wk")
+    with datasets.fake_wanikani(ctx.n) as fake:
+        wanikani.set_client(WaniKaniClient("test", base_url=fake.url, limit_per_minute=100_000, burst=1_000))
+        try:
+            with Session() as db:
+                _, dt = _timed(lambda: wanikani.sync_kanji(db))
+        finally:
+            wanikani.set_client(None)
+        return {"seconds": dt, "requests": fake.hits}
+
+@case("wk_load")
+def wk_load(ctx: Context) -> Dict:
+    """Practice items for each mode from a synced store."""
+    from src.services import wk_store
+    Session = ctx.fresh("wk")
+    with Session() as db:
+        wk_store.upsert_subjects(db, (make_subject(i, 1 + (i - 1) * 60 // ctx.n)
+                                      for i in range(1, ctx.n + 1)))
+        db.commit()
+    out, total = {}, 0.0
+    with Session() as db:
+        for mode in (None, "On'yomi", "Meaning"):
+            items, dt = _timed(lambda: wk_store.load_kanji(db, mode))
+            out[f"{mode or 'all'}_seconds"] = dt
+            total += dt
+    out.update(seconds=total, items=len(items))
+    return out
+
+# --- input and answers ---------------------------------------------------
+@case("romaji")
+def romaji(ctx: Context) -> Dict:
+    """Whole-word and as-you-type romaji to kana, cold cache."""
+    from src.romaji import convert_incremental, to_hiragana
+    words = datasets.romaji_words(ctx.n, ctx.seed)
+    to_hiragana.cache_clear()
+    _, full = _timed(lambda: [to_hiragana(w) for w in words])
+    _, typing = _timed(lambda: [convert_incremental(w) for w in words])
+    return {"seconds": full + typing, "to_hiragana_us": full / ctx.n * 1e6, "incremental_us": typing / ctx.n * 1e6}
+
+@case("matcher")
+def matcher(ctx: Context) -> Dict:
+    """Compile a Meaning deck, then match one guess per item."""
+    from src.services.matcher import AnswerMatcher
+    items = datasets.kanji_items(ctx.n)
+    m = AnswerMatcher()
+    deck, compile_s = _timed(lambda: m.compile_deck(items, "Meaning"))
+    rnd = random.Random(ctx.seed)
+    guesses = []
+    for it in items:
+        meaning = rnd.choice(it["meanings"])
+        r = rnd.random()
+        # Mostly right, some typos, some wrong
+        guess = meaning if r < 0.7 else meaning[:-1] + "x" if r < 0.85 else "something else"
+        guesses.append((deck[it["id"]], guess))
+    _, match_s = _timed(lambda: [m.match(c, g, "Meaning") for c, g in guesses])
+    return {"seconds": compile_s + match_s, "compile_seconds": compile_s, "match_us": match_s / ctx.n * 1e6}
+
+@case("practice")
+def practice(ctx: Context) -> Dict:
+    """Weakness-weighted practice draws over a deck, one answer per draw."""
+    from src.services.sampler import PracticeQueue
+    from src.services.srs import Card, review, weakness
+    rnd = random.Random(ctx.seed)
+    now = time.time()
+    cards = {i: review(Card(i, reps=rnd.randrange(8), lapses=rnd.randrange(4), stability=rnd.random() * 30),
+                       rnd.random() < 0.8, now - rnd.random() * 30 * 86400) for i in range(1, ctx.n + 1)}
+    groups = {i: 1 + (i - 1) * 60 // ctx.n for i in cards}
+    q, build = _timed(lambda: PracticeQueue({i: weakness(c, now) for i, c in cards.items()}, groups,
+                                            rng=random.Random(ctx.seed)))
+    k = min(ctx.n, 20_000)
+    def session():
+        last = None
+        for _ in range(k):
+            i = q.next(last)
+            q.shown(i)
+            cards[i] = review(cards[i], rnd.random() < 0.8, now)
+            q.update(i, weakness(cards[i], now))
+            last = i
+    _, run = _timed(session)
+    return {"seconds": build + run, "build_seconds": build, "answer_us": run / k * 1e6}
+
+@case("confusables")
+def confusables(ctx: Context) -> Dict:
+    """Build the similar-kanji index (n capped at CONFUSABLES_MAX), then draw distractors."""
+    from src.services import confusables as cf
+    n = min(ctx.n, CONFUSABLES_MAX)
+    items = datasets.kanji_items(n)
+    rnd = random.Random(ctx.seed)
+    comps = {it["id"]: rnd.sample(range(1, 500), rnd.randint(1, 4)) for it in items}
+    index, build = _timed(lambda: cf.build(items, comps))
+    ids = [it["id"] for it in items]
+    _, draw = _timed(lambda: [cf.distractors(index, i, "Meaning", 3, lambda o: True, rnd) for i in ids])
+    return {"seconds": build + draw, "kanji": n, "build_seconds": build, "draw_us": draw / n * 1e6}
+
+# --- word lists ----------------------------------------------------------
+@case("import")
+def import_(ctx: Context) -> Dict:
+    """CSV import into an empty database."""
+    from src.services.word_import import import_words
+    path = ctx.vocabulary_csv()
+    report, dt = _timed(lambda: import_words(str(path), session_factory=ctx.fresh("import")))
+    return {"seconds": dt, "rows_per_second": report.rows / dt, "inserted": report.inserted}
+
+@case("export")
+def export(ctx: Context) -> Dict:
+    """Export every word in each format."""
+    from src.services.word_export import WRITERS, export_words
+    Session = ctx.words()
+    out, total = {}, 0.0
+    for fmt in WRITERS:
+        path = ctx.workdir / f"export.{fmt}"
+        n, dt = _timed(lambda: export_words(str(path), fmt, session_factory=Session))
+        out[f"{fmt}_seconds"] = dt
+        total += dt
+    out.update(seconds=total, rows=n)
+    return out
+
+@case("bundles")
+def bundles(ctx: Context) -> Dict:
+    """Tag-filtered daily bundles, and a 30-day plan."""
+    from src.services.bundles import generate_bundle, plan_bundles
+    Session = ctx.words()
+    rnd = random.Random(ctx.seed)
+    with Session() as db:
+        _, one = _timed(lambda: [generate_bundle(db, 20, "n5, -archaic", rng=rnd) for _ in range(20)])
+        plan, month = _timed(lambda: plan_bundles(db, date(2030, 1, 1), 30, 20, "", rng=rnd))
+        db.rollback()
+    return {"seconds": one + month, "bundle_ms": one / 20 * 1000, "plan_30_days_seconds": month,
+            "planned": len(plan)}
+
+# --- reviews -------------------------------------------------------------
+@case("reviews")
+def reviews(ctx: Context) -> Dict:
+    """Answers through the review journal: record each, flush once."""
+    from src.services.journal import ReviewJournal
+    from src.services.srs import Card, review
+    Session = ctx.fresh("reviews")
+    path = ctx.workdir / "reviews.journal"
+    path.unlink(missing_ok=True)
+    j = ReviewJournal(str(path), session_factory=Session, interval=0)
+    rnd = random.Random(ctx.seed)
+    now = time.time()
+    cards: Dict[int, Card] = {}
+    def answer():
+        for _ in range(ctx.n):
+            wid = rnd.randrange(1, ctx.n + 1)
+            ok = rnd.random() < 0.8
+            cards[wid] = review(cards.get(wid) or Card(wid), ok, now)
+            j.record("word", wid, "Listening", ok, cards[wid], latency_ms=rnd.randrange(500, 5000))
+    _, rec = _timed(answer)
+    written, flush = _timed(j.flush)
+    j.close()
+    return {"seconds": rec + flush, "record_us": rec / ctx.n * 1e6, "flush_seconds": flush, "written": written}
+
+@case("record_result")
+def record_result(ctx: Context) -> Dict:
+    """The old path: one stats update and commit per answer.
+
+    Capped at MAX_DIRECT_COMMITS answers; seconds is scaled to n."""
+    from src.services.srs import record_result as record
+    Session = ctx.fresh("record")
+    rnd = random.Random(ctx.seed)
+    k = min(ctx.n, MAX_DIRECT_COMMITS)
+    with Session() as db:
+        _, dt = _timed(lambda: [record(db, rnd.random() < 0.8) for _ in range(k)])
+    return {"seconds": dt * ctx.n / k, "record_us": dt / k * 1e6, "answers": k}
+
+def run(name: str, ctx: Context) -> Dict:
+    metrics = CASES[name](ctx)
+    return {"case": name, "size": ctx.n, **{k: round(v, 6) if isinstance(v, float) else v for k, v in metrics.items()}}
+
+def run_all(names: List[str], sizes: List[int], workdir: Path, repeat: int = 1,
+            progress: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+    """Run each case at each size; with repeat > 1, keep the fastest run."""
+    results = []
+    for n in sizes:
+        ctx = Context(n, workdir / datasets.size_label(n))
+        try:
+            for name in names:
+                best = min((run(name, ctx) for _ in range(repeat)), key=lambda r: r["seconds"])
+                results.append(best)
+                if progress:
+                    progress(best)
+        finally:
+            ctx.close()
+    return results
@@ -0,0 +1,49 @@
+"""The service benchmarks under pytest-benchmark.
+
+    pip install -r requirements-dev.txt
+    pytest benchmarks/test_services.py --benchmark-json=results.json
+    BENCH_SIZE=100k pytest benchmarks/test_services.py --benchmark-compare
+
+Each round runs the whole case (including its untimed setup); the case's own
+metrics are kept in extra_info.
+"""
+import os
+import tempfile
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+_TMP = tempfile.mkdtemp(prefix="bench-")
+for _k, _v in (("DB_PATH", "study.db"), ("JOURNAL_PATH", "reviews.journal"), ("MEDIA_DIR", "media"),
+               ("BACKUP_DIR", "backups")):
+    os.environ[_k] = os.path.join(_TMP, _v)
+
+from .datasets import parse_size
+from .fake_wanikani import PAGE_SIZE
+from .suite import CASES, Context, run
+
+def _pages(n: int) -> int:
+    return -(-n // PAGE_SIZE)
+
+# What each case must have done, beyond finishing
+EXPECT = {
+    # Assignment pages, then one request per chunk of new subject ids
+    "wk_sync": lambda r, n: r["requests"] == 2 * _pages(n),
+    "wk_load": lambda r, n: r["items"] == n,
+    "import": lambda r, n: r["inserted"] == n,
+    "export": lambda r, n: r["rows"] == n,
+}
+
+@pytest.fixture(scope="module")
+def ctx(tmp_path_factory):
+    c = Context(parse_size(os.environ.get("BENCH_SIZE", "1k")), tmp_path_factory.mktemp("bench"))
+    yield c
+    c.close()
+
+@pytest.mark.parametrize("name", list(CASES))
+def test_service(benchmark, ctx, name):
+    benchmark.group = name
+    result = benchmark.pedantic(run, args=(name, ctx), rounds=3, iterations=1)
+    benchmark.extra_info.update(result)
+    assert result["seconds"] >= 0
+    check = EXPECT.get(name)
+    assert check is None or check(result, ctx.n), result
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from functools import cached_property
 from pathlib import Path
 import os
 from dotenv import load_dotenv
@@ -8,14 +9,65 @@ load_dotenv()
 @dataclass
 class Config:
     WANIKANI_API_TOKEN: str = os.getenv("WANIKANI_API_TOKEN", "")
+    WANIKANI_API_URL: str = os.getenv("WANIKANI_API_URL", "https://api.wanikani.com/v2")
+    WK_MAX_WORKERS: int = int(os.getenv("WK_MAX_WORKERS", "4"))
     CACHE_TTL_DAYS: int = int(os.getenv("CACHE_TTL_DAYS", "1"))
+    # Subject content (meanings/readings) rarely changes; re-check it less often
+    WK_SUBJECTS_TTL_DAYS: int = int(os.getenv("WK_SUBJECTS_TTL_DAYS", "7"))
+    # rapidfuzz similarity (0-100) a typed answer needs to count as a typo;
+    # 100 disables typo tolerance for that mode
+    MATCH_MEANING_CUTOFF: float = float(os.getenv("MATCH_MEANING_CUTOFF", "85"))
+    MATCH_READING_CUTOFF: float = float(os.getenv("MATCH_READING_CUTOFF", "100"))
+    MATCH_LISTENING_CUTOFF: float = float(os.getenv("MATCH_LISTENING_CUTOFF", "80"))
+    # Cards never seen before that may be introduced per mode per day
+    SRS_NEW_PER_DAY: int = int(os.getenv("SRS_NEW_PER_DAY", "20"))
+    # Generated listening bundles: size, optional tag filter ("n5, -archaic")
+    # and how many days "Plan ahead" fills in
+    BUNDLE_SIZE: int = int(os.getenv("BUNDLE_SIZE", "10"))
+    BUNDLE_TAGS: str = os.getenv("BUNDLE_TAGS", "")
+    BUNDLE_PLAN_DAYS: int = int(os.getenv("BUNDLE_PLAN_DAYS", "7"))
     DB_PATH: str = os.getenv("DB_PATH", "study.db")
+    # SQLite pragma set from db.PROFILES: default, safe, balanced, fast
+    DB_PROFILE: str = os.getenv("DB_PROFILE", "balanced")
+    # Reviews are appended here and written to the DB in batches
+    JOURNAL_PATH: str = os.getenv("JOURNAL_PATH", "reviews.journal")
+    JOURNAL_FLUSH_SECONDS: float = float(os.getenv("JOURNAL_FLUSH_SECONDS", "5"))
+    # utils.backup: snapshots kept per day/ISO week/month, pages copied per
+    # backup step; with BACKUP_INCREMENTAL=1 a full snapshot is taken every
+    # BACKUP_FULL_DAYS and only new reviews are saved in between
+    BACKUP_DIR: str = os.getenv("BACKUP_DIR", "backups")
+    BACKUP_KEEP_DAILY: int = int(os.getenv("BACKUP_KEEP_DAILY", "7"))
+    BACKUP_KEEP_WEEKLY: int = int(os.getenv("BACKUP_KEEP_WEEKLY", "4"))
+    BACKUP_KEEP_MONTHLY: int = int(os.getenv("BACKUP_KEEP_MONTHLY", "12"))
+    BACKUP_PAGES: int = int(os.getenv("BACKUP_PAGES", "1024"))
+    BACKUP_INCREMENTAL: bool = os.getenv("BACKUP_INCREMENTAL", "0").lower() in ("1", "true", "yes")
+    BACKUP_FULL_DAYS: int = int(os.getenv("BACKUP_FULL_DAYS", "7"))
     MEDIA_DIR: str = os.getenv("MEDIA_DIR", "media/audio")
+    # Disk budget for rendered audio; least recently played files go first
+    MEDIA_BUDGET_MB: float = float(os.getenv("MEDIA_BUDGET_MB", "500"))
+    # services.tts backend (gtts, espeak, silent), its voice and render threads
+    TTS_BACKEND: str = os.getenv("TTS_BACKEND", "gtts")
+    TTS_VOICE: str = os.getenv("TTS_VOICE", "")
+    TTS_WORKERS: int = int(os.getenv("TTS_WORKERS", "3"))
+    # ui.audio_pool: players kept loaded with the current and next bundle
+    # items, and memory for their file bytes
+    AUDIO_PLAYERS: int = int(os.getenv("AUDIO_PLAYERS", "3"))
+    AUDIO_CACHE_MB: float = float(os.getenv("AUDIO_CACHE_MB", "32"))
+    # services.confusables: multiple-choice neighbour index, rebuilt when the
+    # stored WaniKani subjects change
+    CONFUSABLES_PATH: str = os.getenv("CONFUSABLES_PATH", "confusables.npz")
+    # utils.perf: with PERF_TRACE=1, hot paths and SQL are timed into a ring
+    # buffer of PERF_BUFFER spans, the status bar shows p50/p95 per span, and
+    # Ctrl+Shift+T (and quitting) writes them as Chrome trace JSON
+    PERF_TRACE: bool = os.getenv("PERF_TRACE", "0").lower() in ("1", "true", "yes")
+    PERF_BUFFER: int = int(os.getenv("PERF_BUFFER", "20000"))
+    PERF_TRACE_FILE: str = os.getenv("PERF_TRACE_FILE", "trace.json")
 
-    @property
+    @cached_property
     def media_path(self) -> Path:
+        # Created once, on first use
         p = Path(self.MEDIA_DIR)
-        p.mkdir(parens=True, exist_ok=True)
+        p.mkdir(parents=True, exist_ok=True)
         return p
     
 config = Config()
\ No newline at end of file
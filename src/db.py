@@ -1,6 +1,53 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
 from .config import config
+from .utils.perf import tracer
 
-engine = create_engine(f"sqlite:///{config.DB_PATH}", echo=False, future=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
\ No newline at end of file
+# Pragmas applied to every new connection, by profile (Config.DB_PROFILE)
+PROFILES = {
+    # SQLite's own defaults: rollback journal, fsync on every commit
+    "default": {"foreign_keys": "ON"},
+    # WAL with full fsync: safest, still lets readers run during writes
+    "safe": {"journal_mode": "WAL", "synchronous": "FULL", "foreign_keys": "ON", "busy_timeout": "5000"},
+    # WAL + NORMAL only fsyncs at checkpoints; a crash can lose the last
+    # commits but never corrupts the file
+    "balanced": {
+        "journal_mode": "WAL", "synchronous": "NORMAL", "foreign_keys": "ON", "busy_timeout": "5000",
+        "temp_store": "MEMORY", "cache_size": "-32000", "mmap_size": "268435456",
+    },
+    "fast": {
+        "journal_mode": "WAL", "synchronous": "OFF", "foreign_keys": "ON", "busy_timeout": "5000",
+        "temp_store": "MEMORY", "cache_size": "-131072", "mmap_size": "1073741824",
+    },
+}
+
+def apply_profile(dbapi_conn, profile: str):
+    pragmas = PROFILES[profile]
+    cur = dbapi_conn.cursor()
+    for name, value in pragmas.items():
+        cur.execute(f"PRAGMA {name}={value}")
+    cur.close()
+
+def make_engine(path: str, profile: str = "balanced", **kw) -> Engine:
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown DB profile {profile!r}; expected one of {', '.join(PROFILES)}")
+    eng = create_engine(f"sqlite:///{path}", echo=False, future=True, **kw)
+
+    @event.listens_for(eng, "connect")
+    def _on_connect(dbapi_conn, _record):
+        apply_profile(dbapi_conn, profile)
+
+    tracer.instrument_engine(eng)
+    return eng
+
+tracer.instrument_sessions(Session)
+
+engine = make_engine(config.DB_PATH, config.DB_PROFILE)
+SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+
+def init_db(bind: Engine = None):
+    """Create missing tables and bring an existing study.db up to the current
+    schema version."""
+    from .migrations import migrate
+    migrate(bind or engine)
@@ -0,0 +1,172 @@
+"""Schema versioning for existing study.db files.
+
+The version lives in SQLite's PRAGMA user_version. New tables are created by
+`Base.metadata.create_all`; anything create_all cannot do to a table that
+already exists (new columns, new indexes, data conversions) goes here as a
+numbered step. A fresh database is created at the latest version directly.
+"""
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection, Engine
+from .models import Base, WORDS_FTS_DDL, word_key, word_reading
+
+def has_column(conn: Connection, table: str, column: str) -> bool:
+    return any(row[1] == column for row in conn.exec_driver_sql(f"PRAGMA table_info({table})"))
+
+def add_column(conn: Connection, table: str, column: str, ddl: str):
+    # ddl: type and constraints, e.g. "VARCHAR(128)" or "INTEGER NOT NULL DEFAULT 0"
+    if not has_column(conn, table, column):
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+def _create_missing_indexes(conn: Connection):
+    # Indexes declared on models that an older file never got. Indexes over
+    # columns a later step adds are left to that step.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if all(has_column(conn, table.name, c.name) for c in index.columns):
+                index.create(conn, checkfirst=True)
+
+def _words_word_key(conn: Connection):
+    add_column(conn, "words", "word_key", "VARCHAR(128)")
+    seen = set()
+    rows = []
+    for wid, word in conn.exec_driver_sql("SELECT id, word FROM words ORDER BY id"):
+        key = word_key(word)
+        if key is not None and key in seen:
+            # Keep existing duplicates (bundles may point at them) but out of
+            # the way of the unique key; the oldest row owns the word.
+            key = f"{key}\x00{wid}"
+        seen.add(key)
+        rows.append((key, wid))
+    if rows:
+        conn.exec_driver_sql("UPDATE words SET word_key = ? WHERE id = ?", rows)
+    _create_missing_indexes(conn)
+
+def _words_fts(conn: Connection):
+    add_column(conn, "words", "reading", "VARCHAR(128)")
+    rows = [(word_reading(word), wid) for wid, word in conn.exec_driver_sql("SELECT id, word FROM words")]
+    if rows:
+        conn.exec_driver_sql("UPDATE words SET reading = ? WHERE id = ?", rows)
+    for ddl in WORDS_FTS_DDL:
+        conn.exec_driver_sql(ddl)
+    conn.exec_driver_sql("INSERT INTO words_fts(words_fts) VALUES ('rebuild')")
+
+def _relational_tags_and_bundles(conn: Connection):
+    # Steps keep their own SQL, frozen to the schema of their version, so
+    # later changes to the services cannot change what an old step does.
+    # Word.tags "a, b" -> tags / word_tags (names trimmed, case-insensitive dedup)
+    parsed = {}
+    for wid, raw in conn.exec_driver_sql("SELECT id, tags FROM words WHERE tags IS NOT NULL AND tags != ''"):
+        names, seen = [], set()
+        for name in raw.split(","):
+            name = " ".join(name.split())
+            if name and name.casefold() not in seen:
+                seen.add(name.casefold())
+                names.append(name)
+        parsed[wid] = (raw, names)
+    new = list(dict.fromkeys(n for _, names in parsed.values() for n in names))
+    if new:
+        conn.exec_driver_sql("INSERT INTO tags (name) VALUES (?) ON CONFLICT (name) DO NOTHING", [(n,) for n in new])
+    tag_ids = {name.casefold(): tid for tid, name in conn.exec_driver_sql("SELECT id, name FROM tags")}
+    pairs = {(wid, tag_ids[n.casefold()]) for wid, (_, names) in parsed.items() for n in names}
+    if pairs:
+        conn.exec_driver_sql("INSERT OR IGNORE INTO word_tags (word_id, tag_id) VALUES (?, ?)", list(pairs))
+    fixed = [(", ".join(names) or None, wid) for wid, (raw, names) in parsed.items() if ", ".join(names) != raw]
+    if fixed:
+        conn.exec_driver_sql("UPDATE words SET tags = ? WHERE id = ?", fixed)
+    # daily_bundles.word_ids "1,2,3" -> bundle_items
+    if has_column(conn, "daily_bundles", "word_ids"):
+        known = {r[0] for r in conn.exec_driver_sql("SELECT id FROM words")}
+        bundles = conn.exec_driver_sql("SELECT id, word_ids FROM daily_bundles").all()
+        conn.exec_driver_sql("ALTER TABLE daily_bundles DROP COLUMN word_ids")
+        items = []
+        for bid, raw in bundles:
+            wids = dict.fromkeys(int(x) for x in (raw or "").split(",") if x.strip().isdigit())
+            items += [(bid, n, w) for n, w in enumerate(w for w in wids if w in known)]
+        if items:
+            conn.exec_driver_sql("INSERT INTO bundle_items (bundle_id, position, word_id) VALUES (?, ?, ?)", items)
+
+def _media_manifest(conn: Connection):
+    # media_files/media_owners come from create_all; record the word audio
+    # already set. Rendered files named the old way are left for verify()
+    # to clear out, and get rendered again on demand.
+    now = time.time()
+    rows = []
+    for wid, path in conn.exec_driver_sql(
+            "SELECT id, audio_path FROM words WHERE audio_path IS NOT NULL AND audio_path != ''"):
+        p = Path(path)
+        if p.is_file():
+            rows.append((f"user:{wid}", "user", str(p.resolve()), p.stat().st_size, now, now))
+    if not rows:
+        return
+    conn.exec_driver_sql(
+        "INSERT INTO media_files (key, kind, path, size, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (key) DO UPDATE SET path = excluded.path, size = excluded.size", rows)
+    conn.exec_driver_sql(
+        "INSERT OR IGNORE INTO media_owners (media_id, word_id) "
+        "SELECT id, CAST(substr(key, 6) AS INTEGER) FROM media_files WHERE kind = 'user'")
+
+def _review_rollups(conn: Connection):
+    # review_rollups comes from create_all; fill it from the history so far
+    conn.exec_driver_sql(
+        "INSERT INTO review_rollups (day, mode, level, reviews, correct, latency_ms, timed) "
+        "SELECT strftime('%Y%m%d', e.created_at, 'unixepoch', 'localtime'), e.mode, "
+        "CASE WHEN e.item_type = 'kanji' THEN coalesce(s.level, 0) ELSE 0 END, "
+        "count(*), sum(e.correct), coalesce(sum(e.latency_ms), 0), count(e.latency_ms) "
+        "FROM review_events e LEFT JOIN wk_subjects s ON e.item_type = 'kanji' AND s.id = e.item_id "
+        "GROUP BY 1, 2, 3 "
+        "ON CONFLICT (day, mode, level) DO NOTHING")
+
+def _wk_components(conn: Connection):
+    # wk_components comes from create_all. Stored subjects predate it, so the
+    # next sync re-downloads every kanji (one subjects pass; ETags dropped)
+    conn.exec_driver_sql(
+        "UPDATE wk_sync_state SET updated_after = '2000-01-01T00:00:00.000000Z', etag = NULL, "
+        "last_modified = NULL, last_checked = NULL WHERE collection = 'subjects' AND updated_after IS NOT NULL")
+
+def _words_tts_trigger(conn: Connection):
+    # A word whose text changes stops owning audio rendered from the old text
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS words_tts_au AFTER UPDATE OF word ON words "
+        "WHEN old.word IS NOT new.word BEGIN "
+        "DELETE FROM media_owners WHERE word_id = new.id "
+        "AND media_id IN (SELECT id FROM media_files WHERE kind = 'tts'); END")
+
+MIGRATIONS: List[Tuple[int, Callable[[Connection], None]]] = [
+    (1, _create_missing_indexes),
+    (2, _words_word_key),
+    (3, _words_fts),
+    (4, _relational_tags_and_bundles),
+    (5, _media_manifest),
+    (6, _review_rollups),
+    (7, _wk_components),
+    (8, _words_tts_trigger),
+]
+
+LATEST = MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+def get_version(conn: Connection) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar() or 0
+
+def set_version(conn: Connection, version: int):
+    conn.exec_driver_sql(f"PRAGMA user_version={int(version)}")
+
+def migrate(engine: Engine) -> int:
+    """Run pending steps, each in its own transaction. Returns the version."""
+    with engine.begin() as conn:
+        fresh = not inspect(conn).get_table_names()
+        Base.metadata.create_all(conn)
+        if fresh:
+            set_version(conn, LATEST)
+            return LATEST
+        current = get_version(conn)
+    for version, step in MIGRATIONS:
+        if version <= current:
+            continue
+        with engine.begin() as conn:
+            step(conn)
+            set_version(conn, version)
+        current = version
+    return current
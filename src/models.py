@@ -1,20 +1,69 @@
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import Integer, String, Text, DateTime, func, Boolean
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, validates
+from sqlalchemy import Integer, String, DateTime, func, Boolean, ForeignKey, Index, Float, UniqueConstraint, DDL, event
 from typing import Optional
+import unicodedata
 
 class Base(DeclarativeBase):
     pass
 
+def word_key(word: Optional[str]) -> Optional[str]:
+    # Dedup key: NFKC folds full/half-width forms, then case and spacing
+    if word is None:
+        return None
+    return " ".join(unicodedata.normalize("NFKC", word).split()).casefold() or None
+
+_KATA_TO_HIRA = {c: c - 0x60 for c in range(ord("ァ"), ord("ヶ") + 1)}
+
+def word_reading(word: Optional[str]) -> Optional[str]:
+    # Kana-folded form for search: NFKC (half-width kana), katakana -> hiragana
+    if word is None:
+        return None
+    return unicodedata.normalize("NFKC", word).translate(_KATA_TO_HIRA).strip() or None
+
 class Word(Base):
     __tablename__ = "words"
+    __table_args__ = (Index("ux_words_word_key", "word_key", unique=True),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     word: Mapped[str] = mapped_column(String(128), index=True)
+    # Normalized word, the upsert key for imports (see word_key())
+    word_key: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)
+    reading: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)
     translation: Mapped[str] = mapped_column(String(256))
     audio_path: Mapped[Optional[str]] = mapped_column(String(512), nullable=True)
+    # Display/search copy of the word's tags ("a, b"); word_tags is the source
+    # for tag queries and is kept in step by services.tags.sync_word_tags
     tags: Mapped[Optional[str]] = mapped_column(String(256), nullable=True)
     created_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    @validates("word")
+    def _set_word_key(self, _key, value):
+        self.word_key = word_key(value)
+        self.reading = word_reading(value)
+        return value
+
+# Full-text index over words (external content, kept in sync by triggers).
+# unicode61 splits English on word boundaries; a Japanese word is one token,
+# matched by prefix. See services/search.py for the query side.
+WORDS_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS words_fts USING fts5("
+    "word, reading, translation, tags, content='words', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')",
+    "CREATE TRIGGER IF NOT EXISTS words_fts_ai AFTER INSERT ON words BEGIN "
+    "INSERT INTO words_fts(rowid, word, reading, translation, tags) "
+    "VALUES (new.id, new.word, new.reading, new.translation, new.tags); END",
+    "CREATE TRIGGER IF NOT EXISTS words_fts_ad AFTER DELETE ON words BEGIN "
+    "INSERT INTO words_fts(words_fts, rowid, word, reading, translation, tags) "
+    "VALUES ('delete', old.id, old.word, old.reading, old.translation, old.tags); END",
+    "CREATE TRIGGER IF NOT EXISTS words_fts_au AFTER UPDATE OF word, reading, translation, tags ON words BEGIN "
+    "INSERT INTO words_fts(words_fts, rowid, word, reading, translation, tags) "
+    "VALUES ('delete', old.id, old.word, old.reading, old.translation, old.tags); "
+    "INSERT INTO words_fts(rowid, word, reading, translation, tags) "
+    "VALUES (new.id, new.word, new.reading, new.translation, new.tags); END",
+)
+for _ddl in WORDS_FTS_DDL:
+    event.listen(Word.__table__, "after_create", DDL(_ddl).execute_if(dialect="sqlite"))
+
 class Stat(Base):
     __tablename__ = "stats"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -23,15 +72,163 @@ class Stat(Base):
     correct_answers: Mapped[int] = mapped_column(Integer, default=0)
     wrong_answers: Mapped[int] = mapped_column(Integer, default=0)
 
+class Tag(Base):
+    __tablename__ = "tags"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    # NOCASE: "N5" and "n5" are one tag
+    name: Mapped[str] = mapped_column(String(64, collation="NOCASE"), unique=True)
+
+class WordTag(Base):
+    __tablename__ = "word_tags"
+    # PK serves word -> tags; the reverse index serves tag -> words
+    __table_args__ = (Index("ix_word_tags_tag_word", "tag_id", "word_id"),)
+    word_id: Mapped[int] = mapped_column(ForeignKey("words.id", ondelete="CASCADE"), primary_key=True)
+    tag_id: Mapped[int] = mapped_column(ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
+
 class DailyBundle(Base):
     __tablename__ = "daily_bundles"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     yyyymmdd: Mapped[str] = mapped_column(String(8), unique=True, index=True)
-    # Comma-separated list of word ids for simplicity
-    word_ids: Mapped[str] = mapped_column(Text)
+
+class BundleItem(Base):
+    __tablename__ = "bundle_items"
+    bundle_id: Mapped[int] = mapped_column(ForeignKey("daily_bundles.id", ondelete="CASCADE"), primary_key=True)
+    position: Mapped[int] = mapped_column(Integer, primary_key=True)
+    word_id: Mapped[int] = mapped_column(ForeignKey("words.id", ondelete="CASCADE"), index=True)
 
 class WKCache(Base):
     __tablename__ = "wk_cache"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     last_refresh: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)
-    payload_path: Mapped[Optional[str]] = mapped_column(String(512), nullable=True)
\ No newline at end of file
+    payload_path: Mapped[Optional[str]] = mapped_column(String(512), nullable=True)
+
+class WKSyncState(Base):
+    __tablename__ = "wk_sync_state"
+    # One row per WaniKani collection ("assignments", "subjects")
+    collection: Mapped[str] = mapped_column(String(32), primary_key=True)
+    # High-water mark: the collection's data_updated_at from the last sync
+    updated_after: Mapped[Optional[str]] = mapped_column(String(40), nullable=True)
+    etag: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)
+    last_modified: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    last_checked: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)
+
+
+class WKSubject(Base):
+    __tablename__ = "wk_subjects"
+    # WaniKani subject id
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    object: Mapped[str] = mapped_column(String(16), default="kanji")
+    characters: Mapped[Optional[str]] = mapped_column(String(16), nullable=True, index=True)
+    level: Mapped[int] = mapped_column(Integer, default=0, index=True)
+    data_updated_at: Mapped[Optional[str]] = mapped_column(String(40), nullable=True)
+
+class WKMeaning(Base):
+    __tablename__ = "wk_meanings"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    subject_id: Mapped[int] = mapped_column(ForeignKey("wk_subjects.id", ondelete="CASCADE"), index=True)
+    meaning: Mapped[str] = mapped_column(String(128))
+    primary: Mapped[bool] = mapped_column(Boolean, default=False)
+    accepted: Mapped[bool] = mapped_column(Boolean, default=True)
+    # WaniKani auxiliary (whitelisted) meanings are accepted but never shown
+    auxiliary: Mapped[bool] = mapped_column(Boolean, default=False)
+
+class WKReading(Base):
+    __tablename__ = "wk_readings"
+    __table_args__ = (Index("ix_wk_readings_type_subject", "type", "subject_id"),)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    subject_id: Mapped[int] = mapped_column(ForeignKey("wk_subjects.id", ondelete="CASCADE"), index=True)
+    reading: Mapped[str] = mapped_column(String(32))
+    # "onyomi", "kunyomi" or "nanori"
+    type: Mapped[str] = mapped_column(String(16))
+    primary: Mapped[bool] = mapped_column(Boolean, default=False)
+    accepted: Mapped[bool] = mapped_column(Boolean, default=True)
+
+class WKComponent(Base):
+    __tablename__ = "wk_components"
+    # component_subject_ids: the radicals a kanji is built from
+    subject_id: Mapped[int] = mapped_column(ForeignKey("wk_subjects.id", ondelete="CASCADE"), primary_key=True)
+    component_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+class CardState(Base):
+    __tablename__ = "card_states"
+    __table_args__ = (
+        UniqueConstraint("item_type", "item_id", "mode", name="uq_card_states_item"),
+        Index("ix_card_states_due", "item_type", "mode", "due_at"),
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    # "kanji" (WaniKani subject id) or "word" (words.id)
+    item_type: Mapped[str] = mapped_column(String(8))
+    item_id: Mapped[int] = mapped_column(Integer)
+    # Practice mode: On'yomi, Kun'yomi, Meaning, Listening
+    mode: Mapped[str] = mapped_column(String(16))
+    # Days until recall is expected to drop off; grows with each success
+    stability: Mapped[float] = mapped_column(Float, default=0.0)
+    # 1 (easy) .. 10 (hard)
+    difficulty: Mapped[float] = mapped_column(Float, default=5.0)
+    reps: Mapped[int] = mapped_column(Integer, default=0)
+    lapses: Mapped[int] = mapped_column(Integer, default=0)
+    # Unix timestamps
+    due_at: Mapped[float] = mapped_column(Float, default=0.0)
+    last_review_at: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    introduced_at: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+
+class ReviewEvent(Base):
+    __tablename__ = "review_events"
+    __table_args__ = (Index("ix_review_events_item", "item_type", "item_id", "mode"),)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    # Client-generated id so replaying the journal after a crash is idempotent
+    uid: Mapped[str] = mapped_column(String(32), unique=True)
+    item_type: Mapped[str] = mapped_column(String(8))
+    item_id: Mapped[int] = mapped_column(Integer)
+    mode: Mapped[str] = mapped_column(String(16))
+    correct: Mapped[bool] = mapped_column(Boolean)
+    latency_ms: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    # Unix timestamp
+    created_at: Mapped[float] = mapped_column(Float, index=True)
+
+class ReviewRollup(Base):
+    __tablename__ = "review_rollups"
+    # Reviews per local day, mode and WaniKani level (0 for words); kept up to
+    # date as the journal writes events (services.analytics)
+    day: Mapped[str] = mapped_column(String(8), primary_key=True)
+    mode: Mapped[str] = mapped_column(String(16), primary_key=True)
+    level: Mapped[int] = mapped_column(Integer, primary_key=True)
+    reviews: Mapped[int] = mapped_column(Integer, default=0)
+    correct: Mapped[int] = mapped_column(Integer, default=0)
+    # Sum and count of answers that have a latency
+    latency_ms: Mapped[int] = mapped_column(Integer, default=0)
+    timed: Mapped[int] = mapped_column(Integer, default=0)
+
+# Manifest of audio files (services.media). Rendered files live in the store
+# under their content hash; user files stay where the user put them.
+class MediaFile(Base):
+    __tablename__ = "media_files"
+    __table_args__ = (Index("ix_media_files_lru", "kind", "last_access"),)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    # What the file was made from: TTS request hash, or "user:<word id>"
+    key: Mapped[str] = mapped_column(String(64), unique=True)
+    # "tts" (evictable) or "user"
+    kind: Mapped[str] = mapped_column(String(8))
+    # Relative to the media dir for "tts", absolute for "user"
+    path: Mapped[str] = mapped_column(String(512))
+    sha256: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, index=True)
+    size: Mapped[int] = mapped_column(Integer, default=0)
+    # Unix timestamps
+    created_at: Mapped[float] = mapped_column(Float)
+    last_access: Mapped[float] = mapped_column(Float)
+
+class MediaOwner(Base):
+    __tablename__ = "media_owners"
+    media_id: Mapped[int] = mapped_column(ForeignKey("media_files.id", ondelete="CASCADE"), primary_key=True)
+    word_id: Mapped[int] = mapped_column(ForeignKey("words.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+# Rendered audio belongs to the text it was rendered from: a word whose text
+# changes stops owning it (its own audio stays)
+MEDIA_OWNERS_DDL = (
+    "CREATE TRIGGER IF NOT EXISTS words_tts_au AFTER UPDATE OF word ON words "
+    "WHEN old.word IS NOT new.word BEGIN "
+    "DELETE FROM media_owners WHERE word_id = new.id "
+    "AND media_id IN (SELECT id FROM media_files WHERE kind = 'tts'); END",
+)
+for _ddl in MEDIA_OWNERS_DDL:
+    event.listen(MediaOwner.__table__, "after_create", DDL(_ddl).execute_if(dialect="sqlite"))
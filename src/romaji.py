@@ -0,0 +1,138 @@
+"""Romaji -> kana conversion.
+
+A longest-match trie over a Hepburn/IME romaji table, with the IME rules for
+sokuon (kk -> っk), ん (n', nn, n before a consonant) and small kana (xa, ltu).
+No third-party dependency, so every machine converts the same way.
+"""
+from functools import lru_cache
+from typing import Dict, Tuple
+
+_VOWELS = "aiueo"
+
+def _table() -> Dict[str, str]:
+    t: Dict[str, str] = {}
+    rows = {
+        "": "あいうえお", "k": "かきくけこ", "s": "さしすせそ", "t": "たちつてと",
+        "n": "なにぬねの", "h": "はひふへほ", "m": "まみむめも", "r": "らりるれろ",
+        "g": "がぎぐげご", "z": "ざじずぜぞ", "d": "だぢづでど", "b": "ばびぶべぼ",
+        "p": "ぱぴぷぺぽ",
+    }
+    for c, kana in rows.items():
+        for v, k in zip(_VOWELS, kana):
+            t[c + v] = k
+    t.update({"ya": "や", "yu": "ゆ", "yo": "よ", "ye": "いぇ", "wa": "わ", "wi": "うぃ", "we": "うぇ", "wo": "を",
+              "shi": "し", "chi": "ち", "tsu": "つ", "fu": "ふ", "ji": "じ", "si": "し", "ti": "ち", "tu": "つ",
+              "hu": "ふ", "zi": "じ", "di": "ぢ", "du": "づ", "dzu": "づ", "vu": "ゔ"})
+    # Palatalized (kya, sha, ...)
+    y_small = {"a": "ゃ", "u": "ゅ", "o": "ょ"}
+    for c, i_kana in (("k", "き"), ("s", "し"), ("t", "ち"), ("n", "に"), ("h", "ひ"), ("m", "み"), ("r", "り"),
+                      ("g", "ぎ"), ("z", "じ"), ("d", "ぢ"), ("b", "び"), ("p", "ぴ"), ("j", "じ"), ("c", "ち")):
+        for v, small in y_small.items():
+            t[c + "y" + v] = i_kana + small
+    for c, i_kana in (("sh", "し"), ("ch", "ち"), ("j", "じ")):
+        for v, small in y_small.items():
+            t[c + v] = i_kana + small
+        t[c + "e"] = i_kana + "ぇ"
+    # Foreign-sound extensions
+    for v, small in zip(_VOWELS, "ぁぃぅぇぉ"):
+        t["f" + v] = "ふ" + small if v != "u" else "ふ"
+        t["v" + v] = "ゔ" + small if v != "u" else "ゔ"
+        t["x" + v] = t["l" + v] = small
+    t.update({"thi": "てぃ", "dhi": "でぃ", "twu": "とぅ", "dwu": "どぅ", "tsa": "つぁ",
+              "xya": "ゃ", "xyu": "ゅ", "xyo": "ょ", "lya": "ゃ", "lyu": "ゅ", "lyo": "ょ",
+              "xtu": "っ", "ltu": "っ", "xtsu": "っ", "ltsu": "っ", "xwa": "ゎ", "lwa": "ゎ",
+              "xka": "ゕ", "xke": "ゖ", "nn": "ん", "n'": "ん", "-": "ー"})
+    return t
+
+ROMAJI_TABLE = _table()
+
+def _build_trie(table: Dict[str, str]) -> dict:
+    root: dict = {}
+    for rom, kana in table.items():
+        node = root
+        for ch in rom:
+            node = node.setdefault(ch, {})
+        node[""] = kana
+    return root
+
+_TRIE = _build_trie(ROMAJI_TABLE)
+
+def _convert(s: str, partial: bool) -> Tuple[str, str]:
+    """Return (kana, pending). In partial mode a trailing prefix that could
+    still become kana ("k", "ky", "n") is left in `pending`."""
+    out = []
+    i = 0
+    n = len(s)
+    while i < n:
+        ch = s[i]
+        nxt = s[i + 1] if i + 1 < n else ""
+        # Sokuon: doubled consonant (never n), "tch" -> っch
+        if ch == nxt and ch not in _VOWELS and ch != "n" and ch.isalpha() and ch in _TRIE:
+            out.append("っ")
+            i += 1
+            continue
+        if ch == "t" and nxt == "c" and s[i + 2:i + 3] == "h":
+            out.append("っ")
+            i += 1
+            continue
+        if ch == "n":
+            if nxt == "":
+                if partial:
+                    return "".join(out), s[i:]
+                out.append("ん")
+                i += 1
+                continue
+            if nxt == "'":
+                out.append("ん")
+                i += 2
+                continue
+            if nxt == "n":
+                # "nna" -> んな, "nn" otherwise -> ん
+                after = s[i + 2:i + 3]
+                if after and (after in _VOWELS or after == "y"):
+                    out.append("ん")
+                    i += 1
+                else:
+                    out.append("ん")
+                    i += 2
+                continue
+            if nxt not in _VOWELS and nxt != "y":
+                out.append("ん")
+                i += 1
+                continue
+        # Longest match through the trie
+        node = _TRIE
+        j = i
+        best, best_end = None, i
+        while j < n and s[j] in node:
+            node = node[s[j]]
+            j += 1
+            if "" in node:
+                best, best_end = node[""], j
+        if partial and j == n and len(node) > (1 if "" in node else 0):
+            # Ran out of input while a longer match was still possible
+            return "".join(out), s[i:]
+        if best is None:
+            out.append(ch)
+            i += 1
+        else:
+            out.append(best)
+            i = best_end
+    return "".join(out), ""
+
+def _hira_to_kata(s: str) -> str:
+    return "".join(chr(ord(c) + 0x60) if "ぁ" <= c <= "ゖ" else c for c in s)
+
+@lru_cache(maxsize=8192)
+def to_hiragana(s: str) -> str:
+    return _convert(s.lower(), partial=False)[0]
+
+@lru_cache(maxsize=8192)
+def to_katakana(s: str) -> str:
+    return _hira_to_kata(to_hiragana(s))
+
+def convert_incremental(s: str, katakana: bool = False) -> str:
+    """For as-you-type input: convert what is unambiguous and keep the trailing
+    romaji that may still grow into kana (e.g. "kyo" + "u", "n" + "a")."""
+    kana, pending = _convert(s.lower(), partial=True)
+    return (_hira_to_kata(kana) if katakana else kana) + pending
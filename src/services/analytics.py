@@ -0,0 +1,168 @@
+"""Study analytics.
+
+Every review the journal writes also bumps one review_rollups row (local
+day x mode x WaniKani level), so streaks, daily counts and accuracy by mode
+or level read a few hundred rollup rows, never the review history. Leeches
+and the due forecast come from card_states. The array work (rolling
+accuracy, due histograms) is NumPy, imported on first use.
+"""
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, or_, select, tuple_
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from ..models import CardState, ReviewEvent, ReviewRollup, WKSubject, Word
+
+MODES = ("On'yomi", "Kun'yomi", "Meaning", "Listening")
+LEECH_LAPSES = 4
+
+def day_key(ts: float) -> str:
+    return time.strftime("%Y%m%d", time.localtime(ts))
+
+def _day(d: date) -> str:
+    return d.strftime("%Y%m%d")
+
+# --- write side ----------------------------------------------------------
+def kanji_levels(db: Session, ids: Iterable[int]) -> Dict[int, int]:
+    ids = list(set(ids))
+    levels = {}
+    for i in range(0, len(ids), 500):
+        levels.update(db.execute(select(WKSubject.id, WKSubject.level).where(WKSubject.id.in_(ids[i:i+500]))).all())
+    return levels
+
+def add_to_rollups(db: Session, events: Iterable[Dict], amended: Iterable[Dict] = ()):
+    """Count newly written review events and amended ones (wrong answers
+    turned correct) into review_rollups. Both are dicts with item_type,
+    item_id, mode and created_at; new events also have correct and
+    latency_ms. No commit."""
+    events, amended = list(events), list(amended)
+    if not events and not amended:
+        return
+    levels = kanji_levels(db, (e["item_id"] for e in events + amended if e["item_type"] == "kanji"))
+    def key(e: Dict) -> Tuple[str, str, int]:
+        level = levels.get(e["item_id"], 0) if e["item_type"] == "kanji" else 0
+        return day_key(e["created_at"]), e["mode"], level
+    acc = defaultdict(lambda: [0, 0, 0, 0]) # reviews, correct, latency_ms, timed
+    for e in events:
+        a = acc[key(e)]
+        a[0] += 1
+        a[1] += bool(e["correct"])
+        if e.get("latency_ms") is not None:
+            a[2] += int(e["latency_ms"])
+            a[3] += 1
+    for e in amended:
+        acc[key(e)][1] += 1
+    stmt = insert(ReviewRollup)
+    stmt = stmt.on_conflict_do_update(index_elements=["day", "mode", "level"], set_={
+        c: getattr(ReviewRollup, c) + stmt.excluded[c] for c in ("reviews", "correct", "latency_ms", "timed")})
+    db.execute(stmt, [{"day": k[0], "mode": k[1], "level": k[2], "reviews": a[0], "correct": a[1],
+                       "latency_ms": a[2], "timed": a[3]} for k, a in acc.items()])
+
+# --- queries -------------------------------------------------------------
+def daily(db: Session, days: int = 30, mode: Optional[str] = None,
+          today: Optional[date] = None) -> List[Tuple[str, int, int]]:
+    """(day, reviews, correct) for each of the last `days` days, oldest first."""
+    today = today or date.today()
+    first = today - timedelta(days=days - 1)
+    q = (select(ReviewRollup.day, func.sum(ReviewRollup.reviews), func.sum(ReviewRollup.correct))
+         .where(ReviewRollup.day >= _day(first), ReviewRollup.day <= _day(today)).group_by(ReviewRollup.day))
+    if mode:
+        q = q.where(ReviewRollup.mode == mode)
+    got = {d: (n, c) for d, n, c in db.execute(q)}
+    out = []
+    for i in range(days):
+        d = _day(first + timedelta(days=i))
+        out.append((d, *got.get(d, (0, 0))))
+    return out
+
+def streak(db: Session, today: Optional[date] = None) -> int:
+    """Consecutive days with at least one review, ending today (or
+    yesterday, if nothing has been reviewed yet today)."""
+    today = today or date.today()
+    n, expect = 0, today
+    for d in db.scalars(select(ReviewRollup.day).distinct().where(ReviewRollup.day <= _day(today))
+                        .order_by(ReviewRollup.day.desc())):
+        day = datetime.strptime(d, "%Y%m%d").date()
+        if day == expect:
+            n += 1
+            expect -= timedelta(days=1)
+        elif n == 0 and day == today - timedelta(days=1):
+            n, expect = 1, day - timedelta(days=1)
+        else:
+            break
+    return n
+
+def accuracy_trend(db: Session, days: int = 30, window: int = 7, mode: Optional[str] = None,
+                   today: Optional[date] = None) -> Dict:
+    """Daily reviews and accuracy for the last `days` days, plus accuracy over
+    a trailing `window` days (weighted by reviews). NaN where there is no data."""
+    import numpy as np
+    rows = daily(db, days + window - 1, mode, today)
+    n = np.array([r[1] for r in rows], dtype=float)
+    c = np.array([r[2] for r in rows], dtype=float)
+    kernel = np.ones(window)
+    rn, rc = np.convolve(n, kernel, "valid"), np.convolve(c, kernel, "valid")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        acc = np.where(n > 0, c / n, np.nan)[window - 1:]
+        rolling = np.where(rn > 0, rc / rn, np.nan)
+    return {"days": [r[0] for r in rows[window - 1:]], "reviews": n[window - 1:].astype(int),
+            "accuracy": acc, "rolling": rolling}
+
+def accuracy_by(db: Session, column: str = "mode", days: Optional[int] = None,
+                today: Optional[date] = None) -> List[Tuple]:
+    """(mode or level, reviews, correct, mean latency ms) over the last `days`
+    days, or all time."""
+    key = getattr(ReviewRollup, column)
+    q = (select(key, func.sum(ReviewRollup.reviews), func.sum(ReviewRollup.correct),
+                func.sum(ReviewRollup.latency_ms) * 1.0 / func.nullif(func.sum(ReviewRollup.timed), 0))
+         .group_by(key).order_by(key))
+    if days is not None:
+        q = q.where(ReviewRollup.day >= _day((today or date.today()) - timedelta(days=days - 1)))
+    return [tuple(r) for r in db.execute(q)]
+
+def leeches(db: Session, limit: int = 20, min_lapses: int = LEECH_LAPSES) -> List[Dict]:
+    """Cards forgotten at least `min_lapses` times, worst first, with their
+    lifetime accuracy."""
+    cards = db.execute(
+        select(CardState.item_type, CardState.item_id, CardState.mode, CardState.lapses, CardState.reps)
+        .where(CardState.lapses >= min_lapses).order_by(CardState.lapses.desc(), CardState.reps).limit(limit)).all()
+    if not cards:
+        return []
+    keys = [(t, i, m) for t, i, m, _, _ in cards]
+    hist = {(t, i, m): (n, c) for t, i, m, n, c in db.execute(
+        select(ReviewEvent.item_type, ReviewEvent.item_id, ReviewEvent.mode, func.count(),
+               func.sum(ReviewEvent.correct))
+        .where(tuple_(ReviewEvent.item_type, ReviewEvent.item_id, ReviewEvent.mode).in_(keys))
+        .group_by(ReviewEvent.item_type, ReviewEvent.item_id, ReviewEvent.mode))}
+    kanji = [i for t, i, *_ in cards if t == "kanji"]
+    words = [i for t, i, *_ in cards if t == "word"]
+    labels = {("kanji", i): s for i, s in db.execute(
+        select(WKSubject.id, WKSubject.characters).where(WKSubject.id.in_(kanji)))} if kanji else {}
+    labels.update({("word", i): s for i, s in db.execute(select(Word.id, Word.word).where(Word.id.in_(words)))}
+                  if words else {})
+    out = []
+    for t, i, m, lapses, reps in cards:
+        n, c = hist.get((t, i, m), (0, 0))
+        out.append({"item_type": t, "item_id": i, "mode": m, "label": labels.get((t, i)) or f"#{i}",
+                    "lapses": lapses, "reps": reps, "reviews": n, "accuracy": c / n if n else None})
+    return out
+
+def forecast(db: Session, days: int = 7, mode: Optional[str] = None,
+             now: Optional[float] = None) -> List[Tuple[str, int]]:
+    """(day, cards due) for today and the following days; anything overdue
+    counts as due today."""
+    import numpy as np
+    now = time.time() if now is None else now
+    today = datetime.fromtimestamp(now).date()
+    # Local midnights, so a DST change does not shift the buckets
+    edges = [datetime.combine(today + timedelta(days=k), datetime.min.time()).timestamp()
+             for k in range(1, days + 1)]
+    # A lapse resets reps, but the card is still scheduled
+    q = select(CardState.due_at).where(or_(CardState.reps > 0, CardState.lapses > 0), CardState.due_at < edges[-1])
+    if mode:
+        q = q.where(CardState.mode == mode)
+    due = np.fromiter(db.scalars(q), dtype=float)
+    counts, _ = np.histogram(due, bins=[-np.inf] + edges)
+    return [(_day(today + timedelta(days=k)), int(n)) for k, n in enumerate(counts)]
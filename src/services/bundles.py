@@ -0,0 +1,162 @@
+"""Daily listening bundles: an ordered list of words per date (bundle_items).
+
+Generated bundles are sampled in SQL. Random ids are drawn in the id range of
+the vocabulary (or of the first required tag) and each is resolved to the next
+existing id with one index seek, all in a single statement; the most overdue
+listening cards are added from the due-time index. Candidates are then weighted
+towards words missed often or not seen for a while and sampled without
+replacement. The cost depends on the bundle size, not on the vocabulary size.
+Sampling by id range favours ids that follow a gap; with autoincrement ids and
+occasional deletes that bias is small.
+"""
+import random
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert
+from ..config import config
+from ..models import BundleItem, CardState, DailyBundle, Tag, Word, WordTag
+from .tags import parse_tag_query
+
+DAY = 86400.0
+OVERSAMPLE = 4 # candidates drawn per bundle slot
+MISS_WEIGHT = 1.0 # per lapse
+STALE_WEIGHT = 0.5 # per week since last seen, capped at STALE_CAP weeks
+STALE_CAP = 8
+OVERDUE_WEIGHT = 2.0
+NEW_WEIGHT = 1.5
+DRAW_CHUNK = 200 # picks per statement; SQLite allows 2000 result columns
+
+def bundle_ids(db, yyyymmdd: str) -> Optional[List[int]]:
+    """Word ids of the bundle in order, or None if there is no bundle that day."""
+    bid = db.scalar(select(DailyBundle.id).where(DailyBundle.yyyymmdd == yyyymmdd))
+    if bid is None:
+        return None
+    return list(db.scalars(select(BundleItem.word_id).where(BundleItem.bundle_id == bid)
+                           .order_by(BundleItem.position)))
+
+def bundle_words(db, yyyymmdd: str) -> Optional[List[Word]]:
+    bid = db.scalar(select(DailyBundle.id).where(DailyBundle.yyyymmdd == yyyymmdd))
+    if bid is None:
+        return None
+    q = (select(Word).join(BundleItem, BundleItem.word_id == Word.id)
+         .where(BundleItem.bundle_id == bid).order_by(BundleItem.position))
+    return list(db.scalars(q))
+
+def save_bundle(db, yyyymmdd: str, word_ids: Sequence[int]) -> int:
+    """Create or replace the bundle for a date (no commit). Returns its id."""
+    db.execute(insert(DailyBundle).values(yyyymmdd=yyyymmdd).on_conflict_do_nothing(index_elements=["yyyymmdd"]))
+    bid = db.scalar(select(DailyBundle.id).where(DailyBundle.yyyymmdd == yyyymmdd))
+    db.execute(delete(BundleItem).where(BundleItem.bundle_id == bid))
+    ids = list(dict.fromkeys(word_ids))
+    if ids:
+        db.execute(insert(BundleItem), [{"bundle_id": bid, "position": n, "word_id": w} for n, w in enumerate(ids)])
+    return bid
+
+# --- generation -----------------------------------------------------------
+def _tag_ids(db, names: Sequence[str]) -> Optional[List[int]]:
+    # None if a named tag does not exist
+    if not names:
+        return []
+    found = {n.casefold(): i for i, n in db.execute(select(Tag.id, Tag.name).where(Tag.name.in_(names)))}
+    ids = [found.get(n.casefold()) for n in names]
+    return None if None in ids else ids
+
+def _draw(db, n: int, tag_id: Optional[int], rng: random.Random) -> List[int]:
+    """Up to n distinct random word ids (of one tag, if given)."""
+    if tag_id is None:
+        col, where = Word.id, []
+    else:
+        col, where = WordTag.word_id, [WordTag.tag_id == tag_id]
+    lo = db.scalar(select(col).where(*where).order_by(col).limit(1))
+    if lo is None:
+        return []
+    hi = db.scalar(select(col).where(*where).order_by(col.desc()).limit(1))
+    if hi - lo + 1 <= n:
+        return list(db.scalars(select(col).where(*where)))
+    found = []
+    for start in range(0, n, DRAW_CHUNK):
+        picks = [select(col).where(*where, col >= rng.randint(lo, hi)).order_by(col).limit(1).scalar_subquery()
+                 for _ in range(min(DRAW_CHUNK, n - start))]
+        # One index seek per pick, DRAW_CHUNK picks per statement
+        found.extend(db.execute(select(*picks)).one())
+    return list(dict.fromkeys(i for i in found if i is not None))
+
+def _overdue(db, n: int, now: float) -> List[int]:
+    q = (select(CardState.item_id).where(CardState.item_type == "word", CardState.mode == "Listening",
+                                         CardState.due_at <= now)
+         .order_by(CardState.due_at).limit(n))
+    return list(db.scalars(q))
+
+def _keep(db, ids: List[int], all_of: List[int], none_of: List[int]) -> List[int]:
+    # Tag checks on a small candidate set: word_tags primary-key lookups
+    if not ids:
+        return ids
+    keep = set(db.scalars(select(Word.id).where(Word.id.in_(ids))))
+    for tid in all_of:
+        keep &= set(db.scalars(select(WordTag.word_id).where(WordTag.tag_id == tid, WordTag.word_id.in_(ids))))
+    if none_of:
+        keep -= set(db.scalars(select(WordTag.word_id).where(WordTag.tag_id.in_(none_of), WordTag.word_id.in_(ids))))
+    return [i for i in ids if i in keep]
+
+def _weights(db, ids: List[int], now: float) -> Dict[int, float]:
+    w = {i: NEW_WEIGHT for i in ids}
+    q = select(CardState.item_id, CardState.lapses, CardState.last_review_at, CardState.due_at).where(
+        CardState.item_type == "word", CardState.mode == "Listening", CardState.item_id.in_(ids))
+    for item_id, lapses, last, due in db.execute(q):
+        weeks = (now - last) / (7 * DAY) if last else STALE_CAP
+        w[item_id] = (1.0 + MISS_WEIGHT * lapses + STALE_WEIGHT * min(weeks, STALE_CAP)
+                      + (OVERDUE_WEIGHT if due <= now else 0.0))
+    return w
+
+def generate_bundle(db, size: Optional[int] = None, tags: Optional[str] = None, now: Optional[float] = None,
+                    exclude: Iterable[int] = (), rng: Optional[random.Random] = None) -> List[int]:
+    """Pick up to `size` word ids for a bundle. tags: e.g. "n5, -archaic"."""
+    size = config.BUNDLE_SIZE if size is None else size
+    tags = config.BUNDLE_TAGS if tags is None else tags
+    now = time.time() if now is None else now
+    rng = rng or random.Random()
+    exclude = set(exclude)
+    all_names, none_names = parse_tag_query(tags)
+    all_of = _tag_ids(db, all_names)
+    if all_of is None or size <= 0:
+        return []
+    # Excluding a tag nobody has is a no-op
+    none_of = [t for n in none_names for t in (_tag_ids(db, [n]) or [])]
+
+    want = size * OVERSAMPLE
+    first = all_of[0] if all_of else None
+    cands = [i for i in _overdue(db, size, now) + _draw(db, want, first, rng) if i not in exclude]
+    cands = _keep(db, list(dict.fromkeys(cands)), all_of, none_of)
+    if len(cands) < size:
+        # Sparse match (tags, exclusions): one more, larger draw
+        more = [i for i in _draw(db, want * 4, first, rng) if i not in exclude and i not in cands]
+        cands += _keep(db, more, all_of, none_of)
+    weights = _weights(db, cands, now)
+    # Weighted sampling without replacement (Efraimidis-Spirakis keys)
+    keyed = sorted(cands, key=lambda i: rng.random() ** (1.0 / weights[i]), reverse=True)
+    return keyed[:size]
+
+def day_key(d: date) -> str:
+    return d.strftime("%Y%m%d")
+
+def plan_bundles(db, start: date, days: int, size: Optional[int] = None, tags: Optional[str] = None,
+                 rng: Optional[random.Random] = None) -> Dict[str, List[int]]:
+    """Generate bundles for `days` days from `start`, skipping days that
+    already have one and not repeating words between the new bundles. No
+    commit: the caller commits them as one transaction."""
+    keys = [day_key(start + timedelta(days=n)) for n in range(days)]
+    taken = set(db.scalars(select(DailyBundle.yyyymmdd).where(DailyBundle.yyyymmdd.in_(keys))))
+    used: Set[int] = set()
+    out = {}
+    for key in keys:
+        if key in taken:
+            continue
+        ids = generate_bundle(db, size, tags, exclude=used, rng=rng)
+        if not ids:
+            break
+        used.update(ids)
+        save_bundle(db, key, ids)
+        out[key] = ids
+    return out
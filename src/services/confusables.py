@@ -0,0 +1,160 @@
+"""Kanji that are easy to mix up, for multiple-choice distractors.
+
+For every stored kanji and practice mode the index keeps its NEIGHBOURS most
+confusable kanji, scored as a mix of shared components (Jaccard overlap of
+WaniKani component_subject_ids) and similar answers: rapidfuzz
+token_set_ratio over the meanings, or over that mode's readings. The text
+scores come from one process.cdist call per mode and the component overlap
+from one matrix product, so all ~2,000 WaniKani kanji take a few seconds.
+
+The index is saved to CONFUSABLES_PATH with a fingerprint of the subject
+store and only rebuilt when that changes (see load_or_build). Picking
+distractors then only looks at one card's neighbours.
+"""
+import os
+import random
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from sqlalchemy.orm import Session
+from ..config import config
+from ..utils.perf import traced
+from . import wk_store
+
+NEIGHBOURS = 12
+SHAPE_WEIGHT = 0.5
+TEXT_WEIGHT = 0.5
+# npz keys per practice mode
+MODE_KEYS = {"Meaning": "meaning", "On'yomi": "onyomi", "Kun'yomi": "kunyomi"}
+
+class ConfusableIndex:
+    def __init__(self, ids, neighbours: Dict, key: str = ""):
+        self.ids = ids
+        self.pos = {int(s): i for i, s in enumerate(ids)}
+        self.neighbours = neighbours # mode -> (n, NEIGHBOURS) array of subject ids, -1 for none
+        self.key = key
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def similar(self, sid: int, mode: str) -> List[int]:
+        """Most confusable first."""
+        i = self.pos.get(sid)
+        if i is None or mode not in self.neighbours:
+            return []
+        return [int(x) for x in self.neighbours[mode][i] if x >= 0]
+
+    def save(self, path: Path):
+        import numpy as np
+        path = Path(path)
+        tmp = path.with_name(path.name + ".part")
+        with open(tmp, "wb") as f:
+            np.savez(f, ids=self.ids, key=np.array(self.key),
+                     **{MODE_KEYS[m]: a for m, a in self.neighbours.items()})
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "ConfusableIndex":
+        import numpy as np
+        with np.load(path) as z:
+            return cls(z["ids"], {m: z[k] for m, k in MODE_KEYS.items() if k in z.files}, str(z["key"]))
+
+def _top(scores, ids, k: int):
+    """Ids of the k best-scoring columns per row, best first; -1 past the
+    columns that are ruled out (-inf)."""
+    import numpy as np
+    k = min(k, scores.shape[1] - 1)
+    if k <= 0:
+        return np.full((scores.shape[0], 0), -1, dtype=np.int64)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(-scores, part, axis=1).argsort(axis=1, kind="stable")
+    best = np.take_along_axis(part, order, axis=1)
+    out = ids[best]
+    out[~np.isfinite(np.take_along_axis(scores, best, axis=1))] = -1
+    return out
+
+def component_overlap(comps: List[List[int]]):
+    """n x n Jaccard similarity of component sets."""
+    import numpy as np
+    col = {c: j for j, c in enumerate(sorted({c for cs in comps for c in cs}))}
+    m = np.zeros((len(comps), max(1, len(col))), dtype=np.float32)
+    for i, cs in enumerate(comps):
+        m[i, [col[c] for c in cs]] = 1.0
+    inter = m @ m.T
+    size = m.sum(axis=1)
+    union = size[:, None] + size[None, :] - inter
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(union > 0, inter / union, 0.0).astype(np.float32)
+
+@traced("confusables.build")
+def build(items: List[Dict], comps: Dict[int, List[int]], k: int = NEIGHBOURS, key: str = "",
+          progress: Optional[Callable[[str], None]] = None) -> ConfusableIndex:
+    """Index over practice items (wk_store.load_kanji(db) shape)."""
+    import numpy as np
+    from rapidfuzz import fuzz, process
+    progress = progress or (lambda msg: None)
+    ids = np.array([it["id"] for it in items], dtype=np.int64)
+    progress("Comparing kanji components…")
+    shape = component_overlap([comps.get(it["id"], []) for it in items])
+    texts = {"Meaning": ["; ".join(it["meanings"]).lower() for it in items]}
+    for mode, rtype in wk_store.MODE_READING_TYPE.items():
+        texts[mode] = [" ".join(r["reading"] for r in it["readings"] if r["type"] == rtype) for it in items]
+    neighbours = {}
+    for mode, strings in texts.items():
+        progress(f"Comparing {mode.lower()} answers…")
+        sim = process.cdist(strings, strings, scorer=fuzz.token_set_ratio, dtype=np.float32, workers=-1)
+        scores = SHAPE_WEIGHT * shape + TEXT_WEIGHT * sim / 100.0
+        # Nothing to show for kanji without an answer in this mode
+        has = np.array([bool(s) for s in strings])
+        scores[:, ~has] = -np.inf
+        np.fill_diagonal(scores, -np.inf)
+        neighbours[mode] = _top(scores, ids, k)
+    return ConfusableIndex(ids, neighbours, key)
+
+class IndexCancelled(Exception):
+    pass
+
+_lock = threading.Lock()
+_index: Optional[ConfusableIndex] = None
+
+def load_or_build(db: Session, path: Optional[str] = None, progress: Optional[Callable[[str], None]] = None,
+                  cancel: Optional[threading.Event] = None) -> ConfusableIndex:
+    """The index for the current subject store: the one in memory or on disk
+    if it still matches, otherwise a fresh build (then saved). Safe to call
+    off the UI thread; `cancel` is checked before a build starts."""
+    global _index
+    path = Path(path or config.CONFUSABLES_PATH)
+    key = wk_store.fingerprint(db)
+    with _lock:
+        if _index is not None and _index.key == key:
+            return _index
+        if path.exists():
+            try:
+                idx = ConfusableIndex.load(path)
+            except (OSError, ValueError, KeyError):
+                idx = None # unreadable: rebuild over it
+            if idx is not None and idx.key == key:
+                _index = idx
+                return idx
+        items = wk_store.load_kanji(db)
+        comps = wk_store.components(db)
+        if cancel is not None and cancel.is_set():
+            raise IndexCancelled()
+        idx = build(items, comps, key=key, progress=progress)
+        idx.save(path)
+        _index = idx
+        return idx
+
+def distractors(index: ConfusableIndex, sid: int, mode: str, n: int, usable: Callable[[int], bool],
+                rng: Optional[random.Random] = None) -> List[int]:
+    """Up to n neighbours of `sid` that pass `usable` (e.g. not also a right
+    answer), drawn from the 2n most confusable so cards do not always get
+    the same set."""
+    rng = rng or random
+    pool = []
+    for other in index.similar(sid, mode):
+        if usable(other):
+            pool.append(other)
+            if len(pool) >= 2 * n:
+                break
+    return rng.sample(pool, min(n, len(pool)))
@@ -0,0 +1,253 @@
+"""Write-behind review journal.
+
+Answers are appended to a small journal file (one JSON line, flushed to the OS
+but not fsynced) and buffered in memory; a background thread writes them to
+SQLite in one transaction every JOURNAL_FLUSH_SECONDS, after which the journal
+is truncated. Lines left over from a crash are replayed on start. Replays are
+idempotent: each event carries a uid and amendments only apply once.
+"""
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from ..config import config
+from ..db import SessionLocal
+from ..models import CardState, ReviewEvent
+from ..utils.perf import traced
+from .analytics import add_to_rollups
+from .srs import Card, get_or_create_stats
+
+CARD_FIELDS = ("stability", "difficulty", "reps", "lapses", "due_at", "last_review_at", "introduced_at")
+
+class ReviewJournal:
+    def __init__(self, path: Optional[str] = None, session_factory: Callable[[], Session] = SessionLocal,
+                 interval: Optional[float] = None):
+        self.path = Path(path or config.JOURNAL_PATH)
+        self.session_factory = session_factory
+        self.interval = config.JOURNAL_FLUSH_SECONDS if interval is None else interval
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._pending: List[Dict] = []
+        self._cards: Dict[Tuple[str, int, str], Card] = {}
+        self._fh = None
+        self._totals: Optional[List[int]] = None # total, correct, wrong (DB + pending)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[Dict], None]] = []
+
+    # --- lifecycle -------------------------------------------------------
+    def start(self):
+        """Replay leftovers from a previous run, read the counters and start
+        the flush thread."""
+        self.replay()
+        self._prime()
+        if self._thread is None and self.interval > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="review-journal", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                # Keep the journal; the next flush (or the next start) retries
+                traceback.print_exc()
+
+    # --- writes ----------------------------------------------------------
+    def _append(self, entry: Dict):
+        if self._fh is None:
+            self._fh = open(self.path, "a", encoding="utf-8")
+        self._fh.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._fh.flush()
+
+    def _prime(self):
+        # The DB counters plus what is pending; no flush runs in between
+        with self._flush_lock:
+            with self.session_factory() as db:
+                s = get_or_create_stats(db)
+                totals = [s.total_reviews, s.correct_answers, s.wrong_answers]
+            with self._lock:
+                self._totals = totals
+                for e in self._pending:
+                    self._count(e)
+
+    def record(self, item_type: str, item_id: int, mode: str, correct: bool,
+               card: Optional[Card] = None, latency_ms: Optional[int] = None) -> str:
+        """Log one answer (and the card's new schedule). Returns the event uid."""
+        entry = {
+            "op": "review", "uid": uuid.uuid4().hex, "item_type": item_type, "item_id": item_id,
+            "mode": mode, "correct": bool(correct), "latency_ms": latency_ms, "ts": time.time(),
+            "card": asdict(card) if card is not None else None,
+        }
+        with self._lock:
+            self._append(entry)
+            self._pending.append(entry)
+            self._apply_local(entry)
+        self._notify(entry)
+        return entry["uid"]
+
+    def amend(self, uid: str, item_type: str, item_id: int, mode: str, card: Optional[Card] = None):
+        """Turn a wrong answer into a correct one (typo forgiveness)."""
+        entry = {"op": "amend", "uid": uid, "item_type": item_type, "item_id": item_id, "mode": mode,
+                 "card": asdict(card) if card is not None else None}
+        with self._lock:
+            self._append(entry)
+            self._pending.append(entry)
+            self._apply_local(entry)
+        self._notify(entry)
+
+    def _count(self, entry: Dict):
+        if entry["op"] == "review":
+            self._totals[0] += 1
+            self._totals[1 if entry["correct"] else 2] += 1
+        else:
+            self._totals[1] += 1
+            self._totals[2] = max(0, self._totals[2] - 1)
+
+    def _apply_local(self, entry: Dict):
+        if self._totals is not None:
+            self._count(entry)
+        if entry["card"] is not None:
+            self._cards[(entry["item_type"], entry["item_id"], entry["mode"])] = Card(**entry["card"])
+
+    # --- reads -----------------------------------------------------------
+    def totals(self) -> Tuple[int, int, int]:
+        """(total, correct, wrong) including answers not yet flushed."""
+        if self._totals is None:
+            self._prime()
+        with self._lock:
+            return tuple(self._totals)
+
+    def pending_cards(self, item_type: str, mode: str) -> Dict[int, Card]:
+        """Card states recorded but not yet flushed, by item id."""
+        with self._lock:
+            return {k[1]: c for k, c in self._cards.items() if k[0] == item_type and k[2] == mode}
+
+    def add_listener(self, fn: Callable[[Dict], None]):
+        # fn(entry) is called on the writer's thread after each record/amend
+        self._listeners.append(fn)
+
+    def _notify(self, entry: Dict):
+        for fn in list(self._listeners):
+            fn(entry)
+
+    # --- flush -----------------------------------------------------------
+    @traced("journal.flush")
+    def flush(self) -> int:
+        """Write buffered entries to SQLite in one transaction. Returns the
+        number of entries written."""
+        with self._flush_lock:
+            with self._lock:
+                batch = self._pending
+                cards = self._cards
+                self._pending = []
+                self._cards = {}
+            if not batch:
+                return 0
+            try:
+                with self.session_factory() as db:
+                    self._write(db, batch, cards)
+                    db.commit()
+            except Exception:
+                with self._lock:
+                    # Put the batch back in front of anything recorded meanwhile
+                    self._pending = batch + self._pending
+                    for k, c in cards.items():
+                        self._cards.setdefault(k, c)
+                raise
+            with self._lock:
+                if not self._pending and self._fh is not None:
+                    # Everything in the file is now in the DB
+                    self._fh.truncate(0)
+                    self._fh.seek(0)
+            return len(batch)
+
+    def _write(self, db: Session, batch: List[Dict], cards: Dict[Tuple[str, int, str], Card]):
+        uids = [e["uid"] for e in batch if e["op"] == "review"]
+        existing = set()
+        for i in range(0, len(uids), 500):
+            existing.update(db.scalars(select(ReviewEvent.uid).where(ReviewEvent.uid.in_(uids[i:i+500]))))
+        rows = [{
+            "uid": e["uid"], "item_type": e["item_type"], "item_id": e["item_id"], "mode": e["mode"],
+            "correct": e["correct"], "latency_ms": e["latency_ms"], "created_at": e["ts"],
+        } for e in batch if e["op"] == "review" and e["uid"] not in existing]
+        total = len(rows)
+        correct = sum(1 for r in rows if r["correct"])
+        wrong = total - correct
+        if rows:
+            db.execute(insert(ReviewEvent), rows)
+        amended = []
+        for e in batch:
+            if e["op"] != "amend":
+                continue
+            row = db.execute(update(ReviewEvent).where(ReviewEvent.uid == e["uid"], ReviewEvent.correct.is_(False))
+                             .values(correct=True).returning(ReviewEvent.item_type, ReviewEvent.item_id,
+                                                             ReviewEvent.mode, ReviewEvent.created_at)).first()
+            if row is not None:
+                amended.append(row._asdict())
+                correct += 1
+                wrong -= 1
+        add_to_rollups(db, rows, amended)
+
+        if total or correct or wrong:
+            s = get_or_create_stats(db)
+            s.total_reviews += total
+            s.correct_answers += correct
+            s.wrong_answers = max(0, s.wrong_answers + wrong)
+
+        if cards:
+            crow = [{"item_type": k[0], "item_id": k[1], "mode": k[2], **{f: getattr(c, f) for f in CARD_FIELDS}}
+                    for k, c in cards.items()]
+            stmt = insert(CardState)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["item_type", "item_id", "mode"],
+                set_={f: stmt.excluded[f] for f in CARD_FIELDS},
+            )
+            db.execute(stmt, crow)
+
+    def replay(self):
+        """Apply journal lines left by a run that did not shut down cleanly."""
+        with self._lock:
+            if self._fh is not None or not self.path.exists():
+                return
+            entries = []
+            with open(self.path, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        # Torn last line from a crash mid-write
+                        break
+            if entries:
+                self._pending = entries + self._pending
+                for e in entries:
+                    if e.get("card") is not None:
+                        self._cards[(e["item_type"], e["item_id"], e["mode"])] = Card(**e["card"])
+        self.flush()
+        with self._lock:
+            if not self._pending and self.path.exists():
+                os.truncate(self.path, 0)
+            # Counters are re-read from the DB on next use
+            self._totals = None
+
+journal = ReviewJournal()
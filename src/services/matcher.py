@@ -0,0 +1,101 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+from rapidfuzz import fuzz, process
+from ..config import config
+from .romaji import to_hiragana, normalize_english
+
+CORRECT = "correct"
+TYPO = "typo"
+WRONG = "wrong"
+
+READING_MODES = ("On'yomi", "Kun'yomi")
+# Answers this short must be exact; one edit is already a different word
+MIN_FUZZY_LEN = 4
+
+_KATAKANA = {c: c - 0x60 for c in range(0x30A1, 0x30F7)}
+_PARENS = re.compile(r"\s*\([^)]*\)\s*")
+_GLOSS_SPLIT = re.compile(r"[;,/]")
+
+@dataclass(frozen=True)
+class Compiled:
+    exact: frozenset
+    choices: tuple # the same answers, as a sequence for rapidfuzz
+    display: tuple
+
+@dataclass(frozen=True)
+class Match:
+    verdict: str
+    expected: str = ""
+    score: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.verdict != WRONG
+
+def kata_to_hira(s: str) -> str:
+    return s.translate(_KATAKANA)
+
+def normalize_reading(s: str) -> str:
+    return kata_to_hira(to_hiragana(s.strip())).replace(".", "").replace(" ", "")
+
+def split_glosses(text: str) -> List[str]:
+    """'to eat; meal, (a) dish' -> ['to eat', 'meal', '(a) dish', 'dish']"""
+    out = []
+    for part in _GLOSS_SPLIT.split(text or ""):
+        part = normalize_english(part)
+        if not part:
+            continue
+        out.append(part)
+        bare = normalize_english(_PARENS.sub(" ", part))
+        if bare and bare != part:
+            out.append(bare)
+    return out
+
+def _compile(answers: Iterable[str], display: Iterable[str]) -> Compiled:
+    answers = tuple(dict.fromkeys(a for a in answers if a))
+    return Compiled(frozenset(answers), answers, tuple(display))
+
+class AnswerMatcher:
+    """Answers are normalized once per deck; a submit is then a set lookup plus,
+    on a miss, one bounded rapidfuzz scan over that item's few answers."""
+    def __init__(self, cutoffs: Optional[Dict[str, float]] = None):
+        self.cutoffs = {
+            "On'yomi": config.MATCH_READING_CUTOFF,
+            "Kun'yomi": config.MATCH_READING_CUTOFF,
+            "Meaning": config.MATCH_MEANING_CUTOFF,
+            "Listening": config.MATCH_LISTENING_CUTOFF,
+        }
+        self.cutoffs.update(cutoffs or {})
+
+    def compile_kanji(self, item: Dict, mode: str) -> Compiled:
+        if mode in READING_MODES:
+            t = "onyomi" if mode.startswith("On") else "kunyomi"
+            readings = [r["reading"] for r in item.get("readings", []) if r.get("type") == t]
+            return _compile((kata_to_hira(r).replace(".", "") for r in readings), readings)
+        meanings = item.get("meanings", [])
+        accepted = list(meanings) + list(item.get("auxiliary_meanings", []))
+        return _compile((g for m in accepted for g in split_glosses(m)), meanings)
+
+    def compile_translation(self, translation: str) -> Compiled:
+        return _compile(split_glosses(translation), [translation or ""])
+
+    def compile_deck(self, items: Iterable[Dict], mode: str) -> Dict[int, Compiled]:
+        return {it["id"]: self.compile_kanji(it, mode) for it in items}
+
+    def normalize_guess(self, guess: str, mode: str) -> str:
+        return normalize_reading(guess) if mode in READING_MODES else normalize_english(guess)
+
+    def match(self, compiled: Compiled, guess: str, mode: str) -> Match:
+        g = self.normalize_guess(guess, mode)
+        if not g:
+            return Match(WRONG)
+        if g in compiled.exact:
+            return Match(CORRECT, g, 100.0)
+        cutoff = self.cutoffs.get(mode, 100.0)
+        if cutoff >= 100 or len(g) < MIN_FUZZY_LEN or not compiled.choices:
+            return Match(WRONG)
+        hit = process.extractOne(g, compiled.choices, scorer=fuzz.ratio, score_cutoff=cutoff)
+        if hit is None:
+            return Match(WRONG)
+        return Match(TYPO, hit[0], hit[1])
@@ -0,0 +1,290 @@
+"""Audio media store.
+
+Every audio file the app knows about has a row in media_files, linked to the
+words it belongs to through media_owners, so "does this word have audio?" is
+an index lookup rather than a stat() of the file.
+
+Rendered (TTS) audio is content-addressed: stored as <media dir>/ab/<sha256>
+and looked up by the key it was rendered from. It counts against
+MEDIA_BUDGET_MB; once the store is over budget the least recently played
+rendered files are deleted (they can always be rendered again). User audio
+(Word.audio_path) is recorded but never moved or evicted.
+
+verify() reconciles the manifest with the disk: rows whose file is gone are
+dropped, files in the store nobody references (including audio named the
+pre-manifest way) are removed, and user audio not yet in the manifest is
+added.
+"""
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Sequence, Set, Tuple
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from ..config import config
+from ..db import SessionLocal
+from ..models import MediaFile, MediaOwner, Word
+
+TTS, USER = "tts", "user"
+TMP_DIR = ".tmp"
+
+def user_key(word_id: int) -> str:
+    return f"user:{word_id}"
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()
+
+@dataclass
+class VerifyReport:
+    missing: int = 0 # manifest rows whose file is gone
+    orphans: int = 0 # files in the store with no manifest row
+    adopted: int = 0 # user audio added to the manifest
+    evicted: int = 0
+
+    def __str__(self) -> str:
+        return (f"{self.missing} missing, {self.orphans} orphaned, "
+                f"{self.adopted} user file(s) added, {self.evicted} evicted")
+
+class MediaStore:
+    def __init__(self, root: Optional[Path] = None, session_factory: Callable[[], Session] = SessionLocal,
+                 budget_mb: Optional[float] = None):
+        self._root = Path(root) if root is not None else None
+        self.session_factory = session_factory
+        self.budget = int((config.MEDIA_BUDGET_MB if budget_mb is None else budget_mb) * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._touched: Dict[int, float] = {} # media id -> last access, written lazily
+        self._tts_bytes: Optional[int] = None
+
+    @property
+    def root(self) -> Path:
+        if self._root is None:
+            self._root = config.media_path
+        return self._root
+
+    def abspath(self, kind: str, path: str) -> Path:
+        return Path(path) if kind == USER else self.root / path
+
+    # --- lookups ---------------------------------------------------------
+    def get(self, key: str) -> Optional[Path]:
+        """Path of the file stored under `key`, and mark it as used."""
+        with self.session_factory() as db:
+            row = db.execute(select(MediaFile.id, MediaFile.kind, MediaFile.path)
+                             .where(MediaFile.key == key)).first()
+            if row is None:
+                return None
+            path = self.abspath(row[1], row[2])
+            if not path.is_file():
+                # Deleted behind our back; forget it so it gets rendered again
+                db.execute(delete(MediaFile).where(MediaFile.id == row[0]))
+                db.commit()
+                with self._lock:
+                    self._tts_bytes = None
+                return None
+        with self._lock:
+            self._touched[row[0]] = time.time()
+        return path
+
+    def words_with_audio(self, word_ids: Sequence[int]) -> Set[int]:
+        if not word_ids:
+            return set()
+        with self.session_factory() as db:
+            return set(db.scalars(select(MediaOwner.word_id).where(MediaOwner.word_id.in_(list(word_ids)))))
+
+    def word_audio(self, word_id: int) -> Optional[Path]:
+        """The word's own audio if it has any, else its most recent rendering."""
+        with self.session_factory() as db:
+            row = db.execute(
+                select(MediaFile.kind, MediaFile.path).join(MediaOwner, MediaOwner.media_id == MediaFile.id)
+                .where(MediaOwner.word_id == word_id)
+                .order_by((MediaFile.kind == USER).desc(), MediaFile.created_at.desc()).limit(1)).first()
+        return self.abspath(*row) if row else None
+
+    # --- writes ----------------------------------------------------------
+    def _own(self, db: Session, media_id: int, word_ids: Iterable[int]):
+        rows = [{"media_id": media_id, "word_id": w} for w in dict.fromkeys(word_ids) if w is not None]
+        if rows:
+            db.execute(insert(MediaOwner).on_conflict_do_nothing(), rows)
+
+    def temp_path(self, key: str, suffix: str) -> Path:
+        """Where to render a file before put(); ignored by verify()."""
+        tmp = self.root / TMP_DIR
+        tmp.mkdir(exist_ok=True)
+        return tmp / f"{key}.{threading.get_ident()}{suffix}"
+
+    def put(self, key: str, src: Path, word_ids: Iterable[int] = ()) -> Path:
+        """Move a freshly rendered file into the store under its content hash
+        and record it under `key`. Returns the stored path."""
+        sha = file_sha256(src)
+        rel = f"{sha[:2]}/{sha}{src.suffix}"
+        dest = self.root / rel
+        dest.parent.mkdir(exist_ok=True)
+        if dest.exists():
+            src.unlink() # same content already stored
+        else:
+            os.replace(src, dest)
+        size = dest.stat().st_size
+        now = time.time()
+        with self.session_factory() as db:
+            stmt = insert(MediaFile).values(key=key, kind=TTS, path=rel, sha256=sha, size=size,
+                                            created_at=now, last_access=now)
+            db.execute(stmt.on_conflict_do_update(index_elements=["key"], set_={
+                "path": rel, "sha256": sha, "size": size, "last_access": now}))
+            media_id = db.scalar(select(MediaFile.id).where(MediaFile.key == key))
+            self._own(db, media_id, word_ids)
+            db.commit()
+        with self._lock:
+            if self._tts_bytes is not None:
+                self._tts_bytes += size
+        self.enforce_budget()
+        return dest
+
+    def add_owners(self, key: str, word_ids: Iterable[int]):
+        with self.session_factory() as db:
+            media_id = db.scalar(select(MediaFile.id).where(MediaFile.key == key))
+            if media_id is not None:
+                self._own(db, media_id, word_ids)
+                db.commit()
+
+    def register_user(self, db: Session, pairs: Iterable[Tuple[int, Optional[str]]]):
+        """Record (or clear) words' own audio files from (word id, path)
+        pairs (no commit)."""
+        now = time.time()
+        rows, gone = {}, []
+        for word_id, path in pairs:
+            p = Path(path) if path else None
+            if p is not None and p.is_file():
+                rows[user_key(word_id)] = {"key": user_key(word_id), "kind": USER, "path": str(p.resolve()),
+                                           "size": p.stat().st_size, "created_at": now, "last_access": now}
+            else:
+                gone.append(user_key(word_id))
+        for i in range(0, len(gone), 500):
+            db.execute(delete(MediaFile).where(MediaFile.key.in_(gone[i:i+500])))
+        if not rows:
+            return
+        stmt = insert(MediaFile)
+        db.execute(stmt.on_conflict_do_update(index_elements=["key"], set_={
+            "path": stmt.excluded.path, "size": stmt.excluded.size}), list(rows.values()))
+        keys = list(rows)
+        for i in range(0, len(keys), 500):
+            owned = [{"media_id": mid, "word_id": int(key.split(":")[1])} for key, mid in db.execute(
+                select(MediaFile.key, MediaFile.id).where(MediaFile.key.in_(keys[i:i+500])))]
+            db.execute(insert(MediaOwner).on_conflict_do_nothing(), owned)
+
+    def flush_touches(self, db: Optional[Session] = None):
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if not touched:
+            return
+        def write(s: Session):
+            s.execute(update(MediaFile), [{"id": k, "last_access": v} for k, v in touched.items()])
+        if db is not None:
+            write(db)
+            return
+        with self.session_factory() as s:
+            write(s)
+            s.commit()
+
+    # --- eviction --------------------------------------------------------
+    def tts_bytes(self) -> int:
+        with self._lock:
+            if self._tts_bytes is not None:
+                return self._tts_bytes
+        with self.session_factory() as db:
+            total = db.scalar(select(func.coalesce(func.sum(MediaFile.size), 0)).where(MediaFile.kind == TTS))
+        with self._lock:
+            self._tts_bytes = total
+        return total
+
+    def enforce_budget(self, keep: Iterable[str] = ()) -> int:
+        """Evict least recently used rendered files until within budget.
+        Returns the number of files removed."""
+        if self.budget <= 0 or self.tts_bytes() <= self.budget:
+            return 0
+        keep = set(keep)
+        evicted = 0
+        with self.session_factory() as db:
+            self.flush_touches(db)
+            over = self.tts_bytes() - self.budget
+            rows = db.execute(select(MediaFile.id, MediaFile.key, MediaFile.path, MediaFile.size)
+                              .where(MediaFile.kind == TTS).order_by(MediaFile.last_access)
+                              .execution_options(yield_per=200))
+            victims, freed = [], 0
+            for mid, key, path, size in rows:
+                if freed >= over:
+                    break
+                if key in keep:
+                    continue
+                victims.append((mid, path))
+                freed += size
+            rows.close()
+            if not victims:
+                return 0
+            db.execute(delete(MediaFile).where(MediaFile.id.in_([v[0] for v in victims])))
+            shared = set(db.scalars(select(MediaFile.path).where(MediaFile.path.in_([v[1] for v in victims]))))
+            db.commit()
+        for _, path in victims:
+            if path not in shared:
+                (self.root / path).unlink(missing_ok=True)
+            evicted += 1
+        with self._lock:
+            self._tts_bytes = None
+        return evicted
+
+    # --- verify / repair -------------------------------------------------
+    def verify(self, repair: bool = True, progress: Optional[Callable[[str], None]] = None,
+               cancel: Optional[threading.Event] = None) -> VerifyReport:
+        report = VerifyReport()
+        with self.session_factory() as db:
+            self.flush_touches(db)
+            rows = db.execute(select(MediaFile.id, MediaFile.kind, MediaFile.path)).all()
+            gone = [mid for mid, kind, path in rows if not self.abspath(kind, path).is_file()]
+            report.missing = len(gone)
+            known = {path for _, kind, path in rows if kind == TTS}
+            if progress:
+                progress(f"Checked {len(rows):,} manifest entries")
+            # Files in the store nobody references. Loose files that a word
+            # points at are the user's, not ours.
+            referenced = {str(Path(p).resolve()) for p in db.scalars(
+                select(Word.audio_path).where(Word.audio_path.is_not(None), Word.audio_path != ""))}
+            orphans = [p for p in self.root.rglob("*") if p.is_file()
+                       and p.relative_to(self.root).parts[0] != TMP_DIR
+                       and p.relative_to(self.root).as_posix() not in known
+                       and str(p.resolve()) not in referenced]
+            report.orphans = len(orphans)
+            # Word audio set before the manifest existed (or edited outside the app)
+            has_user = set(db.scalars(select(MediaOwner.word_id).join(MediaFile, MediaFile.id == MediaOwner.media_id)
+                                      .where(MediaFile.kind == USER)))
+            todo = [(wid, p) for wid, p in db.execute(select(Word.id, Word.audio_path)
+                                                      .where(Word.audio_path.is_not(None), Word.audio_path != ""))
+                    if wid not in has_user]
+            if repair:
+                for i in range(0, len(gone), 500):
+                    db.execute(delete(MediaFile).where(MediaFile.id.in_(gone[i:i+500])))
+                for i in range(0, len(todo), 500):
+                    if cancel is not None and cancel.is_set():
+                        break
+                    found = [(wid, p) for wid, p in todo[i:i+500] if Path(p).is_file()]
+                    self.register_user(db, found)
+                    report.adopted += len(found)
+                    if progress:
+                        progress(f"Checking word audio {i:,}/{len(todo):,}")
+                db.commit()
+            else:
+                report.adopted = sum(1 for _, p in todo if Path(p).is_file())
+        if repair:
+            for p in orphans:
+                p.unlink(missing_ok=True)
+            with self._lock:
+                self._tts_bytes = None
+            report.evicted = self.enforce_budget()
+        return report
+
+media = MediaStore()
@@ -1,18 +1,6 @@
-from typing import Optional
-try:
-    import wanakana
-    def to_hiragana(s: str) -> str:
-        return wanakana.to_hiragana(s)
-except Exception:
-    try: 
-        import romkan
-        def to_hiragana(s: str) -> str:
-            return romkan.to_hiragana(s)
-    except Exception:
-        def to_hiragana(s: str) -> str:
-            return s.lower()
-        
+from ..romaji import to_hiragana, to_katakana, convert_incremental
+
 import re
 
 def normalize_english(s: str) -> str:
-    return re.sub(r"\s+", " ", s.strip()).lower()
\ No newline at end of file
+    return re.sub(r"\s+", " ", s.strip()).lower()
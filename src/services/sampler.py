@@ -0,0 +1,150 @@
+"""Weighted random draws for practice (weights: srs.weakness).
+
+AliasSampler keeps a Walker alias table per bucket of ~sqrt(n) items plus
+one over the bucket totals, so a draw is two O(1) table lookups and changing
+one weight rebuilds one bucket and the top table, O(sqrt(n)), instead of the
+whole deck. PracticeQueue adds the session rules on top: no card again
+within `spacing` draws, and at most `max_run` cards in a row from the same
+group (e.g. WaniKani level). NumPy is imported on first use.
+"""
+import math
+import random
+from collections import deque
+from typing import Dict, Hashable, List, Mapping, Optional, Tuple
+
+MAX_REJECTS = 16
+
+def alias_table(weights) -> Tuple:
+    """Vose's alias method: (prob, alias) arrays for weights with a positive sum."""
+    import numpy as np
+    w = np.asarray(weights, dtype=float)
+    n = len(w)
+    p = (w * (n / w.sum())).tolist()
+    prob = [1.0] * n
+    alias = list(range(n))
+    small = [i for i, x in enumerate(p) if x < 1.0]
+    large = [i for i, x in enumerate(p) if x >= 1.0]
+    while small and large:
+        s, l = small.pop(), large[-1]
+        prob[s], alias[s] = p[s], l
+        p[l] += p[s] - 1.0
+        if p[l] < 1.0:
+            small.append(large.pop())
+    # Leftovers are 1 up to rounding
+    return np.array(prob), np.array(alias, dtype=np.int64)
+
+class AliasSampler:
+    def __init__(self, weights: Mapping[int, float], rng: Optional[random.Random] = None,
+                 bucket: Optional[int] = None):
+        import numpy as np
+        self.rng = rng or random.Random()
+        self.ids: List[int] = list(weights)
+        self.pos: Dict[int, int] = {k: i for i, k in enumerate(self.ids)}
+        self.w = np.array([weights[k] for k in self.ids], dtype=float)
+        self.bucket = bucket or max(32, math.isqrt(len(self.ids)))
+        nb = -(-len(self.ids) // self.bucket)
+        self._sums = np.zeros(nb)
+        self._tables: List[Optional[Tuple]] = [None] * nb
+        for b in range(nb):
+            self._build(b)
+        self._build_top()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self.pos
+
+    @property
+    def total(self) -> float:
+        return float(self._sums.sum())
+
+    def _build(self, b: int):
+        w = self.w[b * self.bucket:(b + 1) * self.bucket]
+        s = float(w.sum())
+        self._sums[b] = s
+        self._tables[b] = alias_table(w) if s > 0 else None
+
+    def _build_top(self):
+        self._top = alias_table(self._sums) if self._sums.sum() > 0 else None
+
+    @staticmethod
+    def _pick(table: Tuple, u: float) -> int:
+        prob, alias = table
+        x = u * len(prob)
+        i = int(x)
+        return i if x - i < prob[i] else int(alias[i])
+
+    def draw(self) -> Optional[int]:
+        if self._top is None:
+            return None
+        b = self._pick(self._top, self.rng.random())
+        return self.ids[b * self.bucket + self._pick(self._tables[b], self.rng.random())]
+
+    def update(self, item_id: int, weight: float):
+        i = self.pos[item_id]
+        if self.w[i] == weight:
+            return
+        self.w[i] = weight
+        self._build(i // self.bucket)
+        self._build_top()
+
+    def weight(self, item_id: int) -> float:
+        return float(self.w[self.pos[item_id]])
+
+class PracticeQueue:
+    """Weighted draws with session rules. Call shown() for every card put on
+    screen, whatever picked it, so the rules see the whole session."""
+    def __init__(self, weights: Mapping[int, float], groups: Optional[Mapping[int, Hashable]] = None,
+                 spacing: int = 3, max_run: int = 2, rng: Optional[random.Random] = None):
+        self.sampler = AliasSampler(weights, rng)
+        self.groups = groups or {}
+        self.max_run = max_run
+        self._recent: deque = deque(maxlen=max(0, spacing))
+        self._run_group: Optional[Hashable] = None
+        self._run = 0
+
+    def __len__(self) -> int:
+        return len(self.sampler)
+
+    def update(self, item_id: int, weight: float):
+        if item_id in self.sampler:
+            self.sampler.update(item_id, weight)
+
+    def shown(self, item_id: int):
+        self._recent.append(item_id)
+        g = self.groups.get(item_id)
+        if g is not None and g == self._run_group:
+            self._run += 1
+        else:
+            self._run_group, self._run = g, 1
+
+    def _allowed(self, item_id: int, avoid: Optional[int]) -> bool:
+        if item_id == avoid or item_id in self._recent:
+            return False
+        g = self.groups.get(item_id)
+        return not (g is not None and g == self._run_group and self._run >= self.max_run)
+
+    def next(self, avoid: Optional[int] = None) -> Optional[int]:
+        """A weighted draw that keeps to the rules; with a few heavy cards
+        holding nearly all the weight, the rules give way after MAX_REJECTS
+        tries rather than looping (never to an immediate repeat if anything
+        else can be drawn)."""
+        fallback = None
+        for _ in range(MAX_REJECTS):
+            i = self.sampler.draw()
+            if i is None:
+                return None
+            if self._allowed(i, avoid):
+                return i
+            if i != avoid and fallback is None:
+                fallback = i
+        if fallback is None and avoid in self.sampler:
+            # Only `avoid` came up: draw once more with its weight set aside
+            w = self.sampler.weight(avoid)
+            self.sampler.update(avoid, 0.0)
+            try:
+                fallback = self.sampler.draw()
+            finally:
+                self.sampler.update(avoid, w)
+        return fallback if fallback is not None else i
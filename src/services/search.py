@@ -0,0 +1,88 @@
+"""Word search over the words_fts index (see models.WORDS_FTS_DDL).
+
+Every term of the query must match, each as a prefix, in any column: the
+word itself (kanji or kana), its kana-folded reading, the translation or the
+tags. Romaji terms are also tried as kana against the reading. Results are
+ranked by bm25 with the word and reading weighted above the English text.
+
+bm25 has to score every match before the first row comes back, which for a
+one-letter query over 100k words is hundreds of ms; such queries are not worth
+ranking anyway, so rank_ids() gives up past RANK_LIMIT matches and the caller
+falls back to plain order: id order straight off the index (page_ids()), or
+any other column over match_ids().
+"""
+import re
+from typing import List, Optional
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+from ..models import Word, word_key, word_reading
+from .romaji import convert_incremental
+
+# bm25 column weights: word, reading, translation, tags
+WEIGHTS = (10.0, 8.0, 3.0, 1.0)
+RANK_LIMIT = 2000
+_ROMAJI = re.compile(r"[a-z'-]+")
+_KANA = re.compile(r"[ぁ-ゖー]+")
+
+def _phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"*'
+
+def fts_query(query: str) -> Optional[str]:
+    """Build an FTS5 MATCH expression, or None if there is nothing to search."""
+    parts = []
+    for term in query.split():
+        alts = [_phrase(term)]
+        folded = word_reading(term)
+        if folded and folded != term:
+            alts.append("reading:" + _phrase(folded))
+        if _ROMAJI.fullmatch(term.lower()):
+            # "tabe" -> たべ; trailing romaji that is not kana yet is dropped
+            kana = _KANA.match(convert_incremental(term.lower()))
+            if kana:
+                alts.append("reading:" + _phrase(kana.group()))
+        parts.append("(" + " OR ".join(alts) + ")" if len(alts) > 1 else alts[0])
+    return " AND ".join(parts) or None
+
+def match_ids(query: str):
+    """Subquery of matching word ids (unordered), for use in IN (...)."""
+    return select(text("rowid")).select_from(text("words_fts")).where(
+        text("words_fts MATCH :q").bindparams(q=fts_query(query) or '""'))
+
+_RANKED = f"SELECT rowid FROM words_fts WHERE words_fts MATCH :q ORDER BY bm25(words_fts, {', '.join(map(str, WEIGHTS))}), rowid"
+
+def search_ids(db: Session, query: str, limit: Optional[int] = None) -> List[int]:
+    """Ids of matching words, best match first."""
+    q = fts_query(query)
+    if q is None:
+        return []
+    sql = _RANKED if limit is None else f"{_RANKED} LIMIT {int(limit)}"
+    return list(db.scalars(text(sql), {"q": q}))
+
+def rank_ids(db: Session, query: str, cap: int = RANK_LIMIT) -> Optional[List[int]]:
+    """Ranked ids if the query matches at most `cap` words, else None."""
+    q = fts_query(query)
+    if q is None:
+        return []
+    n = db.scalar(text("SELECT count(*) FROM (SELECT rowid FROM words_fts WHERE words_fts MATCH :q LIMIT :n)"),
+                  {"q": q, "n": cap + 1})
+    if n > cap:
+        return None
+    ids = list(db.scalars(text(_RANKED), {"q": q}))
+    # bm25 cannot tell "語" from a longer word starting with it; exact first
+    exact = db.scalar(select(Word.id).where(Word.word_key == word_key(query)))
+    if exact in ids:
+        ids.remove(exact)
+        ids.insert(0, exact)
+    return ids
+
+def page_ids(db: Session, query: str, after: Optional[int] = None, descending: bool = True,
+             limit: int = 256) -> List[int]:
+    """Matching ids in id order, keyset-paged on the index's own rowid order."""
+    q = fts_query(query)
+    if q is None:
+        return []
+    sql = "SELECT rowid FROM words_fts WHERE words_fts MATCH :q"
+    if after is not None:
+        sql += " AND rowid < :after" if descending else " AND rowid > :after"
+    sql += f" ORDER BY rowid {'DESC' if descending else 'ASC'} LIMIT :n"
+    return list(db.scalars(text(sql), {"q": q, "after": after, "n": limit}))
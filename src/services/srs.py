@@ -1,15 +1,37 @@
-from sqlalchemy import select
+import heapq
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import Session
-from ..models import Stat
+from ..config import config
+from ..models import Stat, CardState
+from .sampler import PracticeQueue
+from ..utils.perf import traced
+
+DAY = 86400.0
+RELEARN_DELAY = 600.0 # a missed card comes back after 10 minutes
+FIRST_INTERVAL = 1.0 # days
+# weakness(): floor so every seen card can come up, weight of the smoothed
+# miss rate, and of time since the last review relative to the interval
+BASE_WEIGHT = 0.25
+MISS_WEIGHT = 8.0
+STALE_WEIGHT = 1.0
+STALE_CAP = 3.0
 
 def get_or_create_stats(db: Session) -> Stat:
+    """The totals row, created if missing. No commit: it joins the caller's
+    transaction (e.g. a journal flush stays all-or-nothing)."""
     row = db.scalars(select(Stat)).first()
     if not row:
-        ow = Stat(id=1, total_reviews=0, correct_answers=0, wrong_answers=0)
-        db.add(row)
-        db.commit()
+        db.execute(insert(Stat).values(id=1, total_reviews=0, correct_answers=0, wrong_answers=0)
+                   .on_conflict_do_nothing(index_elements=["id"]))
+        row = db.get(Stat, 1)
     return row
 
+@traced("srs.record_result")
 def record_result(db: Session, correct: bool):
     s = get_or_create_stats(db)
     s.total_reviews += 1
@@ -17,4 +39,225 @@ def record_result(db: Session, correct: bool):
         s.correct_answers += 1
     else:
         s.wrong_answers += 1
-    db.commit()
\ No newline at end of file
+    db.commit()
+
+@dataclass
+class Card:
+    item_id: int
+    stability: float = 0.0
+    difficulty: float = 5.0
+    reps: int = 0
+    lapses: int = 0
+    due_at: float = 0.0
+    last_review_at: Optional[float] = None
+    introduced_at: Optional[float] = None
+
+    @property
+    def is_new(self) -> bool:
+        return self.reps == 0 and self.lapses == 0
+
+def review(card: Card, correct: bool, now: float) -> Card:
+    """SM-2 style update: success multiplies stability by a factor that shrinks
+    as difficulty grows; a lapse cuts stability and relearns in minutes."""
+    c = replace(card, last_review_at=now, introduced_at=card.introduced_at or now)
+    if correct:
+        c.difficulty = max(1.0, c.difficulty - 0.3)
+        if c.stability <= 0:
+            c.stability = FIRST_INTERVAL
+        else:
+            c.stability *= 1.0 + 2.5 * (11.0 - c.difficulty) / 10.0
+        c.reps += 1
+        c.due_at = now + c.stability * DAY
+    else:
+        c.difficulty = min(10.0, c.difficulty + 1.0)
+        c.stability = c.stability * 0.2
+        c.lapses += 1
+        c.due_at = now + RELEARN_DELAY
+    return c
+
+def weakness(card: Card, now: Optional[float] = None) -> float:
+    """Practice weight of a card: higher the more often it is missed and the
+    longer since its last review compared to its interval; 0 while new."""
+    if card.is_new:
+        return 0.0
+    now = time.time() if now is None else now
+    miss = (card.lapses + 0.5) / (card.reps + card.lapses + 1)
+    stale = 0.0
+    if card.last_review_at is not None:
+        interval = max(card.stability, 1 / 24) * DAY
+        stale = min(STALE_CAP, max(0.0, now - card.last_review_at) / interval)
+    return BASE_WEIGHT + MISS_WEIGHT * miss + STALE_WEIGHT * stale
+
+def _day_start(now: float) -> float:
+    d = datetime.fromtimestamp(now)
+    return datetime(d.year, d.month, d.day).timestamp()
+
+class Scheduler:
+    """Per-item scheduling for one (item_type, mode) deck.
+
+    Seen cards live in a min-heap keyed on due time; rescheduling pushes a new
+    entry and stale ones are skipped when popped, so picking the next card and
+    answering are both O(log n). Unseen cards wait in a FIFO released at most
+    `new_per_day` per day. With nothing due and no new card left for today,
+    practice goes on with weighted draws that favour weak cards
+    (sampler.PracticeQueue), keeping cards of one `groups` value (e.g.
+    WaniKani level) from running on."""
+    def __init__(self, item_type: str, mode: str, new_per_day: Optional[int] = None,
+                 groups: Optional[Dict[int, int]] = None):
+        self.item_type = item_type
+        self.mode = mode
+        self.new_per_day = config.SRS_NEW_PER_DAY if new_per_day is None else new_per_day
+        self.groups = groups
+        self.practice: Optional[PracticeQueue] = None # built the first time it is needed
+        self.cards: Dict[int, Card] = {}
+        self._heap: List[Tuple[float, int, int]] = []
+        self._new: List[int] = []
+        self._new_pos = 0
+        self._introduced_today = 0
+        self._today = 0.0
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def load(self, db: Session, item_ids: Iterable[int], now: Optional[float] = None):
+        now = time.time() if now is None else now
+        ids = list(dict.fromkeys(item_ids))
+        self.cards.clear()
+        # Plain rows, not ORM objects; only the deck's cards, by unique-index seeks
+        q = select(CardState.item_id, CardState.stability, CardState.difficulty, CardState.reps, CardState.lapses,
+                   CardState.due_at, CardState.last_review_at, CardState.introduced_at
+                   ).where(CardState.item_type == self.item_type, CardState.mode == self.mode)
+        for i in range(0, len(ids), 500):
+            for row in db.execute(q.where(CardState.item_id.in_(ids[i:i+500]))):
+                self.cards[row[0]] = Card(*row)
+        self._new = [i for i in ids if i not in self.cards]
+        self._new_pos = 0
+        for i in self._new:
+            self.cards[i] = Card(i)
+        self._today = _day_start(now)
+        self._introduced_today = db.scalar(
+            select(func.count()).select_from(CardState).where(
+                CardState.item_type == self.item_type, CardState.mode == self.mode,
+                CardState.introduced_at >= self._today,
+            )
+        ) or 0
+        self._heap = [(c.due_at, 0, c.item_id) for c in self.cards.values() if not c.is_new]
+        heapq.heapify(self._heap)
+        self._seq = 1
+        self.practice = None
+
+    def _push(self, card: Card):
+        heapq.heappush(self._heap, (card.due_at, self._seq, card.item_id))
+        self._seq += 1
+
+    def _peek_valid(self, skip: Optional[int]) -> Optional[int]:
+        # Drop stale heap entries; return the earliest live card other than `skip`
+        held = None
+        found = None
+        while self._heap:
+            due, seq, item_id = self._heap[0]
+            card = self.cards.get(item_id)
+            if card is None or card.is_new or card.due_at != due:
+                heapq.heappop(self._heap)
+                continue
+            if item_id == skip:
+                entry = heapq.heappop(self._heap)
+                if held is None:
+                    held = entry
+                continue
+            found = item_id
+            break
+        if held is not None:
+            heapq.heappush(self._heap, held)
+        return found
+
+    def due_count(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        return sum(1 for c in self.cards.values() if not c.is_new and c.due_at <= now)
+
+    def next(self, now: Optional[float] = None, avoid: Optional[int] = None) -> Optional[int]:
+        """Most overdue card; else a new card if today's cap allows; else a
+        weighted practice draw (the card due soonest if there is nothing to
+        draw from). `avoid` prevents an immediate repeat unless it is the only
+        card."""
+        key = self._next(now, avoid)
+        if key is not None and self.practice is not None:
+            self.practice.shown(key)
+        return key
+
+    def _next(self, now: Optional[float], avoid: Optional[int]) -> Optional[int]:
+        now = time.time() if now is None else now
+        if _day_start(now) != self._today:
+            self._today = _day_start(now)
+            self._introduced_today = 0
+        top = self._peek_valid(avoid)
+        if top is not None and self.cards[top].due_at <= now:
+            return top
+        while self._new_pos < len(self._new) and self._introduced_today < self.new_per_day:
+            cand = self._new[self._new_pos]
+            if self.cards[cand].is_new and cand != avoid:
+                return cand
+            if not self.cards[cand].is_new:
+                self._new_pos += 1
+                continue
+            break
+        if top is not None:
+            if self.practice is None:
+                self.practice = PracticeQueue({i: weakness(c, now) for i, c in self.cards.items()}, self.groups)
+            pick = self.practice.next(avoid)
+            return top if pick is None else pick
+        return avoid if avoid in self.cards else None
+
+    def answer(self, item_id: int, correct: bool, now: Optional[float] = None) -> Card:
+        """Apply a review; returns the card's previous state (for undo)."""
+        now = time.time() if now is None else now
+        prev = self.cards[item_id]
+        if prev.is_new:
+            self._introduced_today += 1
+            if self._new_pos < len(self._new) and self._new[self._new_pos] == item_id:
+                self._new_pos += 1
+        card = review(prev, correct, now)
+        self.cards[item_id] = card
+        self._push(card)
+        if self.practice is not None:
+            self.practice.update(item_id, weakness(card, now))
+        return prev
+
+    def merge(self, cards: Iterable[Card]):
+        """Take newer card states than load() read, e.g. answers the journal
+        has not written yet. Cards outside the deck are ignored."""
+        for card in cards:
+            old = self.cards.get(card.item_id)
+            if old is None or old == card:
+                continue
+            if old.is_new and not card.is_new and (card.introduced_at or 0) >= self._today:
+                self._introduced_today += 1
+            self.cards[card.item_id] = card
+            if not card.is_new:
+                self._push(card)
+            if self.practice is not None:
+                self.practice.update(card.item_id, weakness(card))
+
+    def restore(self, prev: Card):
+        # Undo: put a card back exactly as it was before an answer
+        self.cards[prev.item_id] = prev
+        if prev.is_new:
+            self._introduced_today = max(0, self._introduced_today - 1)
+            if self._new_pos > 0 and self._new[self._new_pos - 1] == prev.item_id:
+                self._new_pos -= 1
+        else:
+            self._push(prev)
+        if self.practice is not None:
+            self.practice.update(prev.item_id, weakness(prev))
+
+    def order(self, item_ids: Iterable[int], now: Optional[float] = None) -> List[int]:
+        """Order a fixed set (e.g. a listening bundle) by urgency: overdue first,
+        then new, then not yet due."""
+        now = time.time() if now is None else now
+        def key(i):
+            c = self.cards.get(i)
+            if c is None or c.is_new:
+                return (1, 0.0)
+            return (0 if c.due_at <= now else 2, c.due_at)
+        return sorted(item_ids, key=key)
@@ -0,0 +1,95 @@
+"""Word tags.
+
+Tags live in `tags` / `word_tags`; Word.tags keeps a "a, b" copy for display
+and full-text search. Writers set Word.tags and call sync_word_tags() for the
+touched ids in the same transaction. Tag queries are indexed joins:
+
+    ids = select(Word.id).where(tag_filter(all_of=["n5", "verb"], none_of=["archaic"]))
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import and_, delete, func, select, true, update
+from sqlalchemy.dialects.sqlite import insert
+from ..models import Tag, Word, WordTag
+
+def parse_tags(text: Optional[str]) -> List[str]:
+    """'n5, Verb,,n5 ' -> ['n5', 'Verb'] (order kept, case-insensitive dedup)"""
+    seen = set()
+    out = []
+    for name in (text or "").split(","):
+        name = " ".join(name.split())
+        if name and name.casefold() not in seen:
+            seen.add(name.casefold())
+            out.append(name)
+    return out
+
+def format_tags(names: Iterable[str]) -> Optional[str]:
+    return ", ".join(names) or None
+
+def parse_tag_query(text: Optional[str]) -> Tuple[List[str], List[str]]:
+    """'n5, verb, -archaic' -> (all_of=['n5', 'verb'], none_of=['archaic'])"""
+    all_of, none_of = [], []
+    for name in parse_tags(text):
+        if name.startswith("-"):
+            if name[1:].strip():
+                none_of.append(name[1:].strip())
+        else:
+            all_of.append(name)
+    return all_of, none_of
+
+def ensure_tags(db, names: Iterable[str]) -> Dict[str, int]:
+    """Create missing tags; returns casefolded name -> id."""
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+    db.execute(insert(Tag).on_conflict_do_nothing(index_elements=["name"]), [{"name": n} for n in names])
+    ids = {}
+    for i in range(0, len(names), 500):
+        for tid, name in db.execute(select(Tag.id, Tag.name).where(Tag.name.in_(names[i:i+500]))):
+            ids[name.casefold()] = tid
+    return ids
+
+def sync_word_tags(db, word_ids: Sequence[int]):
+    """Rebuild word_tags for these words from Word.tags (no commit). Also
+    normalizes Word.tags to the canonical "a, b" form."""
+    word_ids = list(dict.fromkeys(word_ids))
+    for i in range(0, len(word_ids), 500):
+        batch = word_ids[i:i+500]
+        parsed = {wid: (raw, parse_tags(raw)) for wid, raw in db.execute(
+            select(Word.id, Word.tags).where(Word.id.in_(batch)))}
+        tag_ids = ensure_tags(db, (n for _, names in parsed.values() for n in names))
+        db.execute(delete(WordTag).where(WordTag.word_id.in_(batch)))
+        pairs = []
+        for wid, (raw, names) in parsed.items():
+            for tid in dict.fromkeys(tag_ids[n.casefold()] for n in names if n.casefold() in tag_ids):
+                pairs.append({"word_id": wid, "tag_id": tid})
+            if format_tags(names) != raw:
+                db.execute(update(Word).where(Word.id == wid).values(tags=format_tags(names)))
+        if pairs:
+            db.execute(insert(WordTag), pairs)
+
+def set_word_tags(db, word_id: int, names: Iterable[str]):
+    db.execute(update(Word).where(Word.id == word_id).values(tags=format_tags(parse_tags(",".join(names)))))
+    sync_word_tags(db, [word_id])
+
+def _tagged(names: Sequence[str]):
+    return select(WordTag.word_id).join(Tag, Tag.id == WordTag.tag_id).where(Tag.name.in_(names))
+
+def tag_filter(all_of: Sequence[str] = (), any_of: Sequence[str] = (), none_of: Sequence[str] = ()):
+    """WHERE clause on Word.id: has every tag in all_of, at least one of
+    any_of (if given) and none of none_of."""
+    clauses = [Word.id.in_(_tagged([name])) for name in all_of]
+    if any_of:
+        clauses.append(Word.id.in_(_tagged(list(any_of))))
+    if none_of:
+        clauses.append(Word.id.not_in(_tagged(list(none_of))))
+    return and_(*clauses) if clauses else true()
+
+def words_with_tags(all_of: Sequence[str] = (), any_of: Sequence[str] = (), none_of: Sequence[str] = ()):
+    """select(Word.id) of the matching words, newest first."""
+    return select(Word.id).where(tag_filter(all_of, any_of, none_of)).order_by(Word.id.desc())
+
+def all_tags(db) -> List[Tuple[str, int]]:
+    """(name, word count) for every tag in use, most used first."""
+    q = (select(Tag.name, func.count(WordTag.word_id)).join(WordTag, WordTag.tag_id == Tag.id)
+         .group_by(Tag.id).order_by(func.count(WordTag.word_id).desc(), Tag.name))
+    return [tuple(r) for r in db.execute(q)]
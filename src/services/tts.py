@@ -1,14 +1,207 @@
-from gtts import gTTS
+"""Text-to-speech rendering.
+
+Audio is rendered in the background on a small thread pool and stored in the
+media store (services.media) under a key hashed from (text, lang, voice,
+backend), so different texts never share a file and changing the voice or
+engine renders afresh. Concurrent requests for the same audio share one
+render. Files are rendered to a temp name first, so a stored file is always
+complete.
+
+Backends are looked up by name (config.TTS_BACKEND):
+  gtts    Google Translate TTS (network)
+  espeak  espeak-ng / espeak command line (offline)
+  silent  writes a short silent WAV; for tests and benchmarks
+"""
+import abc
+import hashlib
+import shutil
+import struct
+import subprocess
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select
 from ..config import config
+from ..db import SessionLocal
+from ..models import Word
+from ..utils.perf import span, traced
+from .media import MediaStore, media as default_media
+
+class TTSBackend(abc.ABC):
+    name = ""
+    suffix = ".mp3"
+
+    def __init__(self, voice: str = ""):
+        self.voice = voice
+
+    @abc.abstractmethod
+    def render(self, text: str, lang: str, out: Path):
+        """Write the spoken text to `out`."""
+
+class GTTSBackend(TTSBackend):
+    name = "gtts"
+
+    def render(self, text: str, lang: str, out: Path):
+        from gtts import gTTS
+        # voice picks the Google Translate host, e.g. "co.jp"
+        gTTS(text=text, lang=lang, tld=self.voice or "com").save(str(out))
+
+class EspeakBackend(TTSBackend):
+    name = "espeak"
+    suffix = ".wav"
+
+    def __init__(self, voice: str = ""):
+        super().__init__(voice)
+        self.exe = shutil.which("espeak-ng") or shutil.which("espeak")
+
+    def render(self, text: str, lang: str, out: Path):
+        if not self.exe:
+            raise RuntimeError("The espeak TTS backend needs espeak-ng (or espeak) on PATH")
+        subprocess.run([self.exe, "-v", self.voice or lang, "-w", str(out), text],
+                       check=True, capture_output=True, timeout=60)
+
+class SilentBackend(TTSBackend):
+    name = "silent"
+    suffix = ".wav"
+
+    def render(self, text: str, lang: str, out: Path):
+        rate, frames = 8000, 800 # 0.1 s
+        data = b"\x00\x00" * frames
+        header = b"RIFF" + struct.pack("<I", 36 + len(data)) + b"WAVEfmt " + struct.pack(
+            "<IHHIIHH", 16, 1, 1, rate, rate * 2, 2, 16) + b"data" + struct.pack("<I", len(data))
+        out.write_bytes(header + data)
+
+BACKENDS: Dict[str, Callable[..., TTSBackend]] = {
+    "gtts": GTTSBackend, "espeak": EspeakBackend, "silent": SilentBackend,
+}
+
+def make_backend(name: Optional[str] = None, voice: Optional[str] = None) -> TTSBackend:
+    name = name or config.TTS_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown TTS backend {name!r}; expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](config.TTS_VOICE if voice is None else voice)
+
+def audio_key(text: str, lang: str, voice: str, backend: str) -> str:
+    return hashlib.sha256("\x1f".join((backend, voice, lang, text)).encode("utf-8")).hexdigest()[:32]
+
+class TTSService:
+    def __init__(self, backend: Optional[TTSBackend] = None, workers: Optional[int] = None,
+                 store: Optional[MediaStore] = None):
+        self._backend = backend
+        self.workers = config.TTS_WORKERS if workers is None else workers
+        self.store = store or default_media
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.rendered = 0
+
+    @property
+    def backend(self) -> TTSBackend:
+        if self._backend is None:
+            self._backend = make_backend()
+        return self._backend
+
+    def key_for(self, text: str, lang: str = "ja") -> str:
+        b = self.backend
+        return audio_key(text, lang, b.voice, b.name)
+
+    def cached(self, text: str, lang: str = "ja") -> Optional[Path]:
+        return self.store.get(self.key_for(text, lang))
+
+    def _render(self, text: str, lang: str, key: str, word_id: Optional[int]) -> Path:
+        tmp = self.store.temp_path(key, self.backend.suffix)
+        try:
+            with span("tts.render", "tts", backend=self.backend.name):
+                self.backend.render(text, lang, tmp)
+            out = self.store.put(key, tmp, [word_id])
+        finally:
+            tmp.unlink(missing_ok=True)
+        self.rendered += 1
+        return out
+
+    def submit(self, text: str, lang: str = "ja", word_id: Optional[int] = None) -> Future:
+        """Future for the audio file; already resolved when it is stored."""
+        key = self.key_for(text, lang)
+        out = self.store.get(key)
+        if out is not None:
+            # Stored for another word, or before this word was re-added
+            if word_id is not None:
+                self.store.add_owners(key, [word_id])
+            f = Future()
+            f.set_result(out)
+            return f
+        with self._lock:
+            f = self._inflight.get(key)
+            if f is not None:
+                if word_id is not None:
+                    f.add_done_callback(lambda _f, k=key, w=word_id: self._own(_f, k, w))
+                return f
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix="tts")
+            f = self._pool.submit(self._render, text, lang, key, word_id)
+            self._inflight[key] = f
+        f.add_done_callback(lambda _f, k=key: self._done(k))
+        return f
+
+    def _own(self, f: Future, key: str, word_id: int):
+        if not f.cancelled() and f.exception() is None:
+            self.store.add_owners(key, [word_id])
+
+    def _done(self, key: str):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def prefetch(self, items: Iterable[Tuple[str, Optional[int]]], lang: str = "ja") -> List[Future]:
+        """Start rendering (text, word id) pairs that have no audio yet."""
+        return [self.submit(t, lang, wid) for t, wid in dict(items).items() if t]
+
+    def ensure(self, text: str, lang: str = "ja", word_id: Optional[int] = None) -> Path:
+        return self.submit(text, lang, word_id).result()
+
+    def render_all(self, progress: Optional[Callable[[str], None]] = None,
+                   cancel: Optional[threading.Event] = None, lang: str = "ja") -> Tuple[int, int]:
+        """Render audio for every word that has none. Returns (rendered,
+        failed). At most a few renders per worker are queued at a time, so
+        cancelling stops promptly."""
+        window = max(1, self.workers) * 4
+        pending: List[Future] = []
+        done = failed = 0
+        def drain(keep: int):
+            nonlocal done, failed
+            while len(pending) > keep:
+                f = pending.pop(0)
+                if f.cancelled() or f.exception() is not None:
+                    failed += 1
+                else:
+                    done += 1
+        with SessionLocal() as db:
+            q = select(Word.id, Word.word).order_by(Word.id).execution_options(stream_results=True, yield_per=500)
+            for part in db.execute(q).partitions():
+                have = self.store.words_with_audio([r[0] for r in part])
+                for wid, text in part:
+                    if cancel is not None and cancel.is_set():
+                        break
+                    if wid in have:
+                        continue
+                    pending.append(self.submit(text, lang, wid))
+                    drain(window)
+                    if progress:
+                        progress(f"{done:,} rendered, {failed:,} failed")
+                if cancel is not None and cancel.is_set():
+                    break
+        drain(0)
+        return done, failed
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
 
-def ensure_tts_audio(text: str, lang: str = "ja") -> Path:
-    out = config.media_path / (re_safe(text) + ".mp3")
-    if not out.exists():
-        tts = gTTS(text=text, lang=lang)
-        tts.save(str(out))
-    return out
+tts = TTSService()
 
-def re_safe(s: str) -> str:
-    import re
-    return re.sub(r"[^\w\-]+", "_", s)
\ No newline at end of file
+@traced("tts.ensure_tts_audio", "tts")
+def ensure_tts_audio(text: str, lang: str = "ja", word_id: Optional[int] = None) -> Path:
+    """Blocking render; prefer tts.submit() off the UI thread."""
+    return tts.ensure(text, lang, word_id)
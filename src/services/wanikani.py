@@ -1,86 +1,232 @@
-import json
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List
-import requests
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set
+import threading
 from ..config import config
 from ..db import SessionLocal, engine
-from ..models import WKCache, Base
+from ..models import WKCache, WKSyncState, Base
+from ..utils.perf import span, traced
 from sqlalchemy import select
+from sqlalchemy.orm import Session
+from . import wk_store
 
-WK_API = "https://api.wanikani.com/v2"
-HEADERS = {"Authorization": f"Bearer {config.WANIKANI_API_TOKEN}"}
+if TYPE_CHECKING:
+    from .wk_client import WaniKaniClient
+
+# Legacy JSON cache, superseded by the wk_subjects tables
 CACHE_FILE = Path(".cache_wk.json")
 
-def _need_refresh(last: str | None) -> bool:
+def _need_refresh(last: str | None, ttl_days: int | None = None) -> bool:
     if not last:
         return True
     try:
         dt = datetime.fromisoformat(last)
     except Exception:
         return True
-    return datetime.now() - dt > timedelta(days=config.CACHE_TTL_DAYS)
+    return datetime.now() - dt > timedelta(days=config.CACHE_TTL_DAYS if ttl_days is None else ttl_days)
 
-def _fetch_all_kanji() -> List[Dict]:
-    kanji: dict[int, Dict] = {}
+ProgressFn = Callable[[str], None]
+
+class SyncCancelled(Exception):
+    pass
+
+_client: Optional["WaniKaniClient"] = None
+
+def get_client() -> "WaniKaniClient":
+    global _client
+    if _client is None:
+        from .wk_client import WaniKaniClient # requests is only needed once we sync
+        _client = WaniKaniClient(
+            config.WANIKANI_API_TOKEN,
+            base_url=config.WANIKANI_API_URL,
+            max_workers=config.WK_MAX_WORKERS,
+            cancelled_exc=SyncCancelled,
+        )
+    return _client
+
+def set_client(client: Optional["WaniKaniClient"]):
+    global _client
+    if _client is not None and _client is not client:
+        _client.close()
+    if client is not None:
+        client.cancelled_exc = SyncCancelled
+    _client = client
+
+def _get_state(db: Session, collection: str) -> WKSyncState:
+    st = db.get(WKSyncState, collection)
+    if not st:
+        st = WKSyncState(collection=collection)
+        db.add(st)
+    return st
+
+def _check(cancel: Optional[threading.Event]):
+    if cancel is not None and cancel.is_set():
+        raise SyncCancelled()
 
-    # 1) assignments
-    url = f"{WK_API}/assignments?subject_types=kanji"
+def _fetch_collection(path: str, params: Dict[str, str], state: Optional[WKSyncState] = None,
+                      cancel: Optional[threading.Event] = None) -> Optional[List[Dict]]:
+    """Page through a collection. With a sync state, only resources updated after
+    its high-water mark are requested and the first page is sent conditionally;
+    returns None when the server answers 304 Not Modified."""
+    client = get_client()
+    params = dict(params)
+    headers: Dict[str, str] = {}
+    if state is not None:
+        if state.updated_after:
+            params["updated_after"] = state.updated_after
+        if state.etag:
+            headers["If-None-Match"] = state.etag
+        if state.last_modified:
+            headers["If-Modified-Since"] = state.last_modified
+
+    url = path
+    out: List[Dict] = []
+    first = True
     while url:
-        r = requests.get(url, headers=HEADERS)
+        _check(cancel)
+        r = client.get(url, params=params if first else None, headers=headers, cancel=cancel)
+        if first and r.status_code == 304:
+            return None
         r.raise_for_status()
-        data = r.json()
-        subject_ids = [a["data"]["subject_id"] for a in data["data"]]
-        for sid in subject_ids:
-            kanji[sid] = {}
+        with span("wk.json", "http", bytes=len(r.content)):
+            data = r.json()
+        if first and state is not None:
+            state.etag = r.headers.get("ETag")
+            state.last_modified = r.headers.get("Last-Modified")
+            if data.get("data_updated_at"):
+                state.updated_after = data["data_updated_at"]
+            headers = {}
+        out.extend(data["data"])
         url = data["pages"]["next_url"]
+        first = False
+    return out
+
+def _subject_to_item(item: Dict) -> Dict:
+    d = item["data"]
+    return {
+        "id": item["id"],
+        "characters": d.get("characters"),
+        "level": d.get("level", 0),
+        "meanings": [m["meaning"] for m in d.get("meanings", []) if m.get("accepted_answer", True)],
+        "auxiliary_meanings": [m["meaning"] for m in d.get("auxiliary_meanings", []) if m.get("type", "whitelist") == "whitelist"],
+        "readings": [{"reading": r["reading"], "type": r["type"]} for r in d.get("readings", [])],
+    }
 
-    if not kanji:
+def _fetch_subjects(ids: List[int], cancel: Optional[threading.Event] = None) -> List[Dict]:
+    chunks = [ids[i:i+500] for i in range(0, len(ids), 500)]
+    # Chunks are independent; fetch them concurrently on the client's pool
+    pages = get_client().map(
+        lambda chunk: _fetch_collection("subjects", {"ids": ",".join(map(str, chunk))}, cancel=cancel),
+        chunks,
+        cancel=cancel,
+    )
+    return [item for page in pages for item in page if item["object"] == "kanji"]
+
+@traced("wk.fetch_all_kanji", "http")
+def _fetch_all_kanji() -> List[Dict]:
+    assignments = _fetch_collection("assignments", {"subject_types": "kanji"})
+    ids = list(dict.fromkeys(a["data"]["subject_id"] for a in assignments))
+    if not ids:
         return []
+    return [_subject_to_item(item) for item in _fetch_subjects(ids)]
 
-    ids = list(kanji.keys())
-    out: List[Dict] = []
-    for i in range(0, len(ids), 500):
-        chunk = ids[i:i+500]
-        q = ",".join(map(str, chunk))
-        url = f"{WK_API}/subjects?ids={q}"
-        r = requests.get(url, headers=HEADERS)
-        r.raise_for_status()
-        data = r.json()
-        for item in data["data"]:
-            if item["object"] != "kanji":
-                continue
-            d = item["data"]
-            out.append({
-                "id": item["id"],
-                "characters": d.get("characters"),
-                "meanings": [m["meaning"] for m in d.get("meanings", []) if m.get("primary") or True],
-                "readings": [{"reading": r["reading"], "type": r["type"]} for r in d.get("readings", [])],
-            })
-    return out
+@traced("wk.sync_kanji", "http")
+def sync_kanji(db: Session, force_subjects: bool = False, progress: Optional[ProgressFn] = None,
+               cancel: Optional[threading.Event] = None) -> bool:
+    """Incrementally bring the local subject store up to date.
+
+    Assignments are always checked (one conditional request when nothing
+    changed). Subject content is re-checked when new kanji were unlocked, when
+    the subjects TTL expired or when forced. Returns True if the cache changed.
+    Setting `cancel` aborts between requests with SyncCancelled, leaving the
+    store untouched."""
+    progress = progress or (lambda msg: None)
+    cache = wk_store.subject_ids(db)
+    a_state = _get_state(db, "assignments")
+    s_state = _get_state(db, "subjects")
+    if not cache:
+        # Lost or first cache: drop the high-water marks and pull everything
+        for st in (a_state, s_state):
+            st.updated_after = st.etag = st.last_modified = None
+
+    now = datetime.now().isoformat()
+    changed = False
+
+    progress("Checking WaniKani assignments…")
+    assignments = _fetch_collection("assignments", {"subject_types": "kanji"}, a_state, cancel)
+    a_state.last_checked = now
+    new_ids: List[int] = []
+    if assignments:
+        new_ids = [sid for sid in dict.fromkeys(a["data"]["subject_id"] for a in assignments) if sid not in cache]
+
+    # Subjects stored without a sync state (old JSON cache, reset state) are
+    # checked for edits after the newest one
+    stored_latest = wk_store.latest_update(db) if s_state.updated_after is None else None
+    baseline = None
+    downloaded: Set[int] = set()
+    if new_ids:
+        progress(f"Downloading {len(new_ids)} kanji…")
+        fetched = _fetch_subjects(new_ids, cancel)
+        _check(cancel)
+        wk_store.upsert_subjects(db, fetched)
+        downloaded = {item["id"] for item in fetched}
+        cache.update(downloaded)
+        baseline = max((item["data_updated_at"] for item in fetched), default=None)
+        changed = True
+
+    if cache and (force_subjects or new_ids or _need_refresh(s_state.last_checked, config.WK_SUBJECTS_TTL_DAYS)):
+        if s_state.updated_after is None and cache <= downloaded:
+            # The first full download is the baseline; watch for edits after it
+            s_state.updated_after = baseline
+        else:
+            if s_state.updated_after is None:
+                # None (no timestamps stored) fetches every kanji once
+                s_state.updated_after = stored_latest
+            progress("Checking for updated subjects…")
+            updated = _fetch_collection("subjects", {"types": "kanji"}, s_state, cancel) or []
+            # The collection spans every kanji; keep only the ones we study
+            updated = [item for item in updated if item["id"] in cache]
+            if updated:
+                wk_store.upsert_subjects(db, updated)
+                changed = True
+        s_state.last_checked = now
+
+    db.commit()
+    return changed
+
+def load_cached_kanji(mode: Optional[str] = None) -> List[Dict]:
+    # No network: whatever the last sync stored
+    with SessionLocal() as db:
+        # Only the subjects (and fields) the mode can ask about
+        return wk_store.load_kanji(db, mode)
 
-def get_wk_kanji(force_refresh: bool = False) -> List[Dict]:
-    # Create cache table if first run
+def refresh_wk_kanji(force_refresh: bool = False, progress: Optional[ProgressFn] = None,
+                     cancel: Optional[threading.Event] = None) -> bool:
+    """Sync if the cache is stale (or forced). Safe to call off the UI thread.
+    Returns True if the stored subjects changed."""
+    # Create cache tables if first run
     Base.metadata.create_all(bind=engine)
     with SessionLocal() as db:
         row = db.scalars(select(WKCache)).first()
         if not row:
-            row = WKCache(id=1, last_refresh=None, payload_path=str(CACHE_FILE))
+            row = WKCache(id=1, last_refresh=None, payload_path=None)
             db.add(row)
             db.commit()
         stale = _need_refresh(row.last_refresh) or force_refresh
-        if stale:
-            items = _fetch_all_kanji()
-            CACHE_FILE.write_text(json.dumps(items, ensure_ascii=False, indent=2), encoding="utf-8")
-            row.last_refresh = datetime.now().isoformat()
-            row.payload_path = str(CACHE_FILE)
-            db.commit()
-        else:
-            if not Path(row.payload_path or "").exists():
-                items = _fetch_all_kanji()
-                CACHE_FILE.write_text(json.dumps(items, ensure_ascii=False, indent=2), encoding="utf-8")
-                row.last_refresh = datetime.now().isoformat()
-                row.payload_path = str(CACHE_FILE)
-                db.commit()
-        # Return current cache
-        return json.loads(Path(row.payload_path or str(CACHE_FILE)).read_text(encoding="utf-8"))
\ No newline at end of file
+        if not (stale or not wk_store.count_subjects(db)):
+            return False
+        try:
+            changed = sync_kanji(db, force_subjects=force_refresh, progress=progress, cancel=cancel)
+        except SyncCancelled:
+            db.rollback()
+            raise
+        row.last_refresh = datetime.now().isoformat()
+        row.payload_path = None
+        db.commit()
+        CACHE_FILE.unlink(missing_ok=True)
+        return changed
+
+@traced("wk.get_wk_kanji")
+def get_wk_kanji(force_refresh: bool = False, mode: Optional[str] = None) -> List[Dict]:
+    refresh_wk_kanji(force_refresh)
+    return load_cached_kanji(mode)
@@ -0,0 +1,163 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, TypeVar
+import requests
+from requests.adapters import HTTPAdapter
+from ..utils.perf import span
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class RequestCancelled(Exception):
+    pass
+
+def _pause(seconds: float, cancel: Optional[threading.Event]):
+    # Sleep, but wake as soon as `cancel` is set
+    if cancel is None:
+        time.sleep(seconds)
+    else:
+        cancel.wait(seconds)
+
+class TokenBucket:
+    """Client-side limiter. Refill is sized so that no `per`-second window can
+    exceed `limit` requests even after a full burst."""
+    def __init__(self, limit: int = 60, per: float = 60.0, burst: int = 10):
+        self.capacity = max(1, min(burst, limit))
+        self.rate = max(limit - self.capacity, 1) / per
+        self.tokens = float(self.capacity)
+        self.stamp = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def pause_until(self, deadline: float):
+        # deadline is on the time.monotonic() clock
+        with self.lock:
+            self.paused_until = max(self.paused_until, deadline)
+            self.tokens = 0.0
+
+    def acquire(self, cancel: Optional[threading.Event] = None) -> bool:
+        """Take a token; False if `cancel` was set while waiting for one."""
+        while True:
+            if cancel is not None and cancel.is_set():
+                return False
+            with self.lock:
+                now = time.monotonic()
+                if now >= self.paused_until:
+                    self.tokens = min(self.capacity, self.tokens + (now - max(self.stamp, self.paused_until)) * self.rate)
+                    self.stamp = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return True
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    wait = self.paused_until - now
+            _pause(wait, cancel)
+
+class WaniKaniClient:
+    """Pooled, rate-limited HTTP client for the WaniKani v2 API."""
+    def __init__(
+        self,
+        token: str,
+        base_url: str = "https://api.wanikani.com/v2",
+        max_workers: int = 4,
+        limit_per_minute: int = 60,
+        burst: int = 10,
+        timeout: tuple = (5.0, 30.0),
+        max_retries: int = 5,
+        backoff: float = 0.5,
+        cancelled_exc: type = RequestCancelled,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.cancelled_exc = cancelled_exc
+        self.bucket = TokenBucket(limit_per_minute, 60.0, burst)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Wanikani-Revision": "20170710",
+        })
+        self.requests_sent = 0
+        self.throttled = 0
+
+    def url(self, path: str) -> str:
+        return path if path.startswith("http") else f"{self.base_url}/{path.lstrip('/')}"
+
+    def _honour_rate_limit(self, r: requests.Response):
+        remaining = r.headers.get("RateLimit-Remaining")
+        reset = r.headers.get("RateLimit-Reset")
+        retry_after = r.headers.get("Retry-After")
+        if r.status_code != 429 and remaining != "0":
+            return
+        delay = None
+        if reset:
+            try:
+                delay = float(reset) - time.time()
+            except ValueError:
+                delay = None
+        if delay is None and retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                delay = None
+        if delay is None:
+            delay = 1.0
+        self.bucket.pause_until(time.monotonic() + max(delay, 0.0))
+
+    def _check(self, cancel: Optional[threading.Event]):
+        if cancel is not None and cancel.is_set():
+            raise self.cancelled_exc()
+
+    def get(self, path: str, params: Optional[Dict] = None, headers: Optional[Dict] = None,
+            cancel: Optional[threading.Event] = None) -> requests.Response:
+        """GET with rate limiting and retry/backoff. 304 and 4xx responses are
+        returned as-is; the caller decides whether to raise. Setting `cancel`
+        ends rate-limit waits and backoff early with `cancelled_exc`."""
+        url = self.url(path)
+        attempt = 0
+        while True:
+            self._check(cancel)
+            if not self.bucket.acquire(cancel):
+                self._check(cancel)
+            try:
+                with span("wk.http", "http", url=url):
+                    r = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                self.requests_sent += 1
+                self._honour_rate_limit(r)
+                if r.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return r
+                if r.status_code == 429:
+                    # The bucket is paused until the server's reset; no extra backoff
+                    self.throttled += 1
+                    attempt += 1
+                    continue
+            _pause(min(self.backoff * 2 ** attempt, 30.0) * (0.5 + random.random() / 2), cancel)
+            attempt += 1
+
+    def map(self, fn: Callable[[T], R], items: Iterable[T], cancel: Optional[threading.Event] = None) -> List[R]:
+        """Run fn over items on a bounded pool, keeping input order. Items not
+        started when `cancel` is set are skipped with `cancelled_exc`."""
+        items = list(items)
+        def run(it: T) -> R:
+            self._check(cancel)
+            return fn(it)
+        if len(items) <= 1 or self.max_workers <= 1:
+            return [run(it) for it in items]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as ex:
+            return list(ex.map(run, items))
+
+    def close(self):
+        self.session.close()
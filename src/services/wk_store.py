@@ -0,0 +1,114 @@
+import hashlib
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import delete, exists, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from ..models import WKSubject, WKMeaning, WKReading, WKComponent
+
+# Practice mode -> reading type it needs
+MODE_READING_TYPE = {"On'yomi": "onyomi", "Kun'yomi": "kunyomi"}
+
+def subject_ids(db: Session) -> Set[int]:
+    return set(db.scalars(select(WKSubject.id)))
+
+def count_subjects(db: Session) -> int:
+    return db.scalar(select(func.count()).select_from(WKSubject)) or 0
+
+def upsert_subjects(db: Session, items: Iterable[Dict]):
+    """Upsert raw WaniKani subject resources. A subject's meanings, readings
+    and components are replaced wholesale, since WaniKani always sends the
+    full lists."""
+    items = list(items)
+    if not items:
+        return
+    rows, meanings, readings, components = [], [], [], []
+    for item in items:
+        d = item["data"]
+        sid = item["id"]
+        rows.append({
+            "id": sid,
+            "object": item.get("object", "kanji"),
+            "characters": d.get("characters"),
+            "level": d.get("level", 0),
+            "data_updated_at": item.get("data_updated_at"),
+        })
+        for m in d.get("meanings", []):
+            meanings.append({"subject_id": sid, "meaning": m["meaning"], "primary": bool(m.get("primary")),
+                             "accepted": m.get("accepted_answer", True), "auxiliary": False})
+        for m in d.get("auxiliary_meanings", []):
+            if m.get("type", "whitelist") == "whitelist":
+                meanings.append({"subject_id": sid, "meaning": m["meaning"], "primary": False,
+                                 "accepted": True, "auxiliary": True})
+        for r in d.get("readings", []):
+            readings.append({"subject_id": sid, "reading": r["reading"], "type": r["type"],
+                             "primary": bool(r.get("primary")), "accepted": r.get("accepted_answer", True)})
+        components.extend({"subject_id": sid, "component_id": c} for c in dict.fromkeys(d.get("component_subject_ids", [])))
+
+    stmt = insert(WKSubject)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[WKSubject.id],
+        set_={c: stmt.excluded[c] for c in ("object", "characters", "level", "data_updated_at")},
+    )
+    ids = [r["id"] for r in rows]
+    # Stay under SQLite's bound-parameter limit
+    for i in range(0, len(rows), 500):
+        db.execute(stmt, rows[i:i+500])
+        chunk = ids[i:i+500]
+        db.execute(delete(WKMeaning).where(WKMeaning.subject_id.in_(chunk)))
+        db.execute(delete(WKReading).where(WKReading.subject_id.in_(chunk)))
+        db.execute(delete(WKComponent).where(WKComponent.subject_id.in_(chunk)))
+    if meanings:
+        db.execute(insert(WKMeaning), meanings)
+    if readings:
+        db.execute(insert(WKReading), readings)
+    if components:
+        db.execute(insert(WKComponent), components)
+
+def latest_update(db: Session) -> Optional[str]:
+    """Newest data_updated_at among the stored kanji."""
+    return db.scalar(select(func.max(WKSubject.data_updated_at)).where(WKSubject.object == "kanji"))
+
+def components(db: Session) -> Dict[int, List[int]]:
+    out: Dict[int, List[int]] = {}
+    for sid, cid in db.execute(select(WKComponent.subject_id, WKComponent.component_id)):
+        out.setdefault(sid, []).append(cid)
+    return out
+
+def fingerprint(db: Session) -> str:
+    """Changes whenever a kanji is added, removed or updated."""
+    h = hashlib.sha1()
+    for sid, updated in db.execute(select(WKSubject.id, WKSubject.data_updated_at)
+                                   .where(WKSubject.object == "kanji").order_by(WKSubject.id)):
+        h.update(f"{sid}:{updated};".encode())
+    return h.hexdigest()
+
+def load_kanji(db: Session, mode: Optional[str] = None, ids: Optional[Iterable[int]] = None) -> List[Dict]:
+    """Kanji in the practice-item shape, restricted to what `mode` can ask:
+    On'yomi/Kun'yomi only return subjects that have a reading of that type."""
+    q = select(WKSubject.id, WKSubject.characters, WKSubject.level).where(WKSubject.object == "kanji")
+    rtype = MODE_READING_TYPE.get(mode or "")
+    if rtype:
+        q = q.where(exists().where(WKReading.subject_id == WKSubject.id, WKReading.type == rtype))
+    if ids is not None:
+        q = q.where(WKSubject.id.in_(list(ids)))
+    items: Dict[int, Dict] = {
+        sid: {"id": sid, "characters": ch, "level": lvl, "meanings": [], "auxiliary_meanings": [], "readings": []}
+        for sid, ch, lvl in db.execute(q)
+    }
+    if not items:
+        return []
+    sub = q.with_only_columns(WKSubject.id).scalar_subquery()
+
+    if mode in (None, "", "Meaning"):
+        mq = select(WKMeaning.subject_id, WKMeaning.meaning, WKMeaning.auxiliary).where(
+            WKMeaning.subject_id.in_(sub), WKMeaning.accepted.is_(True)
+        ).order_by(WKMeaning.subject_id, WKMeaning.primary.desc(), WKMeaning.id)
+        for sid, meaning, aux in db.execute(mq):
+            items[sid]["auxiliary_meanings" if aux else "meanings"].append(meaning)
+
+    rq = select(WKReading.subject_id, WKReading.reading, WKReading.type).where(WKReading.subject_id.in_(sub))
+    if rtype:
+        rq = rq.where(WKReading.type == rtype)
+    for sid, reading, t in db.execute(rq.order_by(WKReading.subject_id, WKReading.primary.desc(), WKReading.id)):
+        items[sid]["readings"].append({"reading": reading, "type": t})
+    return list(items.values())
@@ -0,0 +1,131 @@
+"""Streaming word export (CSV, JSONL, Parquet).
+
+Rows come off a server-side cursor in EXPORT_BATCH partitions and are written
+as they arrive, so memory does not grow with the vocabulary. Columns and
+empty-value handling match services.word_import, so an export re-imports
+unchanged. Usable headless:
+
+    python -m src.services.word_export words.parquet --tags "n5, -archaic" --since 2024-01-01
+"""
+import argparse
+import csv
+import json
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from ..db import SessionLocal
+from ..models import Word
+from .tags import parse_tag_query, tag_filter
+
+COLUMNS = ("word", "translation", "tags", "audio_path")
+FORMATS = ("csv", "jsonl", "parquet")
+EXPORT_BATCH = 5000
+
+def format_for(path: str) -> str:
+    suffix = Path(path).suffix.lower().lstrip(".")
+    fmt = {"ndjson": "jsonl", "pq": "parquet"}.get(suffix, suffix)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format '{suffix}' (use .csv, .jsonl or .parquet)")
+    return fmt
+
+def _utc(dt: datetime) -> datetime:
+    # created_at is stored as naive UTC; a naive dt is local time
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+def export_query(tags: Optional[str] = None, since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """tags: e.g. "n5, verb, -archaic" (see tags.parse_tag_query); since and
+    until are local time unless they carry a timezone."""
+    q = select(*(getattr(Word, c) for c in COLUMNS))
+    if tags:
+        all_of, none_of = parse_tag_query(tags)
+        q = q.where(tag_filter(all_of=all_of, none_of=none_of))
+    if since is not None:
+        q = q.where(Word.created_at >= _utc(since))
+    if until is not None:
+        q = q.where(Word.created_at < _utc(until))
+    return q.order_by(Word.id)
+
+def iter_batches(db: Session, q, batch: int = EXPORT_BATCH) -> Iterator[List[Tuple]]:
+    result = db.execute(q.execution_options(stream_results=True, yield_per=batch))
+    for part in result.partitions():
+        yield [tuple(r) for r in part]
+
+def _write_csv(path: str, batches: Iterator[List[Tuple]], on_batch: Callable[[int], None]):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for rows in batches:
+            writer.writerows(["" if v is None else v for v in r] for r in rows)
+            on_batch(len(rows))
+
+def _write_jsonl(path: str, batches: Iterator[List[Tuple]], on_batch: Callable[[int], None]):
+    with open(path, "w", encoding="utf-8") as f:
+        for rows in batches:
+            f.writelines(json.dumps(dict(zip(COLUMNS, r)), ensure_ascii=False) + "\n" for r in rows)
+            on_batch(len(rows))
+
+def _write_parquet(path: str, batches: Iterator[List[Tuple]], on_batch: Callable[[int], None]):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)") from None
+    schema = pa.schema([(c, pa.string()) for c in COLUMNS])
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in batches:
+            cols = list(zip(*rows))
+            writer.write_batch(pa.record_batch([pa.array(c, pa.string()) for c in cols], schema=schema))
+            on_batch(len(rows))
+
+WRITERS = {"csv": _write_csv, "jsonl": _write_jsonl, "parquet": _write_parquet}
+
+def export_words(path: str, fmt: Optional[str] = None, tags: Optional[str] = None,
+                 since: Optional[datetime] = None, until: Optional[datetime] = None,
+                 progress: Optional[Callable[[str], None]] = None, cancel: Optional[threading.Event] = None,
+                 session_factory: Callable[[], Session] = SessionLocal) -> int:
+    """Write matching words to `path`; returns the number of rows written.
+    The format follows the file suffix unless `fmt` is given."""
+    fmt = fmt or format_for(path)
+    written = 0
+    def on_batch(n: int):
+        nonlocal written
+        written += n
+        if progress:
+            progress(f"{written:,} words exported")
+    with session_factory() as db:
+        batches = iter_batches(db, export_query(tags, since, until))
+        if cancel is not None:
+            batches = _until(batches, cancel)
+        WRITERS[fmt](path, batches, on_batch)
+    return written
+
+def _until(batches: Iterator, cancel: threading.Event) -> Iterator:
+    for b in batches:
+        if cancel.is_set():
+            return
+        yield b
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m src.services.word_export", description="Export the word list.")
+    p.add_argument("path", help="output file (.csv, .jsonl or .parquet)")
+    p.add_argument("--format", choices=FORMATS)
+    p.add_argument("--tags", help='e.g. "n5, verb, -archaic"')
+    p.add_argument("--since", type=datetime.fromisoformat, help="added on/after (ISO date, local time)")
+    p.add_argument("--until", type=datetime.fromisoformat, help="added before (ISO date, local time)")
+    args = p.parse_args(argv)
+    if args.format is None:
+        try:
+            format_for(args.path)
+        except ValueError as e:
+            p.error(str(e))
+    from ..db import init_db
+    init_db()
+    n = export_words(args.path, args.format, args.tags, args.since, args.until)
+    print(f"Exported {n} words to {args.path}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
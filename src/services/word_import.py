@@ -0,0 +1,153 @@
+"""Chunked word import (CSV, JSONL or Parquet) into `words`, deduplicated on the normalized word.
+
+Each chunk is classified against the rows already stored (one indexed lookup
+per 500 keys); only new or changed rows are written, with one executemany of
+INSERT ... ON CONFLICT(word_key) DO UPDATE per chunk in its own transaction.
+Memory stays bounded by the chunk size and re-importing the same list writes
+nothing.
+"""
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from ..db import SessionLocal
+from ..models import Word, word_key, word_reading
+from .media import media
+from .tags import format_tags, parse_tags, sync_word_tags
+
+REQUIRED = ("word", "translation")
+OPTIONAL = ("tags", "audio_path")
+CHUNK_ROWS = 50_000
+
+@dataclass
+class ImportReport:
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    rows: int = 0
+    cancelled: bool = False
+
+    def __str__(self) -> str:
+        s = f"{self.inserted} inserted, {self.updated} updated, {self.skipped} skipped"
+        return s + (" (cancelled)" if self.cancelled else "")
+
+def _clean(value) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def _require(columns):
+    if not set(REQUIRED).issubset(columns):
+        raise ValueError("File must include at least 'word' and 'translation' columns.")
+
+def read_chunks(path: str, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    suffix = Path(path).suffix.lower()
+    if suffix in (".parquet", ".pq"):
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(path)
+        _require(pf.schema_arrow.names)
+        cols = [c for c in REQUIRED + OPTIONAL if c in pf.schema_arrow.names]
+        for batch in pf.iter_batches(batch_size=chunk_rows, columns=cols):
+            yield batch.to_pandas()
+    elif suffix in (".jsonl", ".ndjson"):
+        for df in pd.read_json(path, lines=True, dtype=False, chunksize=chunk_rows):
+            _require(df.columns)
+            yield df.astype(object).where(df.notna(), None)
+    else:
+        header = pd.read_csv(path, nrows=0)
+        _require(header.columns)
+        cols = [c for c in REQUIRED + OPTIONAL if c in header.columns]
+        yield from pd.read_csv(path, usecols=cols, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+
+def _upsert_stmt():
+    stmt = insert(Word.__table__)
+    return stmt.on_conflict_do_update(
+        index_elements=[Word.word_key],
+        set_={
+            "word": stmt.excluded.word,
+            "reading": stmt.excluded.reading,
+            "translation": stmt.excluded.translation,
+            # A file without tags/audio columns must not wipe what is stored
+            "tags": func.coalesce(stmt.excluded.tags, Word.tags),
+            "audio_path": func.coalesce(stmt.excluded.audio_path, Word.audio_path),
+            "updated_at": func.now(),
+        },
+    )
+
+def import_chunk(db: Session, df: pd.DataFrame, report: ImportReport) -> List[int]:
+    """Upsert one chunk (no commit). Returns ids of inserted/updated words."""
+    incoming: Dict[str, Dict] = {}
+    for rec in df.to_dict("records"):
+        report.rows += 1
+        word = _clean(rec.get("word"))
+        translation = _clean(rec.get("translation"))
+        key = word_key(word)
+        if not key or not translation:
+            report.skipped += 1
+            continue
+        if key in incoming:
+            # Later duplicate in the same file wins
+            report.skipped += 1
+        incoming[key] = {
+            "word": word, "word_key": key, "reading": word_reading(word), "translation": translation,
+            "tags": format_tags(parse_tags(_clean(rec.get("tags")))), "audio_path": _clean(rec.get("audio_path")),
+        }
+    if not incoming:
+        return []
+
+    keys = list(incoming)
+    existing: Dict[str, tuple] = {}
+    for i in range(0, len(keys), 500):
+        q = select(Word.word_key, Word.word, Word.translation, Word.tags, Word.audio_path).where(
+            Word.word_key.in_(keys[i:i+500]))
+        for k, *vals in db.execute(q):
+            existing[k] = tuple(vals)
+
+    writes = []
+    for key, row in incoming.items():
+        old = existing.get(key)
+        if old is None:
+            report.inserted += 1
+            writes.append(row)
+            continue
+        new = (row["word"], row["translation"], row["tags"] or old[2], row["audio_path"] or old[3])
+        if new == old:
+            report.skipped += 1
+        else:
+            report.updated += 1
+            writes.append(row)
+
+    if not writes:
+        return []
+    # Core executemany: one compiled statement reused for every row
+    db.connection().execute(_upsert_stmt(), writes)
+    wkeys = [w["word_key"] for w in writes]
+    id_of: Dict[str, int] = {}
+    for i in range(0, len(wkeys), 500):
+        id_of.update(db.execute(select(Word.word_key, Word.id).where(Word.word_key.in_(wkeys[i:i+500]))).all())
+    ids = list(id_of.values())
+    sync_word_tags(db, ids)
+    media.register_user(db, [(id_of[w["word_key"]], w["audio_path"]) for w in writes if w["audio_path"]])
+    return ids
+
+def import_words(path: str, progress: Optional[Callable[[str], None]] = None,
+               cancel: Optional[threading.Event] = None, chunk_rows: int = CHUNK_ROWS,
+               session_factory: Callable[[], Session] = SessionLocal) -> ImportReport:
+    """Import a file with at least word,translation (optionally tags,audio_path).
+    Each chunk commits on its own; cancelling keeps the chunks already done."""
+    report = ImportReport()
+    for df in read_chunks(path, chunk_rows):
+        if cancel is not None and cancel.is_set():
+            report.cancelled = True
+            break
+        with session_factory() as db:
+            import_chunk(db, df, report)
+            db.commit()
+        if progress:
+            progress(f"{report.rows:,} rows read — {report}")
+    return report
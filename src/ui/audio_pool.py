@@ -0,0 +1,179 @@
+"""Audio playback from memory for the practice tabs.
+
+QMediaPlayer.setSource re-opens and re-decodes the file on every call, which
+is most of the delay between pressing Play and hearing the word. AudioPool
+keeps up to AUDIO_PLAYERS players loaded with the files about to be played
+(prefetch: the current item and the ones after it) from an LRU of file bytes
+capped at AUDIO_CACHE_MB, so playing one of them, or playing it again, is a
+seek and play() on a player that is already loaded.
+
+The time from play() to the player's first position update is kept in
+`latencies` (ms) and recorded as "audio.latency" spans when PERF_TRACE is on.
+QtMultimedia is imported when the first player is made.
+"""
+import os
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice, QUrl
+from ..config import config
+from ..utils.perf import tracer
+
+Key = Tuple[str, int, int] # path, mtime ns, size: a file rewritten in place loads afresh
+
+class _Slot:
+    __slots__ = ("player", "output", "buffer", "key")
+
+    def __init__(self, player, output):
+        self.player, self.output = player, output
+        self.buffer: Optional[QBuffer] = None
+        self.key: Optional[Key] = None
+
+class AudioPool:
+    def __init__(self, players: Optional[int] = None, budget_mb: Optional[float] = None):
+        self.size = max(1, config.AUDIO_PLAYERS if players is None else players)
+        self.budget = int((config.AUDIO_CACHE_MB if budget_mb is None else budget_mb) * 1024 * 1024)
+        self._data: "OrderedDict[Key, bytes]" = OrderedDict() # least recently used first
+        self._bytes = 0
+        self._slots: "OrderedDict[Key, _Slot]" = OrderedDict()
+        self._pending: Optional[Tuple[_Slot, int, bool]] = None # (slot, play() ns, hit) until it sounds
+        self.latencies: deque = deque(maxlen=200)
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def _key(path) -> Key:
+        st = os.stat(path)
+        return (str(path), st.st_mtime_ns, st.st_size)
+
+    @property
+    def cached_bytes(self) -> int:
+        return self._bytes
+
+    def _read(self, key: Key) -> bytes:
+        data = self._data.get(key)
+        if data is not None:
+            self._data.move_to_end(key)
+            return data
+        data = Path(key[0]).read_bytes()
+        self._data[key] = data
+        self._bytes += len(data)
+        while self._bytes > self.budget and len(self._data) > 1:
+            _, old = self._data.popitem(last=False)
+            self._bytes -= len(old)
+        return data
+
+    def _new_slot(self) -> _Slot:
+        from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
+        slot = _Slot(QMediaPlayer(), QAudioOutput())
+        slot.player.setAudioOutput(slot.output)
+        slot.player.positionChanged.connect(lambda pos, s=slot: self._on_position(s, pos))
+        return slot
+
+    @staticmethod
+    def _playing(slot: _Slot) -> bool:
+        return slot.player.playbackState() == slot.player.PlaybackState.PlayingState
+
+    def _load(self, slot: _Slot, key: Key):
+        data = self._read(key)
+        slot.player.stop()
+        buf = QBuffer()
+        buf.setData(QByteArray(data))
+        buf.open(QIODevice.ReadOnly)
+        # The URL only tells the backend the format
+        slot.player.setSourceDevice(buf, QUrl.fromLocalFile(key[0]))
+        if slot.buffer is not None:
+            slot.buffer.close()
+        slot.buffer, slot.key = buf, key
+
+    def _slot_for(self, key: Key) -> _Slot:
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._slots.move_to_end(key)
+            return slot
+        if len(self._slots) < self.size:
+            slot = self._new_slot()
+        else:
+            # Least recently used player, unless that one is still sounding
+            victim = next((k for k, s in self._slots.items() if not self._playing(s)), next(iter(self._slots)))
+            slot = self._slots.pop(victim)
+        self._load(slot, key)
+        self._slots[key] = slot
+        return slot
+
+    def prefetch(self, paths: Sequence) -> int:
+        """Keep players loaded with the first `size` of `paths` (what plays
+        next, in order), reusing players that hold anything else. A player
+        still sounding is left alone; its file is skipped until a later call.
+        Returns how many of them are loaded."""
+        keys = []
+        for p in paths[:self.size]:
+            try:
+                keys.append(self._key(p))
+            except OSError:
+                pass
+        wanted = set(keys)
+        for key in keys:
+            if key in self._slots:
+                continue
+            if len(self._slots) < self.size:
+                slot = self._new_slot()
+            else:
+                spare = next((k for k, s in self._slots.items() if k not in wanted and not self._playing(s)), None)
+                if spare is None:
+                    break
+                slot = self._slots.pop(spare)
+            try:
+                self._load(slot, key)
+            except OSError:
+                continue
+            self._slots[key] = slot
+        return sum(k in self._slots for k in keys)
+
+    def play(self, path) -> bool:
+        start = time.perf_counter_ns()
+        try:
+            key = self._key(path)
+            hit = key in self._slots
+            slot = self._slot_for(key)
+        except OSError:
+            return False
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        for other in self._slots.values():
+            if other is not slot and self._playing(other):
+                other.player.stop()
+        self._pending = (slot, start, hit)
+        slot.player.setPosition(0)
+        slot.player.play()
+        return True
+
+    def _on_position(self, slot: _Slot, pos: int):
+        if self._pending is None or self._pending[0] is not slot or pos <= 0:
+            return
+        _, start, hit = self._pending
+        self._pending = None
+        dur = time.perf_counter_ns() - start
+        self.latencies.append(dur / 1e6)
+        if tracer.enabled:
+            tracer.record("audio.latency", "audio", start, dur, {"hit": hit})
+
+    def stop(self):
+        for slot in self._slots.values():
+            slot.player.stop()
+
+    def clear(self):
+        """Stop and unload every player and drop the cached bytes."""
+        self.stop()
+        for slot in self._slots.values():
+            slot.player.setSource(QUrl())
+            if slot.buffer is not None:
+                slot.buffer.close()
+            slot.player.deleteLater()
+            slot.output.deleteLater()
+        self._slots.clear()
+        self._data.clear()
+        self._bytes = 0
+        self._pending = None
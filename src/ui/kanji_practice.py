@@ -1,21 +1,56 @@
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QLineEdit,
-    QComboBox, QMessageBox, QGroupBox
+    QComboBox, QGroupBox
 )
 from PySide6.QtGui import QShortcut, QKeySequence
-from PySide6.QtCore import Qt
-from ..services.wanikani import get_wk_kanji
-from ..services.romaji import to_hiragana, normalize_english
+from PySide6.QtCore import Qt, QThreadPool
+from ..services.wanikani import load_cached_kanji, refresh_wk_kanji, SyncCancelled
+from ..services.matcher import AnswerMatcher, TYPO, READING_MODES
+from ..services.romaji import convert_incremental
 from ..db import SessionLocal
-from ..services.srs import record_result
+from ..services.srs import Scheduler
+from ..services.journal import journal
+from .workers import Worker
 import random
+import time
+
+TYPE_IN, CHOOSE_ANSWER, CHOOSE_KANJI = "Type answer", "Multiple choice", "Which kanji?"
+CHOICES = 4
+
+def load_deck(matcher: AnswerMatcher, mode: str, progress=None, cancel=None):
+    """Items, compiled answers and a loaded scheduler for a mode; runs on the pool."""
+    # Served from the local subject store; only kanji the mode can ask about
+    items = load_cached_kanji(mode)
+    answers = matcher.compile_deck(items, mode)
+    # New cards are introduced in WaniKani level order; practice draws
+    # interleave levels
+    scheduler = Scheduler("kanji", mode, groups={it["id"]: it["level"] for it in items})
+    journal.flush() # card states answered so far must be in the DB
+    with SessionLocal() as db:
+        scheduler.load(db, (it["id"] for it in sorted(items, key=lambda it: (it["level"], it["id"]))))
+    return mode, items, answers, scheduler
+
+def load_confusables(progress=None, cancel=None):
+    from ..services.confusables import load_or_build
+    with SessionLocal() as db:
+        return load_or_build(db, progress=progress, cancel=cancel)
 
 class KanjiPracticeTab(QWidget):
     def __init__(self):
         super().__init__()
         self.items = []
         self.current = None
-        self.undo_stack = [] # store last (item, correct?)
+        self.undo_stack = [] # store last (item, correct?, card state before the answer)
+        self.by_id = {}
+        self.scheduler = None
+        self._answered = False # first submit on a card is the one that gets scheduled
+        self._sync = None # running background Worker, if any
+        self._deck_job = None # Worker loading the deck for the current mode
+        self.matcher = AnswerMatcher()
+        self.answers = {} # subject id -> answers compiled for the current mode
+        self.confusables = None # services.confusables index, loaded for the choice formats
+        self._index_job = None
+        self._options = [] # (subject id or answer text, correct?) per choice button
 
         root = QVBoxLayout(self)
 
@@ -23,11 +58,18 @@ class KanjiPracticeTab(QWidget):
         top = QHBoxLayout()
         self.mode = QComboBox()
         self.mode.addItems(["On'yomi", "Kun'yomi", "Meaning"]) # Separate modes
+        self.format = QComboBox()
+        self.format.addItems([TYPE_IN, CHOOSE_ANSWER, CHOOSE_KANJI])
+        self.format.currentTextChanged.connect(self.on_format_changed)
         self.refresh_btn = QPushButton("Refresh WK Cache")
-        self.refresh_btn.clicked.connect(self.load_items)
+        self.refresh_btn.clicked.connect(self.on_refresh_clicked)
+        self.mode.currentTextChanged.connect(self.on_mode_changed)
+        self.sync_status = QLabel("")
         top.addWidget(QLabel("Mode:"))
         top.addWidget(self.mode)
+        top.addWidget(self.format)
         top.addStretch(1)
+        top.addWidget(self.sync_status)
         top.addWidget(self.refresh_btn)
         root.addLayout(top)
 
@@ -51,6 +93,23 @@ class KanjiPracticeTab(QWidget):
         ans_row.addWidget(self.submit)
         ans_row.addWidget(self.undo)
         root.addLayout(ans_row)
+        self.ans_row = ans_row
+
+        # Choices (multiple-choice formats); keys 1-4 pick
+        self.choice_box = QWidget()
+        choice_row = QHBoxLayout(self.choice_box)
+        self.choice_btns, self.choice_keys = [], []
+        for i in range(CHOICES):
+            b = QPushButton("")
+            b.setMinimumHeight(56)
+            b.clicked.connect(lambda _=False, i=i: self.on_choice(i))
+            key = QShortcut(QKeySequence(str(i + 1)), self, activated=lambda i=i: self.on_choice(i))
+            key.setEnabled(False) # digits stay typeable in the answer box
+            self.choice_keys.append(key)
+            choice_row.addWidget(b)
+            self.choice_btns.append(b)
+        self.choice_box.hide()
+        root.addWidget(self.choice_box)
 
         # Result label
         self.result = QLabel("")
@@ -64,81 +123,286 @@ class KanjiPracticeTab(QWidget):
         # Wiring
         self.submit.clicked.connect(self.on_submit)
         self.undo.clicked.connect(self.on_undo)
+        self.input.textEdited.connect(self.on_text_edited)
+
+        # Initial load: serve the last synced subjects, sync in the background
+        self.load_cached(then=self.next_item)
+        self.start_sync()
+
+    def load_cached(self, then=None):
+        """Load the deck for the current mode on the pool, swap it in, then
+        call `then`. The deck on screen stays usable meanwhile; a later call
+        supersedes a load still running."""
+        if self._deck_job is not None:
+            self._deck_job.cancel()
+        job = Worker(load_deck, self.matcher, self.mode.currentText())
+        job.signals.finished.connect(lambda deck, job=job: self._on_deck(job, deck, then))
+        job.signals.failed.connect(lambda msg: self.sync_status.setText(f"Could not load kanji: {msg}"))
+        self._deck_job = job
+        QThreadPool.globalInstance().start(job)
+
+    def _on_deck(self, job, deck, then):
+        if job is not self._deck_job:
+            return
+        self._deck_job = None
+        mode, items, answers, scheduler = deck
+        # Answers given while it loaded
+        scheduler.merge(journal.pending_cards("kanji", mode).values())
+        self.items = items
+        self.by_id = {it["id"]: it for it in items}
+        self.answers = answers
+        self.scheduler = scheduler
+        if then is not None:
+            then()
+
+    def start_sync(self, force: bool = False):
+        self.cancel_sync()
+        worker = Worker(refresh_wk_kanji, force_refresh=force, cancelled_exc=SyncCancelled)
+        worker.signals.progress.connect(self.sync_status.setText)
+        worker.signals.finished.connect(self.on_sync_finished)
+        worker.signals.failed.connect(self.on_sync_failed)
+        worker.signals.cancelled.connect(self.on_sync_cancelled)
+        self._sync = worker
+        self.refresh_btn.setText("Cancel Sync")
+        QThreadPool.globalInstance().start(worker)
+
+    def cancel_sync(self):
+        if self._sync is not None:
+            self._sync.cancel()
+            self._sync = None
+        self.refresh_btn.setText("Refresh WK Cache")
+
+    def on_refresh_clicked(self):
+        if self._sync is not None:
+            self.cancel_sync()
+            self.sync_status.setText("Sync cancelled.")
+        else:
+            self.start_sync(force=True)
+
+    def _sync_done(self) -> bool:
+        # Ignore late signals from a worker that was cancelled or replaced
+        worker = self.sender()
+        if self._sync is None or worker is not self._sync.signals:
+            return False
+        self._sync = None
+        self.refresh_btn.setText("Refresh WK Cache")
+        return True
+
+    def on_sync_finished(self, changed: bool):
+        if not self._sync_done():
+            return
+        if changed or not self.items:
+            self.load_cached(then=self._on_synced_deck)
+        else:
+            self.sync_status.setText("Up to date.")
+
+    def _on_synced_deck(self):
+        # Fresh subjects swapped in without disturbing the card on screen
+        self.sync_status.setText(f"Synced {len(self.items)} kanji.")
+        # Subjects changed: the choice index is stale
+        self.confusables = None
+        if self._choosing():
+            self.load_confusables()
+        if self.current is None or self.current["id"] not in self.by_id:
+            self.next_item()
+
+    def on_sync_failed(self, msg: str):
+        if self._sync_done():
+            self.sync_status.setText(f"WaniKani sync failed: {msg}")
+
+    def on_sync_cancelled(self):
+        self._sync_done()
+
+    def on_text_edited(self, text: str):
+        # IME-style: romaji turns into kana as it is typed in the reading modes
+        if self.mode.currentText() not in READING_MODES or self.input.cursorPosition() != len(text):
+            return
+        converted = convert_incremental(text)
+        if converted != text:
+            self.input.setText(converted)
+
+    def on_mode_changed(self, mode: str):
+        # Nothing to answer until the mode's deck is in
+        self.current = None
+        self.lbl_kanji.setText("…")
+        self.load_cached(then=self.next_item)
 
-        # Initial load
-        self.load_items()
-        self.next_item()
-
-        def load_items(self):
-            try:
-                self.items = get_wk_kanji(force_refresh=True)
-                random.shuffle(self.items)
-                QMessageBox.information(self, "WaniKani", f"Loaded {len(self.items)} kanji from WaniKani.")
-            except Exception as e:
-                QMessageBox.critical(self, "WaniKani Error", str(e))
-
-        def next_item(self):
-            if not self.items:
-                self.current = None
-                self.lbl_kanji.setText("—")
-                return
-            self.current = random.choice(self.items)
-            self.lbl_kanji.setText(self.current.get("characters", "?"))
-            self.input.clear()
-            self.result.setText("")
-            self.input.setFocus()
-
-        def expected_answers(self):
-            if not self.current:
-                return []
-            mode = self.mode.currentText()
-            if mode == "Meaning":
-                return [m.lower() for m in self.current.get("meanings", [])]
+    # --- multiple choice -------------------------------------------------
+    def _choosing(self) -> bool:
+        return self.format.currentText() != TYPE_IN
+
+    def on_format_changed(self, fmt: str):
+        choosing = self._choosing()
+        for w in (self.input, self.submit):
+            w.setVisible(not choosing)
+        self.choice_box.setVisible(choosing)
+        for key in self.choice_keys:
+            key.setEnabled(choosing)
+        if choosing and self.confusables is None:
+            self.load_confusables()
+        self._show_prompt()
+
+    def load_confusables(self):
+        if self._index_job is not None:
+            return
+        from ..services.confusables import IndexCancelled
+        job = Worker(load_confusables, cancelled_exc=IndexCancelled)
+        job.signals.progress.connect(self.sync_status.setText)
+        job.signals.finished.connect(self._on_confusables)
+        job.signals.failed.connect(self._on_confusables_failed)
+        job.signals.cancelled.connect(self._on_confusables_failed)
+        self._index_job = job
+        self.sync_status.setText("Preparing choices…")
+        QThreadPool.globalInstance().start(job)
+
+    def _on_confusables(self, index):
+        self._index_job = None
+        self.confusables = index
+        self.sync_status.setText("")
+        self._show_prompt()
+
+    def _on_confusables_failed(self, msg: str = ""):
+        self._index_job = None
+        if msg:
+            self.sync_status.setText(f"Could not prepare choices: {msg}")
+
+    def _text(self, sid: int) -> str:
+        # What a choice shows for a kanji: its first listed answer in this mode
+        shown = self._compiled(self.by_id[sid]).display
+        return shown[0] if shown else ""
+
+    def _show_prompt(self):
+        item = self.current
+        kanji_choices = self.format.currentText() == CHOOSE_KANJI
+        if item is None:
+            return
+        if kanji_choices:
+            self.lbl_kanji.setText(self._text(item["id"]))
+            self.lbl_kanji.setStyleSheet("font-size: 36px; font-weight: 700; padding: 24px;")
+        else:
+            self.lbl_kanji.setText(item.get("characters", "?"))
+            self.lbl_kanji.setStyleSheet("font-size: 72px; font-weight: 700; padding: 24px;")
+        self._options = []
+        if not self._choosing() or self.confusables is None:
+            for b in self.choice_btns:
+                b.setText("")
+                b.setEnabled(False)
+            return
+        from ..services.confusables import distractors
+        mode = self.mode.currentText()
+        sid = item["id"]
+        mine = self._compiled(item).exact
+        if kanji_choices:
+            # Kanji that also accept the prompt would be right too
+            prompt = self.matcher.normalize_guess(self._text(sid), mode)
+            usable = lambda o: o in self.by_id and prompt not in self._compiled(self.by_id[o]).exact
+        else:
+            usable = lambda o: (o in self.by_id and self._text(o)
+                                and self.matcher.normalize_guess(self._text(o), mode) not in mine)
+        others = distractors(self.confusables, sid, mode, CHOICES - 1, usable)
+        if kanji_choices:
+            self._options = [(sid, True)] + [(o, False) for o in others]
+        else:
+            texts = dict.fromkeys(self._text(o) for o in others)
+            self._options = [(self._text(sid), True)] + [(t, False) for t in texts]
+        random.shuffle(self._options)
+        for i, b in enumerate(self.choice_btns):
+            if i < len(self._options):
+                value = self._options[i][0]
+                b.setText(f"{i + 1}. {self.by_id[value]['characters'] if kanji_choices else value}")
+                b.setStyleSheet("font-size: 28px;" if kanji_choices else "")
+                b.setEnabled(True)
             else:
-                t = "onyomi" if mode.startswith("On") else "kunyomi"
-                return [r["reading"] for r in self.current.get("readings", []) if r.get("type") == t]
-            
-        def on_submit(self):
-            guess = self.input.text().strip()
-            mode = self.mode.currentText()
+                b.setText("")
+                b.setEnabled(False)
+
+    def on_choice(self, i: int):
+        if not self.current or not self._choosing() or i >= len(self._options):
+            return
+        self._answer(self._options[i][1], "Correct!")
+
+    def shutdown(self):
+        self.cancel_sync()
+        if self._deck_job is not None:
+            self._deck_job.cancel()
+        if self._index_job is not None:
+            self._index_job.cancel()
+
+    def next_item(self):
+        last = self.current.get("id") if self.current else None
+        key = self.scheduler.next(avoid=last) if self.scheduler else None
+        if key is None:
+            self.current = None
+            self.lbl_kanji.setText("—")
+            return
+        self.current = self.by_id[key]
+        self._answered = False
+        self._shown_at = time.monotonic()
+        self._show_prompt()
+        self.input.clear()
+        self.result.setText("")
+        self.input.setFocus()
+
+    def expected_answers(self):
+        if not self.current:
+            return []
+        return list(self._compiled(self.current).display)
+
+    def _compiled(self, item):
+        c = self.answers.get(item["id"])
+        if c is None:
+            c = self.answers[item["id"]] = self.matcher.compile_kanji(item, self.mode.currentText())
+        return c
+
+    def on_submit(self):
+        if not self.current or self._choosing():
+            return
+        m = self.matcher.match(self._compiled(self.current), self.input.text(), self.mode.currentText())
+        self._answer(m.ok, f"Close enough (typo) — it was “{m.expected}”." if m.verdict == TYPO else "Correct!")
+
+    def _answer(self, correct: bool, praise: str):
+        mode = self.mode.currentText()
+        prev = None
+        sid = self.current["id"]
+        card = None
+        if not self._answered:
+            self._answered = True
+            prev = self.scheduler.answer(sid, correct)
+            card = self.scheduler.cards[sid]
+        latency = int((time.monotonic() - self._shown_at) * 1000)
+        # Buffered; reaches SQLite on the journal's next flush
+        uid = journal.record("kanji", sid, mode, correct, card=card, latency_ms=latency)
+
+        # track for undo
+        self.undo_stack.append((self.current, correct, prev, uid, mode))
+
+        if correct:
+            self.next_item()
+            self.result.setStyleSheet("color: #8bdc8b; font-size: 18px; padding:6px;")
+            self.result.setText(praise)
+        else:
             answers = self.expected_answers()
-            if mode != "Meaning":
-                guess = to_hiragana(guess)
-            else:
-                guess = normalize_english(guess)
-                answers = [normalize_english(a) for a in answers]
-
-            correct = any(guess == a for a in answers)
-            with SessionLocal() as db:
-                record_result(db, correct)
-            
-            # track for undo
-            self.undo_stack.append((self.current, correct))
-
-            if correct:
-                self.result.setStyleSheet("color: #8bdc8b; font-size: 18px; padding:6px;")
-                self.result.setText("Correct! Press Enter for next…")
-                self.next_item()
-            else:
-                which = ", ".join(answers) if answers else "(none)"
-                label = f"Wrong. Expected: {which}"
-                self.result.setStyleSheet("color: #ff9292; font-size: 18px; padding:6px;")
-                self.result.setText(label)
-
-            def on_undo(self):
-                if not self.undo_stack:
-                    return
-                # Flip last result from wrong→correct (typo forgiveness)
-                item, was_correct = self.undo_stack.pop()
-                if was_correct:
-                    # already correct; do nothing
-                    return
-                with SessionLocal() as db:
-                    # subtract wrong, add correct
-                    from ..services.srs import get_or_create_stats
-                    s = get_or_create_stats(db)
-                    if s.wrong_answers > 0:
-                        s.wrong_answers -= 1
-                        s.correct_answers += 1
-                        db.commit()
-                self.result.setText("Undone last typo. You got credit.")
\ No newline at end of file
+            if self.format.currentText() == CHOOSE_KANJI:
+                answers = [self.current.get("characters", "?")]
+            which = ", ".join(answers) if answers else "(none)"
+            label = f"Wrong. Expected: {which}"
+            self.result.setStyleSheet("color: #ff9292; font-size: 18px; padding:6px;")
+            self.result.setText(label)
+
+    def on_undo(self):
+        if not self.undo_stack:
+            return
+        # Flip last result from wrong→correct (typo forgiveness)
+        item, was_correct, prev, uid, mode = self.undo_stack.pop()
+        if was_correct:
+            # already correct; do nothing
+            return
+        card = None
+        if prev is not None and mode == self.scheduler.mode and item["id"] in self.scheduler.cards:
+            # Reschedule as if it had been answered correctly
+            self.scheduler.restore(prev)
+            self.scheduler.answer(item["id"], True)
+            card = self.scheduler.cards[item["id"]]
+        # subtract wrong, add correct
+        journal.amend(uid, "kanji", item["id"], mode, card=card)
+        self.result.setText("Undone last typo. You got credit.")
\ No newline at end of file
@@ -1,42 +1,61 @@
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QLineEdit,
-    QTableWidget, QTableWidgetItem, QHeaderView, QDateEdit, QMessageBox
+    QTableView, QHeaderView, QDateEdit, QMessageBox, QAbstractItemView
 )
-from PySide6.QtCore import Qt, QDate
+from PySide6.QtCore import Qt, QDate, QThreadPool, Signal
 from PySide6.QtGui import QShortcut, QKeySequence
 from ..db import SessionLocal
-from ..models import Word, DailyBundle
-from ..services.tts import ensure_tts_audio
-from ..services.srs import record_result
+from ..models import Word
+from ..services.bundles import bundle_words, generate_bundle, plan_bundles, save_bundle
+from ..config import config
+from ..services.tts import tts
+from ..services.srs import Scheduler
+from ..services.journal import journal
+from ..services.matcher import AnswerMatcher, TYPO
+from .audio_pool import AudioPool
+from .workers import Worker
+from .word_table_model import WordTableModel
 from pathlib import Path
-import random, os
+import time
 
-# QtMultimedia
-from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
-from PySide6.QtCore import QUrl
+def load_schedule(word_ids: list[int], progress=None, cancel=None) -> Scheduler:
+    """Listening cards for a bundle; runs on the pool."""
+    scheduler = Scheduler("word", "Listening")
+    journal.flush() # card states answered so far must be in the DB
+    with SessionLocal() as db:
+        scheduler.load(db, word_ids)
+    return scheduler
 
 class ListeningPracticeTab(QWidget):
+    audio_ready = Signal(int, str) # word id, path; emitted from TTS threads
+
     def __init__(self):
         super().__init__()
-        self.player = QMediaPlayer()
-        self.audio = QAudioOutput()
-        self.player.setAudioOutput(self.audio)
+        self.sounds = None # AudioPool, made on first use; QtMultimedia is slow to load
 
         self.current_list: list[Word] = []
         self.current_idx = -1
+        self.matcher = AnswerMatcher()
+        self.answers = [] # compiled translations, parallel to current_list
+        self.scheduler = Scheduler("word", "Listening")
+        self._answered = False
+        self._waiting_audio = None # word id whose audio Play is waiting for
+        self._bundle_job = None # Worker loading card states for a new bundle
 
         root = QVBoxLayout(self)
 
-        # Bundle controls (pick date or random 10)
+        # Bundle controls (pick date, generate or plan ahead)
         row = QHBoxLayout()
         self.date = QDateEdit()
         self.date.setDate(QDate.currentDate())
-        self.pick_btn = QPushButton("Load Daily Bundle (10)")
+        self.pick_btn = QPushButton(f"Load Daily Bundle ({config.BUNDLE_SIZE})")
+        self.plan_btn = QPushButton(f"Plan {config.BUNDLE_PLAN_DAYS} Days")
         self.prepare_btn = QPushButton("Prepare Today From Selection…")
         row.addWidget(QLabel("Date:"))
         row.addWidget(self.date)
         row.addStretch(1)
         row.addWidget(self.pick_btn)
+        row.addWidget(self.plan_btn)
         row.addWidget(self.prepare_btn)
         root.addLayout(row)
 
@@ -59,8 +78,14 @@ class ListeningPracticeTab(QWidget):
         root.addWidget(self.result)
 
         # Selection table (for preparing daily bundle)
-        self.table = QTableWidget(0, 4)
-        self.table.setHorizontalHeaderLabels(["ID", "Word", "Translation", "Audio?"])
+        self.filter = QLineEdit()
+        self.filter.setPlaceholderText("Search words (kanji, kana, romaji or English)…")
+        root.addWidget(self.filter)
+        self.model = WordTableModel(["id", "word", "translation", "has_audio"], sort_key="id", descending=True)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         root.addWidget(self.table)
 
@@ -70,25 +95,40 @@ class ListeningPracticeTab(QWidget):
 
         # Wire
         self.pick_btn.clicked.connect(self.load_bundle)
+        self.plan_btn.clicked.connect(self.plan_ahead)
         self.prepare_btn.clicked.connect(self.prepare_from_selection)
         self.play_btn.clicked.connect(self.play_audio)
         self.submit.clicked.connect(self.on_submit)
-
-        self.refresh_table()
+        self.audio_ready.connect(self._on_audio_ready)
+        self.model.attach_search(self.filter)
 
     def refresh_table(self):
-        with SessionLocal() as db:
-            rows = db.query(Word).order_by(Word.created_at.desc()).all()
-        self.table.setRowCount(len(rows))
-        for r, w in enumerate(rows):
-            self.table.setItem(r, 0, QTableWidgetItem(str(w.id)))
-            self.table.setItem(r, 1, QTableWidgetItem(w.word))
-            self.table.setItem(r, 2, QTableWidgetItem(w.translation))
-            self.table.setItem(r, 3, QTableWidgetItem("✓" if w.audio_path and Path(w.audio_path).exists() else "✗"))
+        self.model.reset()
 
     def _set_bundle(self, words: list[Word]):
-        random.shuffle(words)
-        self.current_list = words[:10]
+        # Card states are read on the pool; the bundle starts when they are in
+        if self._bundle_job is not None:
+            self._bundle_job.cancel()
+        job = Worker(load_schedule, [w.id for w in words])
+        job.signals.finished.connect(lambda scheduler, job=job: self._on_schedule(job, words, scheduler))
+        job.signals.failed.connect(lambda msg: self.result.setText(f"Could not load the bundle: {msg}"))
+        self._bundle_job = job
+        self.result.setText("Loading bundle…")
+        QThreadPool.globalInstance().start(job)
+
+    def _on_schedule(self, job, words: list[Word], scheduler: Scheduler):
+        if job is not self._bundle_job:
+            return
+        self._bundle_job = None
+        # Answers given while it loaded
+        scheduler.merge(journal.pending_cards("word", "Listening").values())
+        self.scheduler = scheduler
+        # Most overdue first, then new, then words not yet due
+        by_id = {w.id: w for w in words}
+        self.current_list = [by_id[i] for i in self.scheduler.order(by_id)]
+        self.answers = [self.matcher.compile_translation(w.translation) for w in self.current_list]
+        # Render missing audio now so Play finds a warm file
+        tts.prefetch((w.word, w.id) for w in self.current_list if not self._own_audio(w))
         self.current_idx = -1
         self.result.setText("")
         self.next_item()
@@ -96,50 +136,110 @@ class ListeningPracticeTab(QWidget):
     def load_bundle(self):
         d = self.date.date().toString("yyyyMMdd")
         with SessionLocal() as db:
-            row = db.query(DailyBundle).filter_by(yyyymmdd=d).first()
-            if row:
-                ids = [int(x) for x in row.word_ids.split(",") if x.strip().isdigit()]
-                words = db.query(Word).filter(Word.id.in_(ids)).all()
-                self._set_bundle(words)
-                return
-            # else create random bundle of 10
-            words = db.query(Word).all()
-            if len(words) < 10:
-                QMessageBox.warning(self, "Bundle", "Not enough words (<10) to form bundle.")
-                return
-            chosen = random.sample(words, 10)
-            db.add(DailyBundle(yyyymmdd=d, word_ids=",".join(str(w.id) for w in chosen)))
+            words = bundle_words(db, d)
+            if words is None:
+                ids = generate_bundle(db)
+                if not ids:
+                    QMessageBox.warning(self, "Bundle", "No words match the bundle settings.")
+                    return
+                save_bundle(db, d, ids)
+                db.commit()
+                words = bundle_words(db, d)
+            self._set_bundle(words)
+
+    def plan_ahead(self):
+        start = self.date.date().toPython()
+        with SessionLocal() as db:
+            planned = plan_bundles(db, start, config.BUNDLE_PLAN_DAYS)
             db.commit()
-            self._set_bundle(chosen)
+        QMessageBox.information(self, "Plan", f"Prepared {len(planned)} new bundle(s) for the next {config.BUNDLE_PLAN_DAYS} days.")
 
     def prepare_from_selection(self):
         d = self.date.date().toString("yyyyMMdd")
-        selected_rows = set(i.row() for i in self.table.selectedIndexes())
+        selected_rows = set(i.row() for i in self.table.selectionModel().selectedRows())
         if not selected_rows:
             QMessageBox.information(self, "Prepare", "Please select rows in the table (Cmd/Ctrl-click).")
             return
-        ids = []
-        for r in selected_rows:
-            item = self.table.item(r, 0)
-            if item:
-                ids.append(int(item.text()))
+        ids = [self.model.id_at(r) for r in sorted(selected_rows)]
         with SessionLocal() as db:
             words = db.query(Word).filter(Word.id.in_(ids)).all()
             if len(words) < 1:
                 QMessageBox.warning(self, "Prepare", "No valid rows selected.")
                 return
-            db.merge(DailyBundle(yyyymmdd=d, word_ids=",".join(str(w.id) for w in words)))
+            save_bundle(db, d, [w.id for w in words])
             db.commit()
             self._set_bundle(words)
 
+    @staticmethod
+    def _own_audio(w: Word):
+        p = Path(w.audio_path) if w.audio_path else None
+        return p if p is not None and p.exists() else None
+
     def play_audio(self):
         if 0 <= self.current_idx < len(self.current_list):
             w = self.current_list[self.current_idx]
-            audio_path = Path(w.audio_path) if w.audio_path else None
-            if not audio_path or not audio_path.exists():
-                audio_path = ensure_tts_audio(w.word)
-            self.player.setSource(QUrl.fromLocalFile(str(audio_path)))
-            self.player.play()
+            audio_path = self._own_audio(w)
+            if audio_path:
+                self._play(audio_path)
+                return
+            fut = tts.submit(w.word, word_id=w.id)
+            if fut.done() and not fut.cancelled() and fut.exception() is None:
+                self._play(fut.result())
+                return
+            self._waiting_audio = w.id
+            self._when_rendered(fut, w.id)
+
+    def _when_rendered(self, fut, word_id: int):
+        fut.add_done_callback(lambda f: self.audio_ready.emit(
+            word_id, "" if f.cancelled() or f.exception() else str(f.result())))
+
+    def _upcoming(self) -> list[Word]:
+        return self.current_list[max(0, self.current_idx):self.current_idx + config.AUDIO_PLAYERS]
+
+    def _prefetch_audio(self):
+        # Load players for this item and the next ones while the user answers;
+        # audio still rendering is loaded when it arrives (_on_audio_ready)
+        paths = []
+        for w in self._upcoming():
+            path = self._own_audio(w)
+            if path is None:
+                fut = tts.submit(w.word, word_id=w.id)
+                if not fut.done():
+                    self._when_rendered(fut, w.id)
+                    continue
+                if fut.cancelled() or fut.exception() is not None:
+                    continue
+                path = fut.result()
+            paths.append(path)
+        if paths:
+            self._sounds().prefetch(paths)
+
+    def _on_audio_ready(self, word_id: int, path: str):
+        if path and any(w.id == word_id for w in self._upcoming()):
+            self._prefetch_audio()
+        if self._waiting_audio != word_id:
+            return
+        self._waiting_audio = None
+        cur = self.current_list[self.current_idx] if 0 <= self.current_idx < len(self.current_list) else None
+        if not path:
+            self.result.setText("Could not render audio for this word.")
+        elif cur is not None and cur.id == word_id:
+            self._play(Path(path))
+
+    def _sounds(self) -> AudioPool:
+        if self.sounds is None:
+            self.sounds = AudioPool()
+        return self.sounds
+
+    def _play(self, path: Path):
+        if not self._sounds().play(path):
+            self.result.setText("Could not open the audio for this word.")
+
+    def shutdown(self):
+        if self._bundle_job is not None:
+            self._bundle_job.cancel()
+        if self.sounds is not None:
+            self.sounds.clear()
 
     def next_item(self):
         self.current_idx += 1
@@ -148,6 +248,9 @@ class ListeningPracticeTab(QWidget):
             self.result.setText("Great job — bundle complete.")
             return
         self.lbl_index.setText(f"{self.current_idx+1} / {len(self.current_list)}")
+        self._answered = False
+        self._shown_at = time.monotonic()
+        self._prefetch_audio()
         self.answer.clear()
         self.answer.setFocus()
 
@@ -155,14 +258,21 @@ class ListeningPracticeTab(QWidget):
         if not (0 <= self.current_idx < len(self.current_list)):
             return
         w = self.current_list[self.current_idx]
-        guess = self.answer.text().strip().lower()
-        truth = (w.translation or "").strip().lower()
-        correct = guess == truth
-        with SessionLocal() as db:
-            record_result(db, correct)
+        m = self.matcher.match(self.answers[self.current_idx], self.answer.text(), "Listening")
+        correct = m.ok
+        card = None
+        if not self._answered:
+            self._answered = True
+            self.scheduler.answer(w.id, correct)
+            card = self.scheduler.cards[w.id]
+        latency = int((time.monotonic() - self._shown_at) * 1000)
+        journal.record("word", w.id, "Listening", correct, card=card, latency_ms=latency)
         if correct:
             self.result.setStyleSheet("color:#8bdc8b")
-            self.result.setText("Correct! (Enter for next)")
+            if m.verdict == TYPO:
+                self.result.setText(f"Close enough (typo) — {w.translation}")
+            else:
+                self.result.setText("Correct! (Enter for next)")
             self.next_item()
         else:
             self.result.setStyleSheet("color:#ff9292")
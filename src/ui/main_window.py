@@ -1,13 +1,41 @@
-from PySide6.QtWidgets import (QMainWindow, QWidget, QTabWidget, QMessageBox)
-from PySide6.QtGui import QPalette, QColor
-from PySide6.QtCore import Qt
-from ..db import engine
-from ..models import Base
-from .kanji_practice import KanjiPracticeTab
-from .listening_practice import ListeningPracticeTab
-from .words_admin import WordsAdminTab
-from .stats_panel import StatsPanel
-from ..utils.backup import backup_db
+from importlib import import_module
+from PySide6.QtWidgets import (QMainWindow, QWidget, QTabWidget, QMessageBox, QVBoxLayout, QLabel)
+from PySide6.QtGui import QPalette, QColor, QKeySequence, QShortcut
+from PySide6.QtCore import Qt, QEvent, QThreadPool, QTimer
+from .workers import Worker
+from ..utils.backup import BackupCancelled, backup_db
+from ..utils.perf import tracer
+
+PERF_WINDOW_S = 60 # the overlay's p50/p95 cover spans that ended this recently
+PERF_SHOWN = 4
+
+# Tabs in display order: (title, module, class). Each is imported and built
+# the first time it is shown, so startup only pays for the first one, after
+# the window is up.
+TABS = (
+    ("WaniKani Practice", ".kanji_practice", "KanjiPracticeTab"),
+    ("Listening Practice", ".listening_practice", "ListeningPracticeTab"),
+    ("Words Admin", ".words_admin", "WordsAdminTab"),
+    ("Stats", ".stats_panel", "StatsPanel"),
+)
+
+def tab_factory(module: str, name: str):
+    return lambda: getattr(import_module(module, __package__), name)()
+
+class LazyTab(QWidget):
+    """Tab page that builds its real widget on first activation."""
+    def __init__(self, factory):
+        super().__init__()
+        self.factory = factory
+        self.widget = None
+        self._layout = QVBoxLayout(self)
+        self._layout.setContentsMargins(0, 0, 0, 0)
+
+    def build(self) -> QWidget:
+        if self.widget is None:
+            self.widget = self.factory()
+            self._layout.addWidget(self.widget)
+        return self.widget
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -15,22 +43,99 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Crisp Study — Kanji & Listening")
         self.resize(1100, 720)
 
-        # Ensure DB tables
-        Base.metadata.create_all(bind=engine)
-
         # Dark mode theme (study vibe)
         self._enable_dark_theme()
 
-        # Backups
-        backup_db()
+        self.tabs = tabs = QTabWidget()
+        for title, module, name in TABS:
+            tabs.addTab(LazyTab(tab_factory(module, name)), title)
+        self.setCentralWidget(tabs)
+        self._queued = False
+        self._started = False
+        self._backup = None
 
-        tabs = QTabWidget()
-        tabs.addTab(KanjiPracticeTab(), "WaniKani Practice")
-        tabs.addTab(ListeningPracticeTab(), "Listening Practice")
-        tabs.addTab(WordsAdminTab(), "Words Admin")
-        tabs.addTab(StatsPanel(), "Stats")
+    def event(self, e):
+        if e.type() == QEvent.Paint and not self._queued:
+            self._queued = True
+            # Database work and the first tab wait until the window has painted
+            QTimer.singleShot(0, self._start)
+        return super().event(e)
 
-        self.setCentralWidget(tabs)
+    def _start(self):
+        from ..db import init_db
+        from ..services.journal import journal
+        # Ensure DB tables and migrate older study.db files
+        init_db()
+        # Replays reviews a crashed run left in the journal, then flushes on a timer
+        journal.start()
+
+        # Backups run on the thread pool so a large database does not delay startup
+        self._backup = Worker(backup_db, cancelled_exc=BackupCancelled)
+        self._backup.signals.finished.connect(
+            lambda path: path and self.statusBar().showMessage(f"Backup saved: {path.name}", 5000))
+        self._backup.signals.failed.connect(lambda msg: self.statusBar().showMessage(f"Backup failed: {msg}"))
+        QThreadPool.globalInstance().start(self._backup)
+
+        if tracer.enabled:
+            self._start_perf_overlay()
+
+        self.tabs.currentChanged.connect(self._on_tab_changed)
+        self.tabs.currentWidget().build()
+        self._started = True
+
+    def _start_perf_overlay(self):
+        self._perf = QLabel("")
+        self.statusBar().addPermanentWidget(self._perf)
+        self._perf_timer = QTimer(self)
+        self._perf_timer.timeout.connect(self._show_perf)
+        self._perf_timer.start(1000)
+        QShortcut(QKeySequence("Ctrl+Shift+T"), self, self._export_trace)
+
+    def _show_perf(self):
+        rows = tracer.summary(PERF_WINDOW_S)
+        sql = [r for r in rows if r[0].startswith("sql ") and r[0] != "sql commit"]
+        parts = [f"SQL {sum(r[1] for r in sql)}q {sum(r[2] for r in sql):.0f}ms"] if sql else []
+        parts += [f"{name} {p50:.1f}/{p95:.1f}ms" for name, _n, _total, p50, p95 in
+                  [r for r in rows if r not in sql][:PERF_SHOWN]]
+        self._perf.setText("  |  ".join(parts))
+        self._perf.setToolTip(
+            f"<b>Last {PERF_WINDOW_S}s</b> (count, total, p50, p95 ms)<pre>"
+            + "\n".join(f"{name:<28} {n:>6} {total:>9.1f} {p50:>8.2f} {p95:>8.2f}"
+                        for name, n, total, p50, p95 in rows) + "</pre>")
+
+    def _export_trace(self):
+        try:
+            path = tracer.export()
+        except OSError as e:
+            self.statusBar().showMessage(f"Trace not saved: {e}", 5000)
+            return
+        self.statusBar().showMessage(f"Trace saved: {path} ({len(tracer.spans):,} spans)", 5000)
+
+    def _on_tab_changed(self, index: int):
+        from ..services.journal import journal
+        self.tabs.widget(index).build()
+        journal.flush()
+
+    def closeEvent(self, event):
+        # Let tabs stop background work before the widgets go away
+        for i in range(self.tabs.count()):
+            shutdown = getattr(self.tabs.widget(i).widget, "shutdown", None)
+            if shutdown:
+                shutdown()
+        if self._started:
+            from ..services.journal import journal
+            from ..services.media import media
+            from ..services.tts import tts
+            self._backup.cancel()
+            tts.shutdown()
+            media.flush_touches()
+            journal.close()
+        if tracer.enabled and tracer.spans:
+            try:
+                tracer.export()
+            except OSError:
+                pass
+        super().closeEvent(event)
 
     def _enable_dark_theme(self):
         pal = QPalette()
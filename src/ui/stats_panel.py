@@ -1,22 +1,143 @@
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel
+import time
+from datetime import date, datetime
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QGroupBox, QTableWidget, QTableWidgetItem,
+    QHeaderView, QAbstractItemView
+)
+from PySide6.QtGui import QFont
+from PySide6.QtCore import Signal
 from ..db import SessionLocal
-from ..services.srs import get_or_create_stats
+from ..services import analytics
+from ..services.journal import journal
+from ..utils.perf import traced
+
+SPARK = "▁▂▃▄▅▆▇█"
+TREND_DAYS = 14
+
+def sparkline(values) -> str:
+    """One block per value, scaled to the largest; blanks for missing (NaN)."""
+    vals = [v for v in values if v == v]
+    top = max(vals, default=0) or 1
+    return "".join(" " if v != v else SPARK[min(len(SPARK) - 1, int(v / top * (len(SPARK) - 1)))] for v in values)
 
 class StatsPanel(QWidget):
+    answered = Signal(dict) # journal entries; the journal calls listeners on the answering thread
+
     def __init__(self):
         super().__init__()
-        self.lbl = QLabel("")
+        self._today = ""
+        self._today_n = self._today_ok = 0
+        self._streak_before = 0 # streak up to yesterday
         root = QVBoxLayout(self)
-        root.addWidget(self.lbl)
+
+        self.lbl = QLabel("")
+        self.today = QLabel("")
+        top = QHBoxLayout()
+        top.addWidget(self.lbl)
+        top.addWidget(self.today)
+        top.addStretch(1)
+        root.addLayout(top)
+
+        mono = QFont("monospace")
+        mono.setStyleHint(QFont.Monospace)
+        box = QGroupBox(f"Last {TREND_DAYS} days")
+        lay = QVBoxLayout(box)
+        self.trend = QLabel("")
+        self.trend.setFont(mono)
+        lay.addWidget(self.trend)
+        self.breakdown = QLabel("")
+        self.breakdown.setFont(mono)
+        lay.addWidget(self.breakdown)
+        root.addWidget(box)
+
+        box = QGroupBox("Due")
+        lay = QVBoxLayout(box)
+        self.forecast = QLabel("")
+        self.forecast.setFont(mono)
+        lay.addWidget(self.forecast)
+        root.addWidget(box)
+
+        box = QGroupBox(f"Leeches (forgotten {analytics.LEECH_LAPSES}+ times)")
+        lay = QVBoxLayout(box)
+        self.leeches = QTableWidget(0, 5)
+        self.leeches.setHorizontalHeaderLabels(["Item", "Mode", "Lapses", "Reviews", "Accuracy"])
+        self.leeches.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.leeches.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        lay.addWidget(self.leeches)
+        root.addWidget(box, stretch=1)
+
+        self.answered.connect(self._on_answer)
+        journal.add_listener(self.answered.emit)
+
+    def showEvent(self, event):
+        super().showEvent(event)
         self.refresh()
 
+    @traced("stats.refresh", "ui")
     def refresh(self):
+        """Reload everything from the rollups (on show); answers in between
+        only touch the counters (see _on_answer)."""
+        journal.flush()
+        today = date.today()
         with SessionLocal() as db:
-            s = get_or_create_stats(db)
-        acc = (s.correct_answers / s.total_reviews * 100.0) if s.total_reviews else 0.0
+            _, self._today_n, self._today_ok = analytics.daily(db, 1, today=today)[0]
+            streak = analytics.streak(db, today)
+            trend = analytics.accuracy_trend(db, TREND_DAYS, today=today)
+            by_mode = analytics.accuracy_by(db, "mode", days=TREND_DAYS, today=today)
+            by_level = [r for r in analytics.accuracy_by(db, "level", days=TREND_DAYS, today=today) if r[0]]
+            due = analytics.forecast(db, 7)
+            leeches = analytics.leeches(db)
+        self._today = today.strftime("%Y%m%d")
+        self._streak_before = streak - 1 if self._today_n else streak
+        self._show_counters()
+
+        acc = trend["rolling"]
+        self.trend.setText(
+            f"reviews  {sparkline(trend['reviews'].astype(float))}  {int(trend['reviews'].sum())}\n"
+            f"accuracy {sparkline(trend['accuracy'])}  "
+            + ("—" if acc[-1] != acc[-1] else f"{acc[-1] * 100:.0f}% over the last week"))
+        lines = [f"{m:<10} {n:>6} reviews  {c / n * 100:5.1f}%" + (f"  {ms / 1000:.1f}s" if ms else "")
+                 for m, n, c, ms in by_mode if n]
+        if by_level:
+            lines.append("by level   " + "  ".join(f"L{lv} {c / n * 100:.0f}%" for lv, n, c, _ in by_level if n))
+        self.breakdown.setText("\n".join(lines) or "No reviews yet.")
+        self.forecast.setText("   ".join(
+            f"{'today' if i == 0 else datetime.strptime(d, '%Y%m%d').strftime('%a')} {n}" for i, (d, n) in enumerate(due)))
+
+        self.leeches.setRowCount(len(leeches))
+        for r, l in enumerate(leeches):
+            cells = (l["label"], l["mode"], str(l["lapses"]), str(l["reviews"]),
+                     "—" if l["accuracy"] is None else f"{l['accuracy'] * 100:.0f}%")
+            for c, text in enumerate(cells):
+                self.leeches.setItem(r, c, QTableWidgetItem(text))
+
+    def _on_answer(self, entry: dict):
+        day = time.strftime("%Y%m%d")
+        if day != self._today:
+            # First answer of a new day; refresh() flushes it and counts it
+            self.refresh()
+            return
+        if entry["op"] == "review":
+            self._today_n += 1
+            self._today_ok += bool(entry["correct"])
+        else:
+            self._today_ok += 1
+        self._show_counters()
+
+    def _show_counters(self):
+        # In-memory counters: includes answers the journal has not flushed yet
+        total, correct, wrong = journal.totals()
+        acc = (correct / total * 100.0) if total else 0.0
         self.lbl.setText(
-            f"Total Reviews: {s.total_reviews}\n"
-            f"Correct: {s.correct_answers}\n"
-            f"Wrong: {s.wrong_answers}\n"
+            f"Total Reviews: {total}\n"
+            f"Correct: {correct}\n"
+            f"Wrong: {wrong}\n"
             f"Accuracy: {acc:.1f}%"
-        )
\ No newline at end of file
+        )
+        streak = self._streak_before + (1 if self._today_n else 0)
+        today_acc = f"{self._today_ok / self._today_n * 100:.0f}%" if self._today_n else "—"
+        self.today.setText(
+            f"Today: {self._today_n} reviews\n"
+            f"Accuracy today: {today_acc}\n"
+            f"Streak: {streak} day{'s' if streak != 1 else ''}"
+        )
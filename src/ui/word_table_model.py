@@ -0,0 +1,237 @@
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt, QTimer
+from sqlalchemy import func, select, tuple_
+from typing import Dict, List, Optional, Sequence, Tuple
+from ..db import SessionLocal
+from ..models import MediaOwner, Word
+from ..services.media import media
+from ..services.search import match_ids, page_ids, rank_ids
+from ..utils.perf import traced
+
+PAGE_SIZE = 256
+SEARCH_DELAY_MS = 150 # search once typing pauses, not on every keystroke
+
+# key -> (header, column expression used for ordering/keyset)
+COLUMNS = {
+    "id": ("ID", Word.id),
+    "word": ("Word", Word.word),
+    "translation": ("Translation", Word.translation),
+    "tags": ("Tags", func.coalesce(Word.tags, "")),
+    "audio_path": ("Audio Path", func.coalesce(Word.audio_path, "")),
+    "created_at": ("Added", Word.created_at),
+    # The media manifest's answer, the same one the cell shows (_has_audio)
+    "has_audio": ("Audio?", select(MediaOwner.word_id).where(MediaOwner.word_id == Word.id).exists()),
+}
+_FIELDS = ("id", "word", "translation", "tags", "audio_path", "created_at")
+
+class WordTableModel(QAbstractTableModel):
+    """Words, fetched a page at a time with keyset pagination.
+
+    Sorting and filtering are done by SQLite; rows are only loaded as the view
+    scrolls (canFetchMore/fetchMore). Single-row edits update just that row.
+    A filter is a full-text search (services.search): results come best match
+    first until a column header is clicked, or in column order when the query
+    is too broad to rank."""
+    def __init__(self, columns: Sequence[str], sort_key: str = "id", descending: bool = True, parent=None):
+        super().__init__(parent)
+        self.columns = list(columns)
+        self.sort_key = sort_key
+        self.descending = descending
+        self.filter_text = ""
+        self.relevance = True # order search results by rank
+        self.ranked: Optional[List[int]] = None # ranked ids of the current search
+        self._ranked_pos = 0
+        self.rows: List[Tuple] = []
+        self.row_of: Dict[int, int] = {}
+        self._exhausted = False
+        self._audio: Dict[int, bool] = {}
+        self.reset()
+
+    # --- Qt model API ----------------------------------------------------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[self.columns[section]][0]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        row = self.rows[index.row()]
+        key = self.columns[index.column()]
+        if key == "has_audio":
+            return "✓" if self._has_audio(row) else "✗"
+        value = row[_FIELDS.index(key)]
+        return "" if value is None else str(value)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    @traced("table.fetch_more", "ui")
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        page = self._query_page()
+        if self.ranked is None and len(page) < PAGE_SIZE:
+            self._exhausted = True
+        if not page:
+            return
+        start = len(self.rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(page) - 1)
+        for i, r in enumerate(page):
+            self.row_of[r[0]] = start + i
+        self.rows.extend(page)
+        self.endInsertRows()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sort_key = self.columns[column]
+        self.descending = order == Qt.DescendingOrder
+        self.relevance = False
+        self.reset()
+
+    # --- queries ---------------------------------------------------------
+    def _base(self):
+        q = select(*(getattr(Word, f) for f in _FIELDS))
+        if self.filter_text:
+            q = q.where(Word.id.in_(match_ids(self.filter_text)))
+        return q
+
+    def _sort_expr(self):
+        return COLUMNS[self.sort_key][1]
+
+    def _query_page(self) -> List[Tuple]:
+        if self.ranked is not None:
+            ids = self.ranked[self._ranked_pos:self._ranked_pos + PAGE_SIZE]
+            self._ranked_pos += len(ids)
+            if self._ranked_pos >= len(self.ranked):
+                self._exhausted = True
+            if not ids:
+                return []
+            with SessionLocal() as db:
+                found = {r[0]: tuple(r) for r in db.execute(self._base().where(Word.id.in_(ids)))}
+            return [found[i] for i in ids if i in found]
+        if self.filter_text and self.sort_key == "id":
+            with SessionLocal() as db:
+                ids = page_ids(db, self.filter_text, self.rows[-1][0] if self.rows else None,
+                               self.descending, PAGE_SIZE)
+                found = {r[0]: tuple(r) for r in db.execute(
+                    select(*(getattr(Word, f) for f in _FIELDS)).where(Word.id.in_(ids)))}
+            return [found[i] for i in ids if i in found]
+        q = self._base()
+        expr = self._sort_expr()
+        if self.rows:
+            last = self.rows[-1]
+            last_val = self._sort_value(last)
+            if self.sort_key == "id":
+                q = q.where(Word.id < last[0] if self.descending else Word.id > last[0])
+            elif self.descending:
+                q = q.where(tuple_(expr, Word.id) < tuple_(last_val, last[0]))
+            else:
+                q = q.where(tuple_(expr, Word.id) > tuple_(last_val, last[0]))
+        if self.descending:
+            q = q.order_by(expr.desc(), Word.id.desc())
+        else:
+            q = q.order_by(expr.asc(), Word.id.asc())
+        with SessionLocal() as db:
+            return [tuple(r) for r in db.execute(q.limit(PAGE_SIZE))]
+
+    def _sort_value(self, row: Tuple):
+        if self.sort_key == "has_audio":
+            return self._has_audio(row)
+        v = row[_FIELDS.index(self.sort_key)]
+        return "" if v is None and self.sort_key in ("tags", "audio_path") else v
+
+    def _has_audio(self, row: Tuple) -> bool:
+        # Only asked for rows the view paints; one manifest lookup covers
+        # this row and the loaded rows after it
+        if row[0] not in self._audio:
+            start = self.row_of.get(row[0], 0)
+            ids = [r[0] for r in self.rows[start:start + PAGE_SIZE] if r[0] not in self._audio] or [row[0]]
+            have = media.words_with_audio(ids)
+            self._audio.update((i, i in have) for i in ids)
+        return self._audio[row[0]]
+
+    # --- updates ---------------------------------------------------------
+    @traced("table.reset", "ui")
+    def reset(self):
+        self.beginResetModel()
+        self.rows = []
+        self.row_of = {}
+        self._audio = {}
+        self._exhausted = False
+        self.ranked = None
+        self._ranked_pos = 0
+        if self.filter_text and self.relevance:
+            with SessionLocal() as db:
+                self.ranked = rank_ids(db, self.filter_text)
+        self.endResetModel()
+        self.fetchMore()
+
+    def set_filter(self, text: str):
+        text = text.strip()
+        if text != self.filter_text:
+            self.filter_text = text
+            self.relevance = True
+            self.reset()
+
+    def attach_search(self, edit, delay_ms: int = SEARCH_DELAY_MS):
+        """Search-as-you-type from a QLineEdit, debounced."""
+        timer = QTimer(self)
+        timer.setSingleShot(True)
+        timer.setInterval(delay_ms)
+        timer.timeout.connect(lambda: self.set_filter(edit.text()))
+        edit.textChanged.connect(timer.start)
+        edit.returnPressed.connect(lambda: (timer.stop(), self.set_filter(edit.text())))
+
+    def id_at(self, row: int) -> Optional[int]:
+        return self.rows[row][0] if 0 <= row < len(self.rows) else None
+
+    def row_dict(self, row: int) -> Dict:
+        return dict(zip(_FIELDS, self.rows[row]))
+
+    @traced("table.refresh_ids", "ui")
+    def refresh_ids(self, ids: Sequence[int]):
+        """Re-read rows that were edited elsewhere; only their cells repaint."""
+        loaded = [i for i in ids if i in self.row_of]
+        if not loaded:
+            return
+        with SessionLocal() as db:
+            fresh = {r[0]: tuple(r) for r in db.execute(self._base().where(Word.id.in_(loaded)))}
+        for i in loaded:
+            r = self.row_of[i]
+            if i in fresh:
+                self.rows[r] = fresh[i]
+                self._audio.pop(i, None)
+                self.dataChanged.emit(self.index(r, 0), self.index(r, len(self.columns) - 1))
+            else:
+                # Edited out of the current filter
+                self.remove_ids([i])
+
+    def remove_ids(self, ids: Sequence[int]):
+        for i in sorted((self.row_of[i] for i in ids if i in self.row_of), reverse=True):
+            self.beginRemoveRows(QModelIndex(), i, i)
+            wid = self.rows[i][0]
+            del self.rows[i]
+            self.endRemoveRows()
+            self.row_of.pop(wid, None)
+            self._audio.pop(wid, None)
+        self.row_of = {r[0]: n for n, r in enumerate(self.rows)}
+
+    def insert_id(self, word_id: int):
+        """Show a newly added word. Under the default newest-first order it goes
+        on top without a reload; any other order re-queries from the start."""
+        if self.ranked is not None or not (self.sort_key == "id" and self.descending):
+            self.reset()
+            return
+        with SessionLocal() as db:
+            row = db.execute(self._base().where(Word.id == word_id)).first()
+        if row is None:
+            return
+        self.beginInsertRows(QModelIndex(), 0, 0)
+        self.rows.insert(0, tuple(row))
+        self.endInsertRows()
+        self.row_of = {r[0]: n for n, r in enumerate(self.rows)}
@@ -1,17 +1,26 @@
 from PySide6.QtWidgets import (
 QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QLineEdit,
-QFileDialog, QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox
+QFileDialog, QTableView, QHeaderView, QMessageBox, QAbstractItemView, QProgressDialog
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QThreadPool
+from sqlalchemy.exc import IntegrityError
+from .word_table_model import WordTableModel
+from .workers import Worker
 from ..db import SessionLocal
 from ..models import Word
+from ..services.word_export import export_words, format_for
+from ..services.tags import format_tags, parse_tags, sync_word_tags
+from ..services.media import media
+from ..services.tts import tts
 from pathlib import Path
-import pandas as pd
+
+FILE_FILTER = "Word lists (*.csv *.jsonl *.parquet);;CSV Files (*.csv);;JSON Lines (*.jsonl);;Parquet (*.parquet)"
 
 class WordsAdminTab(QWidget):
     def __init__(self):
         super().__init__()
         root = QVBoxLayout(self)
+        self._job = None # running import/export Worker, if any
 
         # Controls
         bar = QHBoxLayout()
@@ -22,8 +31,10 @@ class WordsAdminTab(QWidget):
         btn_add = QPushButton("Add")
         btn_upd = QPushButton("Update Selected")
         btn_del = QPushButton("Delete Selected")
-        btn_imp = QPushButton("Import CSV…")
-        btn_exp = QPushButton("Export CSV…")
+        btn_imp = QPushButton("Import…")
+        btn_exp = QPushButton("Export…")
+        btn_tts = QPushButton("Render Audio…")
+        btn_media = QPushButton("Verify Media…")
         for w in [self.word, self.trans, self.tags, self.audio]:
             bar.addWidget(w)
         bar.addWidget(btn_add)
@@ -32,11 +43,21 @@ class WordsAdminTab(QWidget):
         bar.addStretch(1)
         bar.addWidget(btn_imp)
         bar.addWidget(btn_exp)
+        bar.addWidget(btn_tts)
+        bar.addWidget(btn_media)
         root.addLayout(bar)
 
-        # Table
-        self.table = QTableWidget(0, 5)
-        self.table.setHorizontalHeaderLabels(["ID", "Word", "Translation", "Tags", "Audio Path"])
+        # Filter
+        self.filter = QLineEdit(); self.filter.setPlaceholderText("Search words, readings, translations, tags…")
+        root.addWidget(self.filter)
+
+        # Table (rows are fetched lazily as it scrolls)
+        self.model = WordTableModel(["id", "word", "translation", "tags", "audio_path"], sort_key="id", descending=True)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSortingEnabled(True)
+        self.table.horizontalHeader().setSortIndicator(0, Qt.DescendingOrder)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         root.addWidget(self.table)
 
@@ -46,94 +67,149 @@ class WordsAdminTab(QWidget):
         btn_del.clicked.connect(self.delete_selected)
         btn_imp.clicked.connect(self.import_csv)
         btn_exp.clicked.connect(self.export_csv)
-        self.table.itemSelectionChanged.connect(self.populate_inputs_from_selection)
-
-        self.refresh()
+        btn_tts.clicked.connect(self.render_audio)
+        btn_media.clicked.connect(self.verify_media)
+        self.table.selectionModel().selectionChanged.connect(lambda *_: self.populate_inputs_from_selection())
+        self.model.attach_search(self.filter)
 
     def refresh(self):
+        # Full re-query; single edits go through the model's row updates
+        self.model.reset()
+
+    def _selected_row(self):
+        rows = self.table.selectionModel().selectedRows()
+        return rows[0].row() if rows else None
+
+    def populate_inputs_from_selection(self):
+        row = self._selected_row()
+        if row is None:
+            return
+        w = self.model.row_dict(row)
+        self.word.setText(w["word"] or "")
+        self.trans.setText(w["translation"] or "")
+        self.tags.setText(w["tags"] or "")
+
+    def add_row(self):
+        w = Word(word=self.word.text().strip(), translation=self.trans.text().strip(), tags=format_tags(parse_tags(self.tags.text())), audio_path=self.audio.text().strip() or None)
         with SessionLocal() as db:
-            rows = db.query(Word).order_by(Word.id.desc()).all()
-        self.table.setRowCount(len(rows))
-        for r, w in enumerate(rows):
-            self.table.setItem(r, 0, QTableWidgetItem(str(w.id)))
-            self.table.setItem(r, 1, QTableWidgetItem(w.word))
-            self.table.setItem(r, 2, QTableWidgetItem(w.translation))
-            self.table.setItem(r, 3, QTableWidgetItem(w.tags or ""))
-            self.table.setItem(r, 4, QTableWidgetItem(w.audio_path or ""))
-
-        def populate_inputs_from_selection(self):
-            items = self.table.selectedItems()
-            if not items:
+            db.add(w)
+            try:
+                db.flush()
+                sync_word_tags(db, [w.id])
+                media.register_user(db, [(w.id, w.audio_path)])
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                QMessageBox.warning(self, "Add", f"'{w.word}' is already in the word list.")
                 return
-            row = items[0].row()
-            self.word.setText(self.table.item(row, 1).text())
-            self.trans.setText(self.table.item(row, 2).text())
-            self.tags.setText(self.table.item(row, 3).text())
-            
-        def add_row(self):
-            w = Word(word=self.word.text().strip(), translation=self.trans.text().strip(), tags=self.tags.text().strip() or None, audio_path=self.audio.text().strip() or None)
-            with SessionLocal() as db:
-                db.add(w); db.commit()
-            self.refresh()
-            self.word.clear(); self.trans.clear(); self.tags.clear(); self.audio.clear()
+            new_id = w.id
+        self.model.insert_id(new_id)
+        self.word.clear(); self.trans.clear(); self.tags.clear(); self.audio.clear()
 
-        def update_selected(self):
-            items = self.table.selectedItems()
-            if not items:
+    def update_selected(self):
+        row = self._selected_row()
+        if row is None:
+            return
+        id_ = self.model.id_at(row)
+        with SessionLocal() as db:
+            w = db.get(Word, id_)
+            if not w:
                 return
-            row = items[0].row()
-            id_ = int(self.table.item(row, 0).text())
-            with SessionLocal() as db:
-                w = db.get(Word, id_)
-                if not w:
-                    return
-                w.word = self.word.text().strip()
-                w.translation = self.trans.text().strip()
-                w.tags = self.tags.text().strip() or None
-                p = self.audio.text().strip() or None
-                if p and not Path(p).exists():
-                    QMessageBox.warning(self, "Audio", "Path does not exist. Save anyway?")
-                w.audio_path = p
+            w.word = self.word.text().strip()
+            w.translation = self.trans.text().strip()
+            w.tags = format_tags(parse_tags(self.tags.text()))
+            p = self.audio.text().strip() or None
+            if p and not Path(p).exists():
+                QMessageBox.warning(self, "Audio", "Path does not exist. Save anyway?")
+            w.audio_path = p
+            try:
+                db.flush()
+                sync_word_tags(db, [id_])
+                media.register_user(db, [(id_, p)])
                 db.commit()
-            self.refresh()
-
-        def delete_selected(self):
-            items = self.table.selectedItems()
-            if not items:
+            except IntegrityError:
+                db.rollback()
+                QMessageBox.warning(self, "Update", f"Another entry already uses '{w.word}'.")
                 return
-            row = items[0].row()
-            id_ = int(self.table.item(row, 0).text())
-            with SessionLocal() as db:
-                w = db.get(Word, id_)
-                if w:
-                    db.delete(w); db.commit()
-            self.refresh()
+        self.model.refresh_ids([id_])
 
-        def import_csv(self):
-            path, _ = QFileDialog.getOpenFileName(self, "Import CSV", "", "CSV Files (*.csv)")
-            if not path:
-                return
-            df = pd.read_csv(path)
-            required = {"word", "translation"}
-            if not required.issubset(set(df.columns)):
-                QMessageBox.critical(self, "CSV", "CSV must include at least 'word' and 'translation' columns.")
-                return
-            with SessionLocal() as db:
-                for _, row in df.iterrows():
-                    db.add(Word(word=str(row.get("word", "")).strip(), translation=str(row.get("translation", "")).strip(), tags=str(row.get("tags", "") or None) if "tags" in df.columns else None, audio_path=str(row.get("audio_path", "") or None) if "audio_path" in df.columns else None))
-                db.commit()
+    def delete_selected(self):
+        row = self._selected_row()
+        if row is None:
+            return
+        id_ = self.model.id_at(row)
+        with SessionLocal() as db:
+            w = db.get(Word, id_)
+            if w:
+                db.delete(w); db.commit()
+        self.model.remove_ids([id_])
+
+    def import_csv(self):
+        if self._job is not None:
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "Import Words", "", FILE_FILTER)
+        if not path:
+            return
+        from ..services.word_import import import_words # pandas; loaded on first import
+        self._run_job(Worker(import_words, path), "Import", "Importing…",
+                      lambda report: f"Imported: {report}.",
+                      lambda: "Import cancelled; rows already imported were kept.", refresh=True)
+
+    def export_csv(self):
+        if self._job is not None:
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Export Words", "words.csv", FILE_FILTER)
+        if not path:
+            return
+        try:
+            format_for(path)
+        except ValueError as e:
+            QMessageBox.critical(self, "Export", str(e))
+            return
+        def cancelled():
+            Path(path).unlink(missing_ok=True) # partial file
+            return "Export cancelled."
+        self._run_job(Worker(export_words, path), "Export", "Exporting…",
+                      lambda n: f"Exported {n} rows.", cancelled)
+
+    def render_audio(self):
+        if self._job is not None:
+            return
+        self._run_job(Worker(tts.render_all), "Render Audio", "Rendering audio for words without any…",
+                      lambda r: f"Rendered {r[0]} file(s); {r[1]} failed.",
+                      lambda: "Rendering stopped; finished files were kept.", refresh=True)
+
+    def verify_media(self):
+        if self._job is not None:
+            return
+        self._run_job(Worker(media.verify), "Verify Media", "Checking audio files…",
+                      lambda r: f"Media checked: {r}.", lambda: "Media check stopped.", refresh=True)
+
+    def _run_job(self, worker, title, label, on_finished, on_cancelled, refresh=False):
+        # refresh: the job changes words or their audio; reload the table when it ends
+        self._job = worker
+        dlg = QProgressDialog(label, "Cancel", 0, 0, self)
+        dlg.setWindowTitle(title)
+        dlg.setWindowModality(Qt.WindowModal)
+        dlg.setMinimumDuration(300)
+        dlg.canceled.connect(worker.cancel)
+        self._job_dialog = dlg
+        worker.signals.progress.connect(dlg.setLabelText)
+        worker.signals.finished.connect(lambda result: self._job_done(title, on_finished(result), refresh))
+        worker.signals.cancelled.connect(lambda: self._job_done(title, on_cancelled(), refresh))
+        worker.signals.failed.connect(lambda msg: self._job_done(title, msg, refresh, error=True))
+        QThreadPool.globalInstance().start(worker)
+
+    def _job_done(self, title, message, refresh, error=False):
+        self._job = None
+        self._job_dialog.reset()
+        if refresh:
             self.refresh()
+        if error:
+            QMessageBox.critical(self, title, message)
+        else:
+            QMessageBox.information(self, title, message)
 
-        def export_csv(self):
-            path, _ = QFileDialog.getSaveFileName(self, "Export CSV", "words.csv", "CSV Files (*.csv)")
-            if not path:
-                return
-            with SessionLocal() as db:
-                rows = db.query(Word).all()
-            import csv
-            with open(path, "w", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow(["word", "translation", "audio_path", "tags"])
-                for w in rows:
-                    writer.writerow([w.word, w.translation, w.audio_path or "", w.tags or ""])
-            QMessageBox.information(self, "Export", f"Exported {len(rows)} rows.")
\ No newline at end of file
+    def shutdown(self):
+        if self._job is not None:
+            self._job.cancel()
@@ -0,0 +1,42 @@
+from PySide6.QtCore import QObject, QRunnable, Signal
+import threading
+import traceback
+from ..utils.perf import span
+
+class WorkerSignals(QObject):
+    progress = Signal(str)
+    finished = Signal(object)
+    failed = Signal(str)
+    cancelled = Signal()
+
+class Worker(QRunnable):
+    """Run fn(*args, progress=..., cancel=..., **kwargs) on a QThreadPool.
+
+    fn gets a `progress(str)` callback and a threading.Event to poll; results
+    come back on the UI thread through `signals`."""
+    def __init__(self, fn, *args, cancelled_exc=(), **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelled_exc = cancelled_exc
+        self.cancel_event = threading.Event()
+        self.signals = WorkerSignals()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            with span(f"job {getattr(self.fn, '__name__', 'worker')}", "job"):
+                result = self.fn(*self.args, progress=self.signals.progress.emit, cancel=self.cancel_event, **self.kwargs)
+        except self.cancelled_exc:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.failed.emit(str(e))
+        else:
+            if self.cancel_event.is_set():
+                self.signals.cancelled.emit()
+            else:
+                self.signals.finished.emit(result)
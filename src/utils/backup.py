@@ -1,15 +1,282 @@
-from pathlib import Path
-from datetime import datetime
+"""Database backups.
+
+Snapshots go through SQLite's online backup API a few pages per step, so the
+app keeps reading and writing while one runs. Each copy must pass PRAGMA
+integrity_check before it is kept, gzipped, as
+<BACKUP_DIR>/<db>-<YYYYmmdd-HHMMSS>.sqlite.gz with a small .json note beside
+it.
+
+With BACKUP_INCREMENTAL on, a full snapshot is only taken every
+BACKUP_FULL_DAYS. On the days in between, the reviews written since the last
+snapshot (with the card states and totals they changed) go to
+<snapshot>.reviews.jsonl.gz, which replaces the previous one for that
+snapshot. Restoring needs the snapshot plus at most that one file; see
+restore().
+
+Snapshots are pruned to the newest one of each of the last
+BACKUP_KEEP_DAILY days, BACKUP_KEEP_WEEKLY ISO weeks and BACKUP_KEEP_MONTHLY
+months. Files from the old one-per-day scheme (<db>-<YYYYmmdd>.sqlite) are
+pruned the same way.
+
+    python -m src.utils.backup                       # back up now
+    python -m src.utils.backup restore SNAPSHOT DEST # restore to a new file
+"""
+import argparse
+import gzip
+import json
+import os
+import re
 import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set
 from ..config import config
 
-def backup_db():
+INCREMENT_SUFFIX = ".reviews.jsonl.gz"
+
+class BackupCancelled(Exception):
+    pass
+
+def backup_dir() -> Path:
+    return Path(config.BACKUP_DIR)
+
+def _pattern(stem: str):
+    return re.compile(re.escape(stem) + r"-(\d{8})(?:-(\d{6}))?\.sqlite(?:\.gz)?$")
+
+def snapshots(directory: Path, stem: str) -> Dict[Path, datetime]:
+    """Snapshot files in `directory` and when they were taken."""
+    pat = _pattern(stem)
+    found = {}
+    for p in directory.glob(f"{stem}-*.sqlite*"):
+        m = pat.fullmatch(p.name)
+        if m:
+            found[p] = datetime.strptime(m.group(1) + (m.group(2) or "000000"), "%Y%m%d%H%M%S")
+    return found
+
+def _base(snapshot: Path) -> str:
+    name = snapshot.name
+    return name[:-len(".sqlite.gz")] if name.endswith(".gz") else name[:-len(".sqlite")]
+
+def _note_path(snapshot: Path) -> Path:
+    return snapshot.with_name(_base(snapshot) + ".json")
+
+def increment_path(snapshot: Path) -> Path:
+    return snapshot.with_name(_base(snapshot) + INCREMENT_SUFFIX)
+
+# --- full snapshots ------------------------------------------------------
+def snapshot(db: Path, dst: Path, pages: Optional[int] = None,
+             progress: Optional[Callable[[str], None]] = None,
+             cancel: Optional[threading.Event] = None) -> Dict:
+    """Copy `db` to the gzipped file `dst`. Returns the note stored beside it."""
+    tmp = dst.with_name(dst.name + ".part")
+    def step(_status, remaining, total):
+        if cancel is not None and cancel.is_set():
+            raise BackupCancelled()
+        if progress and total:
+            progress(f"Backing up… {100 * (total - remaining) // total}%")
+    src = sqlite3.connect(str(db))
+    out = sqlite3.connect(str(tmp))
+    try:
+        # Between steps other connections can write; if they do, SQLite
+        # restarts the copy on its own, so the result is always consistent
+        src.backup(out, pages=pages or config.BACKUP_PAGES, progress=step)
+        check = out.execute("PRAGMA integrity_check").fetchall()
+        if check != [("ok",)]:
+            raise RuntimeError(f"Backup failed integrity check: {check[0][0]}")
+        last_event = _max_event_id(out)
+    except BaseException:
+        out.close()
+        tmp.unlink(missing_ok=True)
+        raise
+    finally:
+        src.close()
+    out.close()
+    gz = dst.with_name(dst.name + ".gzpart")
+    try:
+        with open(tmp, "rb") as f, gzip.open(gz, "wb", compresslevel=6) as z:
+            shutil.copyfileobj(f, z, 1 << 20)
+        os.replace(gz, dst)
+    finally:
+        tmp.unlink(missing_ok=True)
+        gz.unlink(missing_ok=True)
+    note = {"taken_at": time.time(), "review_event_id": last_event, "bytes": dst.stat().st_size}
+    _note_path(dst).write_text(json.dumps(note), encoding="utf-8")
+    return note
+
+def _max_event_id(con: sqlite3.Connection) -> int:
+    try:
+        return con.execute("SELECT coalesce(max(id), 0) FROM review_events").fetchone()[0]
+    except sqlite3.OperationalError: # database from before review_events
+        return 0
+
+# --- incremental ---------------------------------------------------------
+def write_increment(db: Path, base: Path) -> int:
+    """Write the reviews recorded since `base` was taken (with the card
+    states and totals they changed) next to it. Returns the number of
+    reviews; nothing is written when there are none."""
+    after = json.loads(_note_path(base).read_text(encoding="utf-8"))["review_event_id"]
+    con = sqlite3.connect(str(db), isolation_level=None)
+    con.row_factory = sqlite3.Row
+    try:
+        con.execute("BEGIN") # one consistent read
+        events = con.execute("SELECT * FROM review_events WHERE id > ? ORDER BY id", (after,)).fetchall()
+        cards = con.execute(
+            "SELECT * FROM card_states WHERE (item_type, item_id, mode) IN "
+            "(SELECT item_type, item_id, mode FROM review_events WHERE id > ?)", (after,)).fetchall()
+        stats = con.execute("SELECT * FROM stats").fetchall()
+        con.execute("COMMIT")
+    finally:
+        con.close()
+    if not events:
+        return 0
+    dst = increment_path(base)
+    part = dst.with_name(dst.name + ".part")
+    with gzip.open(part, "wt", encoding="utf-8") as f:
+        for table, rows in (("review_events", events), ("card_states", cards), ("stats", stats)):
+            for r in rows:
+                f.write(json.dumps({"table": table, "row": dict(r)}, ensure_ascii=False) + "\n")
+    os.replace(part, dst)
+    return len(events)
+
+# Upserts for restore(); card states and stats from the increment are newer
+_APPLY = {
+    "review_events": "ON CONFLICT(uid) DO NOTHING",
+    "card_states": "ON CONFLICT(item_type, item_id, mode) DO UPDATE SET {updates}",
+    "stats": "ON CONFLICT(id) DO UPDATE SET {updates}",
+}
+
+def _apply_increment(con: sqlite3.Connection, path: Path) -> int:
+    by_table: Dict[str, List[Dict]] = {}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            by_table.setdefault(entry["table"], []).append(entry["row"])
+    for table, rows in by_table.items():
+        cols = list(rows[0])
+        # Leave ids to the target; rows are matched on their natural keys
+        if table in ("review_events", "card_states"):
+            cols.remove("id")
+        updates = ", ".join(f"{c} = excluded.{c}" for c in cols)
+        sql = (f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+               + _APPLY[table].format(updates=updates))
+        con.executemany(sql, [tuple(r[c] for c in cols) for r in rows])
+    return len(by_table.get("review_events", ()))
+
+# review_rollups (services.analytics) recounted from review_events, after
+# restore() has added reviews the snapshot's rollups never saw
+_REBUILD_ROLLUPS = (
+    "DELETE FROM review_rollups",
+    "INSERT INTO review_rollups (day, mode, level, reviews, correct, latency_ms, timed) "
+    "SELECT strftime('%Y%m%d', e.created_at, 'unixepoch', 'localtime'), e.mode, "
+    "CASE WHEN e.item_type = 'kanji' THEN coalesce(s.level, 0) ELSE 0 END, "
+    "count(*), sum(e.correct), coalesce(sum(e.latency_ms), 0), count(e.latency_ms) "
+    "FROM review_events e LEFT JOIN wk_subjects s ON e.item_type = 'kanji' AND s.id = e.item_id "
+    "GROUP BY 1, 2, 3",
+)
+
+def _rebuild_rollups(con: sqlite3.Connection):
+    if con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'review_rollups'").fetchone():
+        for sql in _REBUILD_ROLLUPS:
+            con.execute(sql)
+
+def restore(snapshot_path: Path, dst: Path, increment: bool = True) -> int:
+    """Write the database saved in `snapshot_path` to `dst` (which must not
+    exist), then apply its reviews file if there is one and recount the
+    review rollups. Returns the number of reviews applied."""
+    snapshot_path, dst = Path(snapshot_path), Path(dst)
+    if dst.exists():
+        raise FileExistsError(f"{dst} already exists")
+    opener = gzip.open if snapshot_path.suffix == ".gz" else open
+    with opener(snapshot_path, "rb") as f, open(dst, "wb") as out:
+        shutil.copyfileobj(f, out, 1 << 20)
+    inc = increment_path(snapshot_path)
+    if not (increment and inc.exists()):
+        return 0
+    con = sqlite3.connect(str(dst))
+    try:
+        with con:
+            applied = _apply_increment(con, inc)
+            _rebuild_rollups(con)
+        return applied
+    finally:
+        con.close()
+
+# --- retention -----------------------------------------------------------
+def retained(taken: Iterable[datetime], daily: int, weekly: int, monthly: int) -> Set[datetime]:
+    """The newest snapshot of each of the last `daily` days, `weekly` ISO
+    weeks and `monthly` months, plus the newest overall."""
+    newest_first = sorted(set(taken), reverse=True)
+    keep = set(newest_first[:1])
+    for n, bucket in ((daily, lambda t: t.date()), (weekly, lambda t: t.isocalendar()[:2]),
+                      (monthly, lambda t: (t.year, t.month))):
+        seen = set()
+        for t in newest_first:
+            b = bucket(t)
+            if b in seen:
+                continue
+            if len(seen) >= n:
+                break
+            seen.add(b)
+            keep.add(t)
+    return keep
+
+def prune(directory: Path, stem: str) -> List[Path]:
+    """Delete snapshots (and their notes and reviews files) the retention
+    policy no longer keeps. Returns the snapshots removed."""
+    found = snapshots(directory, stem)
+    keep = retained(found.values(), config.BACKUP_KEEP_DAILY, config.BACKUP_KEEP_WEEKLY,
+                    config.BACKUP_KEEP_MONTHLY)
+    removed = []
+    for p, t in found.items():
+        if t not in keep:
+            for f in (p, _note_path(p), increment_path(p)):
+                f.unlink(missing_ok=True)
+            removed.append(p)
+    return removed
+
+# --- entry point ---------------------------------------------------------
+def backup_db(progress: Optional[Callable[[str], None]] = None, cancel: Optional[threading.Event] = None,
+              now: Optional[datetime] = None) -> Optional[Path]:
+    """Take today's backup if it is due. Returns the file written, if any."""
     db = Path(config.DB_PATH)
     if not db.exists():
-        return
-    backups = Path("backups")
-    backups.mkdir(exist_ok=True)
-    stamp = datetime.now().strftime("%Y%m%d")
-    dst = backups / f"{db.stem}-{stamp}.sqlite"
-    if not dst.exists():
-        shutil.copy2(db, dst)
\ No newline at end of file
+        return None
+    directory = backup_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    now = now or datetime.now()
+    found = snapshots(directory, db.stem)
+    latest = max(found, key=found.get, default=None)
+    if latest is not None:
+        age = (now.date() - found[latest].date()).days
+        if config.BACKUP_INCREMENTAL and age < config.BACKUP_FULL_DAYS and _note_path(latest).exists():
+            if progress:
+                progress("Saving reviews since the last backup…")
+            return increment_path(latest) if write_increment(db, latest) else None
+        if age == 0:
+            return None
+    dst = directory / f"{db.stem}-{now:%Y%m%d-%H%M%S}.sqlite.gz"
+    snapshot(db, dst, progress=progress, cancel=cancel)
+    prune(directory, db.stem)
+    return dst
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m src.utils.backup", description="Back up or restore the database.")
+    sub = p.add_subparsers(dest="cmd")
+    r = sub.add_parser("restore", help="write a snapshot (plus its reviews file) to a new database file")
+    r.add_argument("snapshot")
+    r.add_argument("dest")
+    r.add_argument("--no-increment", action="store_true", help="ignore the snapshot's reviews file")
+    args = p.parse_args(argv)
+    if args.cmd == "restore":
+        n = restore(Path(args.snapshot), Path(args.dest), increment=not args.no_increment)
+        print(f"Restored {args.snapshot} to {args.dest}" + (f" with {n} later review(s)" if n else ""))
+        return 0
+    out = backup_db(progress=print)
+    print(f"Wrote {out}" if out else "No backup due")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,165 @@
+"""Timing spans for the hot paths.
+
+    with tracer.span("tts.render", text=text): ...
+    @tracer.traced("wk.fetch_all_kanji")
+    def _fetch_all_kanji(): ...
+
+Finished spans go to a ring buffer of the last PERF_BUFFER spans. summary()
+gives count and p50/p95 per span name (the status bar overlay in MainWindow);
+chrome_trace() writes the buffer as Chrome trace-event JSON, for
+chrome://tracing or https://ui.perfetto.dev. SQL statements and session
+commits are recorded through SQLAlchemy events (instrument_engine,
+instrument_sessions).
+
+With PERF_TRACE off, a traced call costs one attribute check and span()
+returns a shared no-op context manager.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from functools import wraps
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from ..config import config
+
+_NULL = nullcontext()
+
+class _Span:
+    __slots__ = ("tracer", "name", "cat", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, args: Optional[Dict]):
+        self.tracer, self.name, self.cat, self.args = tracer, name, cat, args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.cat, self.start, time.perf_counter_ns() - self.start, self.args)
+        return False
+
+class Tracer:
+    def __init__(self, size: int = 20_000, enabled: bool = False):
+        self.enabled = enabled
+        # (name, cat, start ns, duration ns, thread id, args); deque appends are thread-safe
+        self.spans: deque = deque(maxlen=size)
+        self._threads: Dict[int, str] = {}
+
+    def record(self, name: str, cat: str, start_ns: int, dur_ns: int, args: Optional[Dict] = None):
+        tid = threading.get_ident()
+        if tid not in self._threads:
+            self._threads[tid] = threading.current_thread().name
+        self.spans.append((name, cat, start_ns, dur_ns, tid, args))
+
+    def span(self, name: str, cat: str = "app", **args):
+        if not self.enabled:
+            return _NULL
+        return _Span(self, name, cat, args or None)
+
+    def traced(self, name: Optional[str] = None, cat: str = "app") -> Callable:
+        def wrap(fn):
+            label = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+            @wraps(fn)
+            def inner(*a, **kw):
+                if not self.enabled:
+                    return fn(*a, **kw)
+                start = time.perf_counter_ns()
+                try:
+                    return fn(*a, **kw)
+                finally:
+                    self.record(label, cat, start, time.perf_counter_ns() - start)
+            return inner
+        return wrap
+
+    def clear(self):
+        self.spans.clear()
+
+    # --- reading ---------------------------------------------------------
+    def summary(self, seconds: Optional[float] = None) -> List[Tuple[str, int, float, float, float]]:
+        """(name, count, total ms, p50 ms, p95 ms) per span name, over the spans
+        that ended in the last `seconds` (or the whole buffer); most total
+        time first."""
+        cutoff = time.perf_counter_ns() - int(seconds * 1e9) if seconds is not None else None
+        by_name: Dict[str, List[int]] = {}
+        for name, _cat, start, dur, _tid, _args in list(self.spans):
+            if cutoff is None or start + dur >= cutoff:
+                by_name.setdefault(name, []).append(dur)
+        out = []
+        for name, durs in by_name.items():
+            durs.sort()
+            pct = lambda p: durs[min(len(durs) - 1, int(p * len(durs)))] / 1e6
+            out.append((name, len(durs), sum(durs) / 1e6, pct(0.5), pct(0.95)))
+        return sorted(out, key=lambda r: r[2], reverse=True)
+
+    def chrome_trace(self) -> Dict:
+        pid = os.getpid()
+        events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                  for tid, name in list(self._threads.items())]
+        for name, cat, start, dur, tid, args in list(self.spans):
+            e = {"name": name, "cat": cat, "ph": "X", "ts": start / 1000, "dur": dur / 1000, "pid": pid, "tid": tid}
+            if args:
+                e["args"] = args
+            events.append(e)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path: Optional[str] = None) -> Path:
+        """Write the buffer as Chrome trace JSON (default PERF_TRACE_FILE)."""
+        path = Path(path or config.PERF_TRACE_FILE)
+        tmp = path.with_name(path.name + ".part")
+        tmp.write_text(json.dumps(self.chrome_trace(), default=str), encoding="utf-8")
+        os.replace(tmp, path)
+        return path
+
+    # --- SQLAlchemy ------------------------------------------------------
+    def instrument_engine(self, engine):
+        """One "sql <VERB>" span per statement executed on `engine`."""
+        from sqlalchemy import event
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            if self.enabled:
+                conn.info.setdefault("perf_start", []).append(time.perf_counter_ns())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            starts = conn.info.get("perf_start")
+            if not starts:
+                return
+            start = starts.pop()
+            verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "?"
+            args = {"sql": statement[:300]}
+            if executemany:
+                args["rows"] = len(parameters)
+            self.record(f"sql {verb}", "sql", start, time.perf_counter_ns() - start, args)
+
+        @event.listens_for(engine, "handle_error")
+        def _error(ctx):
+            starts = ctx.connection.info.get("perf_start") if ctx.connection is not None else None
+            if starts:
+                starts.pop()
+
+    def instrument_sessions(self, session_cls):
+        """A "sql commit" span per Session.commit() (flush included)."""
+        from sqlalchemy import event
+
+        @event.listens_for(session_cls, "before_commit")
+        def _before(session):
+            if self.enabled:
+                session.info["perf_commit"] = time.perf_counter_ns()
+
+        @event.listens_for(session_cls, "after_commit")
+        def _after(session):
+            start = session.info.pop("perf_commit", None)
+            if start is not None:
+                self.record("sql commit", "sql", start, time.perf_counter_ns() - start)
+
+        @event.listens_for(session_cls, "after_rollback")
+        def _rollback(session):
+            session.info.pop("perf_commit", None)
+
+tracer = Tracer(config.PERF_BUFFER, config.PERF_TRACE)
+span = tracer.span
+traced = tracer.traced